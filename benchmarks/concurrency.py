@@ -0,0 +1,124 @@
+"""Compara workers sync e gevent do gunicorn em endpoints limitados por I/O.
+
+Sobe um gateway de pagamento falso com latência fixa (--latency) e, para cada
+classe de worker, um gunicorn com o mesmo número de workers. Mede checkout
+(que espera o gateway) e catálogo (banco e CPU) em níveis crescentes de
+clientes simultâneos.
+
+    python benchmarks/concurrency.py --workers 4 --levels 8,32,128,512 --latency 0.2
+
+Com workers sync, a vazão do checkout fica limitada a workers / latência
+requisições por segundo, e o excedente espera na fila do socket. Com gevent,
+cada worker atende várias requisições enquanto elas esperam o gateway, até
+o limite do pool de conexões com o banco (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+
+Usa o mesmo banco e os mesmos dados de teste de benchmarks/run.py; cada
+checkout adiciona um curso ao carrinho antes da requisição medida, então as
+respostas chamam de fato o gateway. Termina com código 1 se alguma requisição
+responder com erro.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import run as harness
+
+
+def start_gunicorn(worker_class, workers, port, env_extra, timeout=60):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=worker_class, WEB_CONCURRENCY=str(workers),
+               PORT=str(port), SQL_METRICS_HEADERS='true', **env_extra)
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'src.wsgi:app'],
+                               cwd=ROOT, env=env)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn ({worker_class}) terminou com código {process.returncode}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/courses/categories', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'gunicorn ({worker_class}) não respondeu em {timeout}s')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Capacidade de conexões simultâneas: sync x gevent.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--levels', default='8,32,128,512', help='Clientes simultâneos, separados por vírgula')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--latency', type=float, default=0.2, help='Latência do gateway falso (segundos)')
+    parser.add_argument('--scenarios', default='checkout,catalog')
+    parser.add_argument('--worker-classes', default='sync,gevent')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='Arquivo JSON de saída')
+    args = parser.parse_args(argv)
+
+    from src.main import create_app
+    from src.services.fake_gateway import start_fake_gateway
+
+    gateway_url = start_fake_gateway(latency=args.latency)
+    app = create_app()
+    levels = [int(level) for level in args.levels.split(',')]
+    # Um aluno por cliente simultâneo: cada aluno faz um checkout por vez
+    fixtures = harness.create_fixtures(app, students=max(200, max(levels)))
+    scenario_names = args.scenarios.split(',')
+
+    env_extra = {
+        'PAYMENT_GATEWAY_MODE': 'live',
+        'STRIPE_API_BASE': gateway_url,
+        'PAGSEGURO_API_BASE': gateway_url,
+        'GATEWAY_READ_TIMEOUT': '60',
+        'GATEWAY_POOL_SIZE': str(max(levels))
+    }
+
+    results = {
+        'started_at': datetime.utcnow().isoformat(),
+        'commit': harness.git_commit(),
+        'workers': args.workers,
+        'gateway_latency': args.latency,
+        'sync_checkout_ceiling': round(args.workers / args.latency, 1) if args.latency else None,
+        'runs': []
+    }
+
+    for worker_class in args.worker_classes.split(','):
+        process = start_gunicorn(worker_class, args.workers, args.port, env_extra)
+        base_url = f'http://127.0.0.1:{args.port}'
+        try:
+            scenarios, _ = harness.build_scenarios(fixtures, app.config['SECRET_KEY'], harness.random.Random(1))
+
+            for name in scenario_names:
+                for level in levels:
+                    result = harness.run_scenario(base_url, scenarios[name], level, args.duration, warmup=level)
+                    result.update({'worker_class': worker_class, 'scenario': name, 'concurrency': level})
+                    results['runs'].append(result)
+                    latency = result['latency_ms']
+                    print(f"{worker_class:7} {name:10} c={level:<5} {result['throughput']:9.1f} req/s  "
+                          f"p50 {latency['p50']:9.2f} ms  p99 {latency['p99']:9.2f} ms  erros {result['errors']}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    if args.output:
+        with open(args.output, 'w') as fileobj:
+            json.dump(results, fileobj, indent=2)
+        print(f'Resultado gravado em {args.output}')
+
+    failed = sorted({(run['worker_class'], run['scenario']) for run in results['runs'] if run['errors']})
+    if failed:
+        print('Respostas de erro (4xx/5xx) em: ' + ', '.join(f'{worker} {name}' for worker, name in failed))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
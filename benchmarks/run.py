@@ -0,0 +1,387 @@
+"""Benchmark dos endpoints principais da API.
+
+Sobe a aplicação de src/main.py em um servidor com threads (ou usa --url para
+medir um servidor já em execução, como o gunicorn) contra o banco configurado
+nas variáveis de ambiente, cria dados de teste com o prefixo "bench_" e mede
+cada cenário com N clientes concorrentes.
+
+    python benchmarks/run.py --concurrency 16 --duration 10
+    python benchmarks/run.py --baseline benchmarks/baseline.json
+
+O resultado é gravado em JSON (benchmarks/results/). O processo termina com
+código 1 se alguma requisição de algum cenário responder com erro (4xx/5xx):
+um cenário que mede respostas de erro não mede o endpoint. Com --baseline,
+também falha se algum cenário regredir além da tolerância (p95, vazão ou
+número de consultas por requisição).
+
+ATENÇÃO: grava dados no banco configurado; use um banco local, com o esquema
+já aplicado (flask --app src.main db upgrade ou flask --app src.main create-tables).
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Contagem de consultas no cabeçalho X-DB-Query-Count (ver src/services/sql_metrics.py)
+os.environ.setdefault('SQL_METRICS_HEADERS', 'true')
+os.environ.setdefault('PAYMENT_GATEWAY_MODE', 'simulated')
+
+import jwt
+import requests
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+PREFIX = 'bench_'
+
+# Requisição de um cenário. prepare(session, base_url) roda antes, fora da
+# medição, e devolve um status HTTP; done() roda depois, mesmo em caso de erro.
+Request = namedtuple('Request', 'method path headers body prepare done', defaults=(None, None))
+
+
+def create_fixtures(app, courses=20, modules=5, lessons=6, students=200, enrollments_per_student=3):
+    # Cria (uma única vez) usuários, cursos e currículo; alunos, com matrículas e
+    # pagamentos, são acrescentados até chegar a `students`
+    from src.models.user import db, User
+    from src.models.course import Category, Course, Module, Lesson, Enrollment, Progress, Review
+    from src.models.payment import Payment
+
+    with app.app_context():
+        admin = User.query.filter_by(username=f'{PREFIX}admin').first()
+        if admin is None:
+            admin = User(username=f'{PREFIX}admin', email=f'{PREFIX}admin@example.com', role='admin')
+            instructor = User(username=f'{PREFIX}instructor', email=f'{PREFIX}instructor@example.com',
+                              role='instructor')
+            admin.set_password('bench')
+            instructor.password_hash = admin.password_hash
+            category = Category(name=f'{PREFIX}category')
+            db.session.add_all([admin, instructor, category])
+            db.session.flush()
+
+            course_objects = []
+            for c in range(courses):
+                course = Course(
+                    title=f'{PREFIX}course {c}', description='Curso de benchmark', price=100 + c,
+                    level='iniciante', duration=600, category_id=category.id, instructor_id=instructor.id
+                )
+                for m in range(modules):
+                    module = Module(title=f'Módulo {m}', order=m)
+                    module.lessons = [Lesson(title=f'Aula {l}', order=l, duration=10,
+                                             video_url=f'/static/videos/{PREFIX}{c}_{m}_{l}.mp4')
+                                      for l in range(lessons)]
+                    course.modules.append(module)
+                course_objects.append(course)
+            db.session.add_all(course_objects)
+            db.session.flush()
+
+        existing = User.query.filter(User.username.like(f'{PREFIX}student%')).count()
+        if existing < students:
+            course_objects = Course.query.filter(Course.title.like(f'{PREFIX}course%')).order_by(Course.id).all()
+            rng = random.Random(42 + existing)
+            student_objects = [
+                User(username=f'{PREFIX}student{s}', email=f'{PREFIX}student{s}@example.com',
+                     password_hash=admin.password_hash, role='student')
+                for s in range(existing, students)
+            ]
+            db.session.add_all(student_objects)
+            db.session.flush()
+
+            now = datetime.utcnow()
+            for student in student_objects:
+                for course in rng.sample(course_objects, enrollments_per_student):
+                    enrollment = Enrollment(user_id=student.id, course_id=course.id)
+                    db.session.add(enrollment)
+                    db.session.flush()
+                    first_lesson = course.modules[0].lessons[0]
+                    db.session.add(Progress(enrollment_id=enrollment.id, lesson_id=first_lesson.id, completed=True))
+                    db.session.add(Review(user_id=student.id, course_id=course.id, rating=rng.randint(1, 5)))
+                    db.session.add(Payment(
+                        payment_id=f'{PREFIX}{student.id}_{course.id}', amount=course.price,
+                        status='completed', payment_method='credit_card', user_id=student.id,
+                        course_id=course.id, created_at=now - timedelta(days=rng.randint(0, 29))
+                    ))
+        db.session.commit()
+
+        students = User.query.filter(User.username.like(f'{PREFIX}student%')).all()
+        courses = Course.query.filter(Course.title.like(f'{PREFIX}course%')).all()
+        enrolled = {}
+        for enrollment in Enrollment.query.filter(Enrollment.user_id.in_([s.id for s in students])):
+            enrolled.setdefault(enrollment.user_id, set()).add(enrollment.course_id)
+
+        lessons_by_course = {}
+        for course_id, lesson_id in db.session.query(Module.course_id, Lesson.id).join(
+            Lesson, Lesson.module_id == Module.id
+        ).filter(Module.course_id.in_([c.id for c in courses])):
+            lessons_by_course.setdefault(course_id, []).append(lesson_id)
+
+        return {
+            'admin_id': admin.id,
+            'students': [{
+                'id': student.id,
+                'enrolled': sorted(enrolled.get(student.id, ())),
+                'not_enrolled': [c.id for c in courses if c.id not in enrolled.get(student.id, ())]
+            } for student in students],
+            'course_ids': [course.id for course in courses],
+            'lessons_by_course': lessons_by_course
+        }
+
+
+def token_for(secret_key, user_id):
+    return jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=2)},
+                      secret_key, algorithm='HS256')
+
+
+def build_scenarios(fixtures, secret_key, rng):
+    admin = {'Authorization': f"Bearer {token_for(secret_key, fixtures['admin_id'])}"}
+    students = [dict(student, headers={'Authorization': f"Bearer {token_for(secret_key, student['id'])}"})
+                for student in fixtures['students']]
+    course_ids = fixtures['course_ids']
+
+    def enrolled_lesson(student):
+        course_id = rng.choice(student['enrolled'])
+        return rng.choice(fixtures['lessons_by_course'][course_id])
+
+    # Cada aluno faz um checkout por vez: o checkout esvazia o carrinho, então
+    # cada requisição adiciona um curso antes (fora da medição) e só devolve o
+    # aluno ao conjunto depois de terminar
+    checkout_students = queue.Queue()
+    for student in students:
+        if student['not_enrolled']:
+            checkout_students.put(student)
+
+    def checkout():
+        student = checkout_students.get()
+        course_id = rng.choice(student['not_enrolled'])
+
+        def prepare(session, base_url):
+            response = session.post(f'{base_url}/api/payments/cart/add', json={'course_id': course_id},
+                                    headers=student['headers'])
+            if response.status_code == 400 and 'carrinho' in response.json().get('message', ''):
+                return 200  # já estava no carrinho (cenário "cart")
+            return response.status_code
+
+        return Request('POST', '/api/payments/checkout/stripe', student['headers'], {},
+                       prepare, lambda: checkout_students.put(student))
+
+    # Cada cenário devolve um Request (ou a tupla método, caminho, cabeçalhos, corpo JSON)
+    return {
+        'catalog': lambda: ('GET', '/api/courses/courses', None, None),
+        'course_detail': lambda: ('GET', f'/api/courses/courses/{rng.choice(course_ids)}', None, None),
+        'curriculum': lambda: ('GET', f'/api/courses/courses/{rng.choice(course_ids)}/modules', None, None),
+        'my_courses': lambda: (lambda s: ('GET', '/api/courses/my-courses', s['headers'], None))(rng.choice(students)),
+        'progress': lambda: (lambda s: ('POST', f'/api/courses/lessons/{enrolled_lesson(s)}/progress',
+                                        s['headers'], {'completed': True}))(rng.choice(students)),
+        'cart': lambda: (lambda s: ('GET', '/api/payments/cart', s['headers'], None))(rng.choice(students)),
+        'checkout': checkout,
+        'dashboard': lambda: ('GET', '/api/admin/dashboard', admin, None),
+        'sales_report': lambda: ('GET', '/api/admin/reports/sales', admin, None)
+    }, students
+
+
+def fill_carts(base_url, students):
+    # Carrinhos do cenário "cart", preenchidos pela própria API para funcionar
+    # com qualquer CART_STORE (o checkout enche o carrinho a cada requisição)
+    with requests.Session() as session:
+        for student in students:
+            for course_id in student['not_enrolled'][:2]:
+                session.post(f'{base_url}/api/payments/cart/add', json={'course_id': course_id},
+                             headers=student['headers'])
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(base_url, make_request, concurrency, duration, warmup):
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return local.session
+
+    def call():
+        method, path, headers, body, prepare, done = Request(*make_request())
+        try:
+            if prepare is not None:
+                status = prepare(session(), base_url)
+                if status >= 400:
+                    # Preparação falhou: conta como erro, sem latência
+                    return None, status, None
+            start = time.perf_counter()
+            response = session().request(method, base_url + path, headers=headers, json=body)
+            latency = time.perf_counter() - start
+            queries = response.headers.get('X-DB-Query-Count')
+            return latency, response.status_code, int(queries) if queries is not None else None
+        finally:
+            if done is not None:
+                done()
+
+    def worker(deadline):
+        samples = []
+        while time.perf_counter() < deadline:
+            samples.append(call())
+        return samples
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda _: call(), range(warmup)))
+
+        started = time.perf_counter()
+        deadline = started + duration
+        futures = [executor.submit(worker, deadline) for _ in range(concurrency)]
+        samples = [sample for future in futures for sample in future.result()]
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _, _ in samples if latency is not None)
+    queries = sorted(count for _, _, count in samples if count is not None)
+    errors = sum(1 for _, status, _ in samples if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput': round(len(samples) / elapsed, 2),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'p50': round(percentile(latencies, 0.50), 2) if latencies else None,
+            'p95': round(percentile(latencies, 0.95), 2) if latencies else None,
+            'p99': round(percentile(latencies, 0.99), 2) if latencies else None,
+            'max': round(latencies[-1], 2) if latencies else None
+        },
+        'queries_per_request': {
+            'p50': percentile(queries, 0.50),
+            'max': queries[-1] if queries else None
+        }
+    }
+
+
+def compare(results, baseline, tolerance, query_tolerance):
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+
+        old_p95, new_p95 = previous['latency_ms']['p95'], current['latency_ms']['p95']
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f'{name}: p95 {old_p95} ms -> {new_p95} ms')
+
+        if previous['throughput'] and current['throughput'] < previous['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: vazão {previous['throughput']} -> {current['throughput']} req/s")
+
+        old_queries = previous['queries_per_request']['p50']
+        new_queries = current['queries_per_request']['p50']
+        if old_queries is not None and new_queries is not None and new_queries > old_queries + query_tolerance:
+            regressions.append(f'{name}: consultas por requisição {old_queries} -> {new_queries}')
+
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name}: erros {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dos endpoints principais.')
+    parser.add_argument('--url', help='Servidor já em execução (padrão: sobe a aplicação localmente)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='Segundos de medição por cenário')
+    parser.add_argument('--warmup', type=int, default=20, help='Requisições de aquecimento por cenário')
+    parser.add_argument('--scenarios', help='Lista separada por vírgulas (padrão: todos)')
+    parser.add_argument('--courses', type=int, default=20)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: benchmarks/results/<data>.json)')
+    parser.add_argument('--baseline', help='Resultado anterior para comparação')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Piora relativa aceita no p95 e na vazão (padrão: 0.2)')
+    parser.add_argument('--query-tolerance', type=int, default=0,
+                        help='Consultas a mais por requisição aceitas (padrão: 0)')
+    args = parser.parse_args(argv)
+
+    from src.main import create_app
+    app = create_app()
+
+    fixtures = create_fixtures(app, courses=args.courses, students=args.students)
+    server = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        server, base_url = start_server(app)
+
+    rng = random.Random(args.seed)
+    scenarios, students = build_scenarios(fixtures, app.config['SECRET_KEY'], rng)
+    selected = args.scenarios.split(',') if args.scenarios else list(scenarios)
+    unknown = set(selected) - set(scenarios)
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(unknown))}")
+
+    if 'cart' in selected:
+        fill_carts(base_url, students)
+
+    results = {
+        'started_at': datetime.utcnow().isoformat(),
+        'commit': git_commit(),
+        'url': args.url,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'scenarios': {}
+    }
+    try:
+        for name in selected:
+            result = run_scenario(base_url, scenarios[name], args.concurrency, args.duration, args.warmup)
+            results['scenarios'][name] = result
+            latency = result['latency_ms']
+            print(f"{name:15} {result['throughput']:9.1f} req/s  p50 {latency['p50']:8.2f} ms  "
+                  f"p95 {latency['p95']:8.2f} ms  p99 {latency['p99']:8.2f} ms  "
+                  f"consultas {result['queries_per_request']['p50']}  erros {result['errors']}")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as fileobj:
+        json.dump(results, fileobj, indent=2)
+    print(f'Resultado gravado em {output}')
+
+    failed = [name for name, result in results['scenarios'].items() if result['errors']]
+    if failed:
+        print(f"Cenários com respostas de erro (4xx/5xx): {', '.join(failed)}")
+        return 1
+
+    if args.baseline:
+        with open(args.baseline) as fileobj:
+            regressions = compare(results, json.load(fileobj), args.tolerance, args.query_tolerance)
+        if regressions:
+            print('Regressões em relação ao baseline:')
+            for regression in regressions:
+                print(f'  - {regression}')
+            return 1
+        print('Sem regressões em relação ao baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
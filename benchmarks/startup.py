@@ -0,0 +1,126 @@
+"""Mede o tempo de inicialização e a memória dos workers.
+
+    python benchmarks/startup.py                 # importação + create_app, em processos novos
+    python benchmarks/startup.py --gunicorn      # RSS/PSS por worker, com e sem --preload
+
+A medição de create_app não precisa de banco: a fábrica não abre conexões.
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import resource, time, json
+start = time.perf_counter()
+from src.main import create_app
+app = create_app()
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  'modules': len(__import__('sys').modules)}))
+"""
+
+
+def cold_start(runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', COLD_START], cwd=ROOT, text=True)
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    seconds = [sample['seconds'] for sample in samples]
+    return {
+        'runs': runs,
+        'create_app_seconds': {'median': round(statistics.median(seconds), 4),
+                               'min': round(min(seconds), 4), 'max': round(max(seconds), 4)},
+        'max_rss_mb': round(statistics.median(sample['max_rss_kb'] for sample in samples) / 1024, 1),
+        'modules_loaded': samples[-1]['modules']
+    }
+
+
+def _memory(pid):
+    # RSS e PSS (memória proporcional: páginas compartilhadas divididas entre os processos)
+    result = {}
+    with open(f'/proc/{pid}/smaps_rollup') as fileobj:
+        for line in fileobj:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                result[key.lower() + '_mb'] = round(int(value.split()[0]) / 1024, 1)
+    return result
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as fileobj:
+        return [int(child) for child in fileobj.read().split()]
+
+
+def gunicorn_workers(preload, workers, port, timeout=60):
+    env = dict(os.environ, GUNICORN_PRELOAD='true' if preload else 'false', WEB_CONCURRENCY=str(workers),
+               PORT=str(port))
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'src.wsgi:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        # Pronto quando todos os workers registraram "Booting worker" e a porta responde
+        booted = 0
+        deadline = time.time() + timeout
+        while booted < workers and time.time() < deadline:
+            line = process.stderr.readline()
+            if not line:
+                break
+            if 'Booting worker' in line:
+                booted += 1
+        ready = time.perf_counter() - started
+
+        import urllib.request
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/asset-manifest.json', timeout=1).read()
+                break
+            except OSError:
+                time.sleep(0.05)
+        serving = time.perf_counter() - started
+
+        worker_memory = [_memory(pid) for pid in _children(process.pid)]
+        return {
+            'preload': preload,
+            'workers': len(worker_memory),
+            'boot_seconds': round(ready, 3),
+            'first_response_seconds': round(serving, 3),
+            'master': _memory(process.pid),
+            'worker_rss_mb': [memory.get('rss_mb') for memory in worker_memory],
+            'worker_pss_mb': [memory.get('pss_mb') for memory in worker_memory],
+            'total_pss_mb': round(sum(memory.get('pss_mb', 0) for memory in worker_memory)
+                                  + _memory(process.pid).get('pss_mb', 0), 1)
+        }
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tempo de inicialização e memória por worker.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--gunicorn', action='store_true', help='Mede também os workers do gunicorn')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', help='Grava o resultado em JSON')
+    args = parser.parse_args(argv)
+
+    results = {'cold_start': cold_start(args.runs)}
+    if args.gunicorn:
+        results['gunicorn'] = [gunicorn_workers(preload, args.workers, args.port) for preload in (False, True)]
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as fileobj:
+            fileobj.write(text)
+
+
+if __name__ == '__main__':
+    main()
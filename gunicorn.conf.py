@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+
+# Configuração do gunicorn, carregada automaticamente a partir da raiz do projeto
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+
+# sync: uma requisição por worker (padrão). gevent: cada worker atende até
+# worker_connections requisições ao mesmo tempo, trocando de greenlet sempre
+# que uma delas espera por rede (banco, gateways, e-mail). Ver "Modelo de
+# concorrência" no README.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+if worker_class == 'gevent':
+    # O patch precisa acontecer antes de a aplicação ser importada (inclusive
+    # no mestre, por causa do preload): sockets, ssl, threading e time passam
+    # a cooperar, e o psycopg2 deixa de bloquear o processo enquanto espera o banco
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+# Com preload a aplicação é criada uma vez no processo mestre e os workers são
+# criados por fork, compartilhando as páginas de memória (copy-on-write) e
+# subindo sem reimportar nada. Desative com GUNICORN_PRELOAD=false para
+# recarregar o código com HUP sem reiniciar o mestre.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Métricas do Prometheus agregadas entre os workers: precisa estar definido
+# antes de a aplicação importar prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'ia-cursos-metrics'))
+
+
+def on_starting(server):
+    # Descarta arquivos de métricas de execuções anteriores
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Conexões abertas no mestre não podem ser compartilhadas entre processos:
+    # cada worker começa com pools vazios (close=False não fecha as do mestre)
+    if server.cfg.preload_app:
+        from src.models.user import db
+        from src.wsgi import app
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,17 +1,11 @@
 #!/bin/bash
 
-# Script para inicializar o banco de dados e executar migrações
+# Script para aplicar as migrações do banco de dados
 # Este script deve ser executado após o deploy no Render
 
-# Inicializar as migrações (executado apenas uma vez)
-echo "Inicializando migrações..."
-flask --app src.migrations db init
-
-# Criar a migração inicial
-echo "Criando migração inicial..."
-flask --app src.migrations db migrate -m "Migração inicial"
-
-# Aplicar a migração
+# As migrações ficam versionadas em migrations/; aqui só são aplicadas.
+# Bancos criados antes delas precisam ser marcados uma vez com
+# "flask db stamp" (ver README) antes do primeiro upgrade.
 echo "Aplicando migrações..."
 flask --app src.migrations db upgrade
 
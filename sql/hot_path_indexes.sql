@@ -0,0 +1,66 @@
+-- Índices dos caminhos mais usados e restrições de unicidade
+-- (ver __table_args__ em src/models/course.py e src/models/payment.py).
+--
+-- Para bancos já em produção: cria os índices com CONCURRENTLY, sem bloquear
+-- escritas. Não pode rodar dentro de uma transação:
+--
+--     psql "$DATABASE_URL" -f sql/hot_path_indexes.sql
+--
+-- Depois, confira os planos com "flask check-indexes". Bancos novos recebem
+-- os mesmos índices pelas migrações (flask db upgrade).
+--
+-- As restrições de unicidade falham se já houver duplicatas. Para conferir antes:
+--
+--     SELECT user_id, course_id, count(*) FROM enrollment GROUP BY 1, 2 HAVING count(*) > 1;
+--     SELECT enrollment_id, lesson_id, count(*) FROM progress GROUP BY 1, 2 HAVING count(*) > 1;
+--     SELECT course_id, user_id, count(*) FROM review GROUP BY 1, 2 HAVING count(*) > 1;
+--     SELECT user_id, count(*) FROM cart GROUP BY 1 HAVING count(*) > 1;
+--     SELECT cart_id, course_id, count(*) FROM cart_item GROUP BY 1, 2 HAVING count(*) > 1;
+--     SELECT user_id, course_id, count(*) FROM certificate GROUP BY 1, 2 HAVING count(*) > 1;
+--
+-- Se um CREATE INDEX CONCURRENTLY falhar, o índice fica marcado como
+-- inválido: remova-o com DROP INDEX CONCURRENTLY e execute o script de novo.
+
+\set ON_ERROR_STOP on
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_module_course_order ON module (course_id, "order");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_lesson_module_order ON lesson (module_id, "order");
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_material_lesson ON material (lesson_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_enrollment_course ON enrollment (course_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_user_created_id ON payment (user_id, created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_payment_id ON payment (payment_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_payment_status_created ON payment (status, created_at);
+
+-- Unicidade: o índice único é criado sem bloqueio e depois promovido a
+-- restrição (USING INDEX não relê a tabela)
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_enrollment_user_course ON enrollment (user_id, course_id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_progress_enrollment_lesson ON progress (enrollment_id, lesson_id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_review_course_user ON review (course_id, user_id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_cart_user ON cart (user_id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_cart_item_cart_course ON cart_item (cart_id, course_id);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_certificate_user_course ON certificate (user_id, course_id);
+
+DO $$
+DECLARE
+    item record;
+BEGIN
+    FOR item IN SELECT * FROM (VALUES
+        ('enrollment', 'uq_enrollment_user_course'),
+        ('progress', 'uq_progress_enrollment_lesson'),
+        ('review', 'uq_review_course_user'),
+        ('cart', 'uq_cart_user'),
+        ('cart_item', 'uq_cart_item_cart_course'),
+        ('certificate', 'uq_certificate_user_course')
+    ) AS constraints (table_name, constraint_name) LOOP
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = item.constraint_name) THEN
+            EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I UNIQUE USING INDEX %I',
+                           item.table_name, item.constraint_name, item.constraint_name);
+        END IF;
+    END LOOP;
+END
+$$;
+
+-- Substituído por uq_certificate_user_course
+DROP INDEX CONCURRENTLY IF EXISTS ix_certificate_user_course;
+
+ANALYZE module, lesson, material, enrollment, progress, review, payment, cart, cart_item, certificate;
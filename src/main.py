@@ -2,74 +2,175 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
-from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp
-from src.routes.course import course_bp
-from src.routes.payment import payment_bp
-from src.routes.content import content_bp
-from src.routes.admin import admin_bp
-from flask_cors import CORS
 from dotenv import load_dotenv
 
-# Carregar variáveis de ambiente do arquivo .env se existir
+# Carregar variáveis de ambiente do arquivo .env se existir (antes de importar
+# os serviços, que leem a configuração na importação)
 load_dotenv()
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-CORS(app)  # Habilitar CORS para todas as rotas
-
-# Configuração de segurança - usar variável de ambiente para SECRET_KEY
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
-
-# Registrar blueprints
-app.register_blueprint(user_bp, url_prefix='/api/users')
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(course_bp, url_prefix='/api/courses')
-app.register_blueprint(payment_bp, url_prefix='/api/payments')
-app.register_blueprint(content_bp, url_prefix='/api/content')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
-
-# Configuração do banco de dados - adaptado para PostgreSQL
-DATABASE_URL = os.getenv('DATABASE_URL')
-if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
-    # Render usa formato postgres://, mas SQLAlchemy precisa de postgresql://
-    DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
-    app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
-else:
+
+def database_uri():
+    # Configuração do banco de dados - adaptado para PostgreSQL
+    DATABASE_URL = os.getenv('DATABASE_URL')
+    if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
+        # Render usa formato postgres://, mas SQLAlchemy precisa de postgresql://
+        return DATABASE_URL.replace('postgres://', 'postgresql://', 1)
+
     # Fallback para configuração local ou personalizada
     db_user = os.getenv('DB_USERNAME', 'postgres')
     db_password = os.getenv('DB_PASSWORD', 'password')
     db_host = os.getenv('DB_HOST', 'localhost')
     db_port = os.getenv('DB_PORT', '5432')
     db_name = os.getenv('DB_NAME', 'ia_cursos')
-    
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Criar tabelas do banco de dados
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-        return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+
+    return f"postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+
+def create_app(config=None):
+    # Fábrica da aplicação. Nada acessa o banco durante a criação: o esquema é
+    # mantido pelas migrações (flask db upgrade), não por db.create_all().
+    from flask import Flask, request
+    from flask_cors import CORS
+    from src.models.user import db
+    from src.routes.user import user_bp
+    from src.routes.auth import auth_bp
+    from src.routes.course import course_bp
+    from src.routes.payment import payment_bp
+    from src.routes.content import content_bp
+    from src.routes.admin import admin_bp
+    from src.services import compression, db_routing, json_provider, metrics, profiler, sql_metrics
+    from src.services.delivery import FILE_DELIVERY, deliver_material
+    from src.services.assets import AssetManifest
+    from src.services.signing import REQUIRE_SIGNED_MATERIALS, verify_signature
+    from src.services.storage import MAX_UPLOAD_SIZE, materials_dir
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    CORS(app)  # Habilitar CORS para todas as rotas
+    # jsonify e get_json com orjson, quando instalado (JSON_PROVIDER)
+    json_provider.init_app(app)
+
+    # Configuração de segurança - usar variável de ambiente para SECRET_KEY
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Pool que mede a espera por conexões (exportada em /metrics)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': metrics.TimedQueuePool}
+    # Entrega de arquivos: X-Sendfile é tratado pelo próprio send_file do Flask
+    app.config['USE_X_SENDFILE'] = FILE_DELIVERY == 'x-sendfile'
+    # Corpos acima do limite de upload (com folga para o multipart) recebem 413
+    # antes de serem lidos
+    app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE + 1024 ** 2
+    if config:
+        app.config.update(config)
+
+    # Registrar blueprints
+    app.register_blueprint(user_bp, url_prefix='/api/users')
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(course_bp, url_prefix='/api/courses')
+    app.register_blueprint(payment_bp, url_prefix='/api/payments')
+    app.register_blueprint(content_bp, url_prefix='/api/content')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+
+    register_commands(app)
+
+    # Tamanho do pool, pre-ping, statement_timeout e bind da réplica (variáveis DB_* e DATABASE_REPLICA_URL)
+    db_routing.init_app(app)
+    db.init_app(app)
+    # Contagem de consultas por requisição e log de consultas lentas
+    sql_metrics.init_app(app)
+    # Latência por blueprint/endpoint, requisições em andamento e pool em /metrics
+    metrics.init_app(app)
+    # Profiler sob demanda para administradores (apenas com PROFILER_ENABLED=true)
+    profiler.init_app(app)
+    # gzip/brotli nas respostas dinâmicas; registrado por último para rodar
+    # primeiro entre os after_request e entrar na latência medida
+    compression.init_app(app)
+
+    if os.path.isdir(os.path.join(app.static_folder, 'materials')):
+        # Materiais antigos dentro de static são servidos sem assinatura pela
+        # rota /static/<path> do Flask; mova-os para MATERIALS_DIR
+        app.logger.warning('src/static/materials existe: mova os arquivos para %s', materials_dir())
+
+    @app.route('/static/materials/<path:filename>')
+    def serve_material(filename):
+        # Apenas uma verificação de HMAC, sem acesso ao banco
+        if REQUIRE_SIGNED_MATERIALS and not verify_signature(
+            request.path, request.args.get('expires'), request.args.get('signature')
+        ):
+            return "Invalid or expired signature", 403
+
+        response = deliver_material(filename)
+        if response is None:
+            return "Material not found", 404
+        return response
+
+    # Manifesto dos arquivos estáticos (nomes com hash e variantes comprimidas).
+    # Só lê e calcula hashes: a compressão é feita no build (flask assets build).
+    # Com --preload é montado uma vez no processo mestre e compartilhado pelos workers.
+    asset_manifest = AssetManifest(app.static_folder).build() if app.static_folder else None
+
+    @app.route('/asset-manifest.json')
+    def serve_asset_manifest():
+        if asset_manifest is None:
+            return "Static folder not configured", 404
+        return app.response_class(asset_manifest.to_json(), mimetype='application/json')
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if asset_manifest is None:
+            return "Static folder not configured", 404
+
+        # Resolvido em memória, sem acessar o disco
+        asset, fingerprinted = asset_manifest.resolve(path)
+        if asset is None:
+            # Fallback da SPA
+            asset, fingerprinted = asset_manifest.resolve('index.html')
+            if asset is None:
+                return "index.html not found", 404
+
+        return asset_manifest.response(asset, fingerprinted)
+
+    return app
+
+
+def register_commands(app):
+    # Comandos de linha de comando (flask webhooks ..., flask gateway ...,
+    # flask certificates ..., flask uploads ..., flask assets ..., flask seed,
+    # flask check-indexes, flask db ..., flask create-tables)
+    import click
+    from flask.cli import with_appcontext
+    from flask_migrate import Migrate
+    from src.models.user import db
+    from src.services.webhooks import webhooks_cli
+    from src.services.fake_webhooks import fake_webhooks_command
+    from src.services.fake_gateway import gateway_cli
+    from src.services.certificates import certificates_cli
+    from src.services.seed import seed_command
+    from src.services.index_check import check_indexes_command
+    from src.services.storage import uploads_cli
+    from src.services.assets import assets_cli
+
+    webhooks_cli.add_command(fake_webhooks_command)
+    app.cli.add_command(webhooks_cli)
+    app.cli.add_command(gateway_cli)
+    app.cli.add_command(certificates_cli)
+    app.cli.add_command(uploads_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(check_indexes_command)
+    # render_as_batch: alterações de tabela também funcionam no SQLite
+    Migrate(app, db, render_as_batch=True)
+
+    @app.cli.command('create-tables')
+    @with_appcontext
+    def create_tables_command():
+        """Cria as tabelas ausentes (desenvolvimento; em produção use flask db upgrade)."""
+        db.create_all()
+        click.echo('Tabelas criadas.')
+
 
 if __name__ == '__main__':
     # Em produção, isso não será executado pois usaremos Gunicorn
     port = int(os.getenv('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    create_app().run(host='0.0.0.0', port=port, debug=False)
@@ -1,7 +1,8 @@
-from flask_migrate import Migrate
-from src.main import app, db
+from src.main import create_app
 
-migrate = Migrate(app, db)
+# O Flask-Migrate é registrado em create_app; este módulo mantém
+# "flask --app src.migrations db ..." funcionando
+app = create_app()
 
 if __name__ == '__main__':
     app.run()
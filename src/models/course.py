@@ -44,7 +44,26 @@ class Course(db.Model):
     def student_count(self):
         return len(self.enrollments)
     
-    def to_dict(self):
+    @staticmethod
+    def stats_for(course_ids):
+        # (média das avaliações, número de alunos) de vários cursos com duas
+        # consultas agregadas, em vez de carregar avaliações e matrículas de cada um
+        if not course_ids:
+            return {}
+        ratings = dict(db.session.query(Review.course_id, db.func.avg(Review.rating)).filter(
+            Review.course_id.in_(course_ids)
+        ).group_by(Review.course_id).all())
+        students = dict(db.session.query(Enrollment.course_id, db.func.count(Enrollment.id)).filter(
+            Enrollment.course_id.in_(course_ids)
+        ).group_by(Enrollment.course_id).all())
+        return {
+            course_id: (float(ratings[course_id]) if course_id in ratings else 0, students.get(course_id, 0))
+            for course_id in course_ids
+        }
+    
+    def to_dict(self, stats=None):
+        # stats: (média, alunos) já calculados por stats_for
+        average_rating, student_count = stats if stats is not None else (self.average_rating(), self.student_count())
         return {
             'id': self.id,
             'title': self.title,
@@ -59,8 +78,8 @@ class Course(db.Model):
             'updated_at': self.updated_at.isoformat(),
             'category': self.category.to_dict(),
             'instructor_id': self.instructor_id,
-            'average_rating': self.average_rating(),
-            'student_count': self.student_count()
+            'average_rating': average_rating,
+            'student_count': student_count
         }
 
 class Module(db.Model):
@@ -73,6 +92,11 @@ class Module(db.Model):
     
     lessons = db.relationship('Lesson', backref='module', lazy=True, cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Módulos de um curso já na ordem de exibição
+        db.Index('ix_module_course_order', 'course_id', 'order'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -95,6 +119,10 @@ class Lesson(db.Model):
     
     materials = db.relationship('Material', backref='lesson', lazy=True, cascade="all, delete-orphan")
     
+    __table_args__ = (
+        db.Index('ix_lesson_module_order', 'module_id', 'order'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -115,6 +143,10 @@ class Material(db.Model):
     
     lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id'), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_material_lesson', 'lesson_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -134,6 +166,14 @@ class Enrollment(db.Model):
     
     progress = db.relationship('Progress', backref='enrollment', lazy=True, cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Uma matrícula por usuário e curso; o índice também atende às
+        # consultas por usuário (minhas matrículas, painel do admin)
+        db.UniqueConstraint('user_id', 'course_id', name='uq_enrollment_user_course'),
+        # Alunos de um curso (contagem, certificados da turma)
+        db.Index('ix_enrollment_course', 'course_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -151,6 +191,11 @@ class Progress(db.Model):
     
     enrollment_id = db.Column(db.Integer, db.ForeignKey('enrollment.id'), nullable=False)
     
+    __table_args__ = (
+        # Um registro de progresso por aula de cada matrícula
+        db.UniqueConstraint('enrollment_id', 'lesson_id', name='uq_progress_enrollment_lesson'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -169,6 +214,12 @@ class Review(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     
+    __table_args__ = (
+        # Uma avaliação por aluno; com course_id à frente atende também à
+        # listagem de avaliações do curso
+        db.UniqueConstraint('course_id', 'user_id', name='uq_review_course_user'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -178,3 +229,23 @@ class Review(db.Model):
             'user_id': self.user_id,
             'course_id': self.course_id
         }
+
+class UploadSession(db.Model):
+    id = db.Column(db.String(36), primary_key=True)  # UUID enviado ao cliente
+    filename = db.Column(db.String(255), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)  # tamanho total em bytes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    def to_dict(self, offset=0):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'title': self.title,
+            'size': self.size,
+            'offset': offset,
+            'lesson_id': self.lesson_id
+        }
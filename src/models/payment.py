@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from src.models.user import db
+from src.models.course import Course
 
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -8,13 +9,20 @@ class Payment(db.Model):
     currency = db.Column(db.String(3), default='BRL', nullable=False)
     status = db.Column(db.String(20), nullable=False)  # pending, completed, failed, refunded
     payment_method = db.Column(db.String(20), nullable=False)  # credit_card, pix, boleto
-    payment_id = db.Column(db.String(255), nullable=True)  # ID externo do gateway de pagamento
+    payment_id = db.Column(db.String(255), nullable=True, index=True)  # ID externo do gateway de pagamento
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     
+    __table_args__ = (
+        # Histórico paginado por usuário: filtro e ordenação atendidos pelo índice
+        db.Index('ix_payment_user_created_id', 'user_id', 'created_at', 'id'),
+        # Relatório de vendas e receita do painel: status e período
+        db.Index('ix_payment_status_created', 'status', 'created_at'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -38,9 +46,24 @@ class Cart(db.Model):
     
     items = db.relationship('CartItem', backref='cart', lazy=True, cascade="all, delete-orphan")
     
+    __table_args__ = (
+        # Um carrinho por usuário
+        db.UniqueConstraint('user_id', name='uq_cart_user'),
+    )
+    
     def total(self):
         return sum(item.price for item in self.items)
     
+    def to_summary_dict(self):
+        # Representação compacta: itens e resumo dos cursos em uma única consulta
+        items = [CartItem.summary_from_row(row) for row in CartItem.summary_query(self.id)]
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'items': items,
+            'total': sum(item['price'] for item in items)
+        }
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -60,6 +83,11 @@ class CartItem(db.Model):
     
     course = db.relationship('Course')
     
+    __table_args__ = (
+        # Cada curso aparece uma vez no carrinho
+        db.UniqueConstraint('cart_id', 'course_id', name='uq_cart_item_cart_course'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -68,6 +96,35 @@ class CartItem(db.Model):
             'course_id': self.course_id,
             'course': self.course.to_dict()
         }
+    
+    @staticmethod
+    def summary_query(cart_id):
+        return db.session.query(
+            CartItem.id,
+            CartItem.price,
+            CartItem.course_id,
+            Course.title,
+            Course.image_url,
+            Course.price.label('course_price')
+        ).join(
+            Course, Course.id == CartItem.course_id
+        ).filter(
+            CartItem.cart_id == cart_id
+        ).order_by(CartItem.id).all()
+    
+    @staticmethod
+    def summary_from_row(row):
+        return {
+            'id': row.id,
+            'price': row.price,
+            'course_id': row.course_id,
+            'course': {
+                'id': row.course_id,
+                'title': row.title,
+                'image_url': row.image_url,
+                'price': row.course_price
+            }
+        }
 
 class Coupon(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -103,6 +160,11 @@ class Certificate(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
     
+    __table_args__ = (
+        # Um certificado por aluno e curso; também atende a busca por (user_id, course_id)
+        db.UniqueConstraint('user_id', 'course_id', name='uq_certificate_user_course'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -111,3 +173,69 @@ class Certificate(db.Model):
             'user_id': self.user_id,
             'course_id': self.course_id
         }
+
+class IdempotencyKey(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='in_progress')  # in_progress, completed
+    response_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    response_mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)  # início do lease da requisição em andamento
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_key_user_key'),
+    )
+
+class WebhookEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    gateway = db.Column(db.String(20), nullable=False)  # stripe, pagseguro
+    event_id = db.Column(db.String(255), nullable=False)  # ID do evento no gateway
+    payment_ref = db.Column(db.String(255), nullable=True)  # Payment.payment_id
+    payment_status = db.Column(db.String(20), nullable=True)  # status resultante do pagamento
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, processed, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('gateway', 'event_id', name='uq_webhook_event_gateway_event'),
+        db.Index('ix_webhook_event_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+class CertificateJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    total = db.Column(db.Integer, nullable=True)  # certificados a emitir (definido ao iniciar)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Lease do worker: renovado a cada lote gravado; jobs 'running' com lease
+    # vencido (worker interrompido) voltam para 'pending'
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # None: toda a turma
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'completed': self.completed,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'course_id': self.course_id,
+            'user_id': self.user_id
+        }
@@ -0,0 +1,78 @@
+from datetime import datetime
+import json
+from src.models.user import db
+
+class Quiz(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    pass_score = db.Column(db.Float, nullable=False, default=70)  # nota mínima (%)
+    version = db.Column(db.Integer, nullable=False, default=0)  # incrementada a cada publicação
+    published = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lesson.id'), nullable=False, unique=True)
+
+    questions = db.relationship('Question', backref='quiz', lazy=True, cascade="all, delete-orphan",
+                                order_by='Question.order')
+
+    def to_dict(self, include_answers=False):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'pass_score': self.pass_score,
+            'version': self.version,
+            'published': self.published,
+            'lesson_id': self.lesson_id,
+            'questions': [question.to_dict(include_answers) for question in self.questions]
+        }
+
+class Question(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+    options = db.Column(db.Text, nullable=False)  # lista JSON de alternativas
+    correct_option = db.Column(db.Integer, nullable=False)  # índice da alternativa correta
+    order = db.Column(db.Integer, nullable=False)
+
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+
+    def to_dict(self, include_answers=False):
+        result = {
+            'id': self.id,
+            'text': self.text,
+            'options': json.loads(self.options)
+        }
+        if include_answers:
+            result['correct_option'] = self.correct_option
+        return result
+
+class QuizAttempt(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    quiz_version = db.Column(db.Integer, nullable=False)
+    # Lista JSON com a alternativa escolhida em cada questão, na ordem do quiz (-1 = em branco)
+    answers = db.Column(db.Text, nullable=False)
+    correct_count = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    passed = db.Column(db.Boolean, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_quiz_version', 'quiz_id', 'quiz_version', 'id'),
+        db.Index('ix_quiz_attempt_user_quiz', 'user_id', 'quiz_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'quiz_id': self.quiz_id,
+            'quiz_version': self.quiz_version,
+            'answers': json.loads(self.answers),
+            'correct_count': self.correct_count,
+            'score': self.score,
+            'passed': self.passed,
+            'created_at': self.created_at.isoformat(),
+            'user_id': self.user_id
+        }
@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from src.services.db_routing import RoutingSession
 
-db = SQLAlchemy()
+# Sessão que pode direcionar leituras à réplica (ver src/services/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -1,11 +1,15 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, send_from_directory
 from src.models.user import db, User
 from src.routes.auth import token_required
+from src.services.db_routing import read_replica
+from src.services.json_provider import stream_query
+from src.services import profiler
 import os
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/dashboard', methods=['GET'])
+@read_replica
 @token_required
 def admin_dashboard(current_user):
     if not current_user.is_admin():
@@ -91,13 +95,14 @@ def admin_dashboard(current_user):
     }), 200
 
 @admin_bp.route('/users', methods=['GET'])
+@read_replica
 @token_required
 def admin_users(current_user):
     if not current_user.is_admin():
         return jsonify({'message': 'Acesso negado!'}), 403
     
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users]), 200
+    # Listagem em streaming: o pico de memória não depende do número de usuários
+    return stream_query(db.select(User).order_by(User.id))
 
 @admin_bp.route('/users/<int:user_id>', methods=['GET'])
 @token_required
@@ -148,6 +153,7 @@ def update_user_role(current_user, user_id):
     }), 200
 
 @admin_bp.route('/courses', methods=['GET'])
+@read_replica
 @token_required
 def admin_courses(current_user):
     if not current_user.is_admin():
@@ -155,8 +161,15 @@ def admin_courses(current_user):
     
     from src.models.course import Course
     
-    courses = Course.query.all()
-    return jsonify([course.to_dict() for course in courses]), 200
+    def course_dicts(courses):
+        # Categoria por selectinload e estatísticas agregadas, por bloco
+        stats = Course.stats_for([course.id for course in courses])
+        return [course.to_dict(stats[course.id]) for course in courses]
+    
+    return stream_query(
+        db.select(Course).options(db.selectinload(Course.category)).order_by(Course.id),
+        course_dicts
+    )
 
 @admin_bp.route('/courses', methods=['POST'])
 @token_required
@@ -292,6 +305,7 @@ def create_category(current_user):
     }), 201
 
 @admin_bp.route('/coupons', methods=['GET'])
+@read_replica
 @token_required
 def get_coupons(current_user):
     if not current_user.is_admin():
@@ -299,8 +313,7 @@ def get_coupons(current_user):
     
     from src.models.payment import Coupon
     
-    coupons = Coupon.query.all()
-    return jsonify([coupon.to_dict() for coupon in coupons]), 200
+    return stream_query(db.select(Coupon).order_by(Coupon.id))
 
 @admin_bp.route('/coupons', methods=['POST'])
 @token_required
@@ -339,6 +352,7 @@ def create_coupon(current_user):
     }), 201
 
 @admin_bp.route('/reports/sales', methods=['GET'])
+@read_replica
 @token_required
 def sales_report(current_user):
     if not current_user.is_admin():
@@ -409,3 +423,23 @@ def sales_report(current_user):
         'payment_methods': payment_methods,
         'course_sales': list(course_sales.values())
     }), 200
+
+@admin_bp.route('/profiles', methods=['GET'])
+@token_required
+def get_profiles(current_user):
+    if not current_user.is_admin():
+        return jsonify({'message': 'Acesso negado!'}), 403
+    
+    return jsonify({
+        'enabled': profiler.PROFILER_ENABLED,
+        'profiles': profiler.list_profiles()
+    }), 200
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@token_required
+def download_profile(current_user, profile_id):
+    if not current_user.is_admin():
+        return jsonify({'message': 'Acesso negado!'}), 403
+    
+    # Arquivos .speedscope.json abrem em https://www.speedscope.app; .pstats no snakeviz
+    return send_from_directory(profiler.profiles_dir(), profile_id, as_attachment=True)
@@ -30,6 +30,18 @@ def token_required(f):
     
     return decorated
 
+def user_from_request():
+    # Usuário do token Bearer da requisição atual, ou None (usado fora das rotas)
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    
+    try:
+        data = jwt.decode(auth_header.split(' ')[1], current_app.config['SECRET_KEY'], algorithms=["HS256"])
+    except jwt.PyJWTError:
+        return None
+    return User.query.filter_by(id=data.get('user_id')).first()
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -1,11 +1,21 @@
 from flask import Blueprint, request, jsonify, current_app
 from src.models.user import db, User
-from src.models.course import Course, Module, Lesson, Material
-from src.models.payment import Certificate
+from src.models.course import Course, Module, Lesson, Material, Enrollment, UploadSession
+from src.models.payment import Certificate, CertificateJob
+from src.models.quiz import Quiz
 from src.routes.auth import token_required
-import os
+from src.services.db_routing import read_replica
+from src.services.quiz_engine import grade, publish_quiz, quiz_keys, record_attempt
+from src.services.quiz_analytics import quiz_analytics
+from src.services.delivery import deliver_certificate
+from src.services.signing import verify_signed_url
+from src.services.storage import (
+    CERTIFICATES_URL_PREFIX, MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE, OffsetMismatch, UploadBusy,
+    UploadTooLarge, resumable_uploads, store_content, store_file
+)
 import uuid
 from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.utils import secure_filename
 
 content_bp = Blueprint('content', __name__)
@@ -15,80 +25,217 @@ ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'ppt', 'pptx', 'xlsx', 'csv', 'txt',
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def material_type(extension):
+    # Determinar o tipo de material com base na extensão
+    if extension in ['pdf', 'doc', 'docx', 'txt']:
+        return 'document'
+    elif extension in ['ppt', 'pptx']:
+        return 'presentation'
+    elif extension in ['xlsx', 'csv']:
+        return 'spreadsheet'
+    elif extension == 'zip':
+        return 'archive'
+    else:
+        return 'other'
+
+def _check_lesson_permission(current_user, lesson_id):
+    # Retorna (lesson, resposta de erro)
+    lesson = Lesson.query.get(lesson_id)
+    if not lesson:
+        return None, (jsonify({'message': 'Aula não encontrada!'}), 404)
+    
+    module = Module.query.get(lesson.module_id)
+    course = Course.query.get(module.course_id)
+    
+    if course.instructor_id != current_user.id and not current_user.is_admin():
+        return None, (jsonify({'message': 'Você não tem permissão para adicionar materiais a este curso!'}), 403)
+    
+    return lesson, None
+
 @content_bp.route('/materials/upload', methods=['POST'])
 @token_required
 def upload_material(current_user):
     if not current_user.is_instructor():
         return jsonify({'message': 'Permissão negada!'}), 403
     
-    if 'file' not in request.files:
-        return jsonify({'message': 'Nenhum arquivo enviado!'}), 400
-    
-    file = request.files['file']
+    if request.mimetype == 'multipart/form-data':
+        # Formulário: o Werkzeug lê o corpo inteiro (para um temporário) antes da rota
+        if 'file' not in request.files:
+            return jsonify({'message': 'Nenhum arquivo enviado!'}), 400
+        
+        file = request.files['file']
+        params = request.form
+        original_filename = file.filename
+        stream = file.stream
+    else:
+        # Corpo bruto com os dados na query string (?filename=...&lesson_id=...):
+        # o arquivo é gravado direto do socket, sem cópia intermediária
+        params = request.args
+        original_filename = params.get('filename', '')
+        stream = request.stream
     
-    if file.filename == '':
+    if original_filename == '':
         return jsonify({'message': 'Nenhum arquivo selecionado!'}), 400
     
-    if not allowed_file(file.filename):
+    if not allowed_file(original_filename):
         return jsonify({'message': 'Tipo de arquivo não permitido!'}), 400
     
-    lesson_id = request.form.get('lesson_id')
+    lesson_id = params.get('lesson_id')
     if not lesson_id:
         return jsonify({'message': 'ID da aula não fornecido!'}), 400
     
-    lesson = Lesson.query.get(lesson_id)
-    if not lesson:
-        return jsonify({'message': 'Aula não encontrada!'}), 404
+    lesson, error = _check_lesson_permission(current_user, lesson_id)
+    if error:
+        return error
     
-    module = Module.query.get(lesson.module_id)
-    course = Course.query.get(module.course_id)
+    filename = secure_filename(original_filename)
+    file_ext = filename.rsplit('.', 1)[1].lower()
     
-    if course.instructor_id != current_user.id and not current_user.is_admin():
-        return jsonify({'message': 'Você não tem permissão para adicionar materiais a este curso!'}), 403
+    # Grava em blocos, calculando o SHA-256; arquivos idênticos são guardados uma vez
+    try:
+        file_url = store_file(stream, file_ext)
+    except UploadTooLarge:
+        return jsonify({'message': 'Arquivo maior que o limite permitido!'}), 413
     
-    filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4()}_{filename}"
+    # Criar registro do material no banco de dados
+    material = Material(
+        title=params.get('title', filename),
+        type=material_type(file_ext),
+        url=file_url,
+        lesson_id=lesson_id
+    )
     
-    # Criar diretório para materiais se não existir
-    upload_dir = os.path.join(current_app.static_folder, 'materials')
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
+    db.session.add(material)
+    db.session.commit()
     
-    file_path = os.path.join(upload_dir, unique_filename)
-    file.save(file_path)
+    return jsonify({
+        'message': 'Material adicionado com sucesso!',
+        'material': material.to_dict()
+    }), 201
+
+@content_bp.route('/uploads', methods=['POST'])
+@token_required
+def create_upload(current_user):
+    # Inicia um upload em partes (para arquivos grandes e conexões instáveis)
+    if not current_user.is_instructor():
+        return jsonify({'message': 'Permissão negada!'}), 403
+    
+    data = request.get_json()
     
-    # URL relativa para acesso ao arquivo
-    file_url = f"/static/materials/{unique_filename}"
+    if not data or not data.get('filename') or not data.get('lesson_id') or not data.get('size'):
+        return jsonify({'message': 'Dados incompletos!'}), 400
     
-    # Determinar o tipo de material com base na extensão
-    file_ext = filename.rsplit('.', 1)[1].lower()
-    if file_ext in ['pdf', 'doc', 'docx', 'txt']:
-        material_type = 'document'
-    elif file_ext in ['ppt', 'pptx']:
-        material_type = 'presentation'
-    elif file_ext in ['xlsx', 'csv']:
-        material_type = 'spreadsheet'
-    elif file_ext == 'zip':
-        material_type = 'archive'
-    else:
-        material_type = 'other'
+    filename = secure_filename(data['filename'])
+    if not allowed_file(filename):
+        return jsonify({'message': 'Tipo de arquivo não permitido!'}), 400
+    
+    size = data['size']
+    if not isinstance(size, int) or size <= 0 or size > MAX_UPLOAD_SIZE:
+        return jsonify({'message': 'Tamanho de arquivo inválido!'}), 400
+    
+    lesson, error = _check_lesson_permission(current_user, data['lesson_id'])
+    if error:
+        return error
+    
+    upload = UploadSession(
+        id=str(uuid.uuid4()),
+        filename=filename,
+        title=data.get('title', filename),
+        size=size,
+        lesson_id=lesson.id,
+        user_id=current_user.id
+    )
+    
+    db.session.add(upload)
+    db.session.commit()
+    
+    result = upload.to_dict()
+    result['chunk_size'] = UPLOAD_CHUNK_SIZE
+    return jsonify(result), 201
+
+def _get_upload(current_user, upload_id):
+    upload = UploadSession.query.get(upload_id)
+    if not upload or upload.user_id != current_user.id:
+        return None
+    return upload
+
+@content_bp.route('/uploads/<upload_id>', methods=['GET'])
+@token_required
+def get_upload(current_user, upload_id):
+    # Informa o offset a partir do qual o cliente deve retomar
+    upload = _get_upload(current_user, upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload não encontrado!'}), 404
+    
+    return jsonify(upload.to_dict(resumable_uploads.offset(upload.id))), 200
+
+@content_bp.route('/uploads/<upload_id>', methods=['PATCH'])
+@token_required
+def upload_chunk(current_user, upload_id):
+    # Recebe uma parte no corpo bruto da requisição, a partir do offset em Upload-Offset
+    upload = _get_upload(current_user, upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload não encontrado!'}), 404
+    
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'message': 'Cabeçalho Upload-Offset não fornecido!'}), 400
+    
+    try:
+        offset = resumable_uploads.append(upload.id, request.stream, offset, upload.size - offset)
+    except OffsetMismatch as e:
+        return jsonify({'message': 'Offset inválido!', 'offset': e.offset}), 409
+    except UploadBusy:
+        return jsonify({'message': 'Outra parte deste upload está sendo enviada!'}), 409
+    except UploadTooLarge:
+        return jsonify({'message': 'A parte ultrapassa o tamanho declarado do upload!'}), 413
+    
+    if offset < upload.size:
+        return jsonify(upload.to_dict(offset)), 200
+    
+    # Última parte: move para o armazenamento por conteúdo e cria o material
+    part_path, digest = resumable_uploads.finish(upload.id)
+    file_url = store_content(part_path, digest, upload.filename.rsplit('.', 1)[1].lower())
     
-    # Criar registro do material no banco de dados
     material = Material(
-        title=request.form.get('title', filename),
-        type=material_type,
+        title=upload.title,
+        type=material_type(upload.filename.rsplit('.', 1)[1].lower()),
         url=file_url,
-        lesson_id=lesson_id
+        lesson_id=upload.lesson_id
     )
     
     db.session.add(material)
+    db.session.delete(upload)
     db.session.commit()
     
     return jsonify({
         'message': 'Material adicionado com sucesso!',
-        'material': material.to_dict()
+        'material': material.to_dict(),
+        'sha256': digest
     }), 201
 
+@content_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+def cancel_upload(current_user, upload_id):
+    upload = _get_upload(current_user, upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload não encontrado!'}), 404
+    
+    resumable_uploads.discard(upload.id)
+    db.session.delete(upload)
+    db.session.commit()
+    
+    return jsonify({'message': 'Upload cancelado!'}), 200
+
+@content_bp.route('/signed-url/verify', methods=['GET'])
+def verify_signed_request():
+    # Para o auth_request do Nginx: valida a URL original sem tocar no banco
+    #   location /static/materials/ { auth_request /api/content/signed-url/verify; ... }
+    original_uri = request.headers.get('X-Original-URI', '')
+    if verify_signed_url(original_uri):
+        return '', 204
+    return '', 403
+
 @content_bp.route('/certificates/generate', methods=['POST'])
 @token_required
 def generate_certificate(current_user):
@@ -125,26 +272,61 @@ def generate_certificate(current_user):
             'certificate': existing_certificate.to_dict()
         }), 200
     
-    # Gerar certificado (simulado)
-    certificate_filename = f"certificate_{current_user.id}_{course_id}_{uuid.uuid4()}.pdf"
-    certificate_url = f"/static/certificates/{certificate_filename}"
+    # A renderização do PDF acontece no worker (flask certificates worker)
+    job = CertificateJob.query.filter(
+        CertificateJob.course_id == course_id,
+        CertificateJob.user_id == current_user.id,
+        CertificateJob.status.in_(['pending', 'running'])
+    ).first()
     
-    # Em uma implementação real, geraria o PDF do certificado aqui
+    if not job:
+        job = CertificateJob(
+            course_id=course_id,
+            user_id=current_user.id,
+            requested_by=current_user.id
+        )
+        db.session.add(job)
+        db.session.commit()
     
-    # Criar registro do certificado
-    certificate = Certificate(
-        user_id=current_user.id,
+    return jsonify({
+        'message': 'Certificado em processamento!',
+        'job': job.to_dict()
+    }), 202
+
+@content_bp.route('/courses/<int:course_id>/certificates/bulk', methods=['POST'])
+@token_required
+def bulk_generate_certificates(current_user, course_id):
+    # Emite, em um único job, os certificados de todas as matrículas concluídas do curso
+    course = Course.query.get(course_id)
+    
+    if not course:
+        return jsonify({'message': 'Curso não encontrado!'}), 404
+    
+    if course.instructor_id != current_user.id and not current_user.is_admin():
+        return jsonify({'message': 'Você não tem permissão para emitir certificados deste curso!'}), 403
+    
+    job = CertificateJob(
         course_id=course_id,
-        certificate_url=certificate_url
+        requested_by=current_user.id
     )
     
-    db.session.add(certificate)
+    db.session.add(job)
     db.session.commit()
     
     return jsonify({
-        'message': 'Certificado gerado com sucesso!',
-        'certificate': certificate.to_dict()
-    }), 201
+        'message': 'Emissão de certificados iniciada!',
+        'job': job.to_dict()
+    }), 202
+
+@content_bp.route('/certificates/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_certificate_job(current_user, job_id):
+    job = CertificateJob.query.get(job_id)
+    
+    if not job or (job.requested_by != current_user.id and not current_user.is_admin()):
+        return jsonify({'message': 'Job não encontrado!'}), 404
+    
+    return jsonify(job.to_dict()), 200
 
 @content_bp.route('/certificates', methods=['GET'])
 @token_required
@@ -164,122 +346,136 @@ def get_certificates(current_user):
     
     return jsonify(result), 200
 
-@content_bp.route('/quiz/<int:lesson_id>', methods=['GET'])
+@content_bp.route('/certificates/files/<filename>', methods=['GET'])
 @token_required
-def get_quiz(current_user, lesson_id):
-    # Simulação de quiz para uma aula
-    # Em uma implementação real, teríamos um modelo de Quiz no banco de dados
-    
-    lesson = Lesson.query.get(lesson_id)
-    if not lesson:
-        return jsonify({'message': 'Aula não encontrada!'}), 404
+def download_certificate(current_user, filename):
+    # Só o dono (ou um administrador) baixa o PDF; o arquivo fica fora de /static
+    certificate = Certificate.query.filter_by(
+        certificate_url=f'{CERTIFICATES_URL_PREFIX}{filename}'
+    ).first()
     
-    # Verificar se o usuário está matriculado no curso
-    module = Module.query.get(lesson.module_id)
-    course = Course.query.get(module.course_id)
+    if not certificate or (certificate.user_id != current_user.id and not current_user.is_admin()):
+        return jsonify({'message': 'Certificado não encontrado!'}), 404
     
-    enrollment = Enrollment.query.filter_by(
-        user_id=current_user.id,
-        course_id=course.id
-    ).first()
+    response = deliver_certificate(filename)
+    if response is None:
+        return jsonify({'message': 'Certificado não encontrado!'}), 404
+    return response
+
+def _is_enrolled(user_id, lesson_id):
+    # Matrícula no curso da aula, em uma única consulta
+    return db.session.query(Enrollment.id).join(
+        Module, Module.course_id == Enrollment.course_id
+    ).join(
+        Lesson, Lesson.module_id == Module.id
+    ).filter(
+        Lesson.id == lesson_id,
+        Enrollment.user_id == user_id
+    ).first() is not None
+
+@content_bp.route('/quiz/<int:lesson_id>', methods=['GET'])
+@token_required
+def get_quiz(current_user, lesson_id):
+    compiled = quiz_keys.get(lesson_id)
+    if not compiled:
+        return jsonify({'message': 'Quiz não encontrado!'}), 404
     
-    if not enrollment:
+    if not _is_enrolled(current_user.id, lesson_id):
         return jsonify({'message': 'Você não está matriculado neste curso!'}), 403
     
-    # Quiz simulado
-    quiz = {
-        'lesson_id': lesson_id,
-        'title': f'Quiz sobre {lesson.title}',
-        'questions': [
-            {
-                'id': 1,
-                'text': 'Qual é o principal benefício da IA no mercado de trabalho?',
-                'options': [
-                    'Substituir completamente os trabalhadores humanos',
-                    'Automatizar tarefas repetitivas e aumentar a produtividade',
-                    'Eliminar a necessidade de treinamento profissional',
-                    'Reduzir a necessidade de comunicação entre equipes'
-                ],
-                'correct_option': 1
-            },
-            {
-                'id': 2,
-                'text': 'O que é prompt engineering?',
-                'options': [
-                    'Programação de robôs industriais',
-                    'Criação de hardware para IA',
-                    'Arte de criar instruções eficazes para modelos de IA',
-                    'Técnica de marketing digital'
-                ],
-                'correct_option': 2
-            },
-            {
-                'id': 3,
-                'text': 'Qual destas não é uma aplicação comum de IA generativa?',
-                'options': [
-                    'Geração de textos e artigos',
-                    'Criação de imagens e arte digital',
-                    'Substituição completa de programadores humanos',
-                    'Assistência na criação de conteúdo de marketing'
-                ],
-                'correct_option': 2
-            }
-        ]
-    }
+    # O quiz sem as respostas corretas já vem serializado do cache
+    return current_app.response_class(compiled.public_json, mimetype='application/json'), 200
+
+@content_bp.route('/quiz/<int:lesson_id>', methods=['PUT'])
+@token_required
+def save_quiz(current_user, lesson_id):
+    lesson, error = _check_lesson_permission(current_user, lesson_id)
+    if error:
+        return error
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('questions'):
+        return jsonify({'message': 'Questões não fornecidas!'}), 400
+    
+    questions = data['questions']
+    if not isinstance(questions, list):
+        return jsonify({'message': 'As questões devem ser uma lista!'}), 400
+    
+    for question in questions:
+        if not isinstance(question, dict):
+            return jsonify({'message': 'Questão inválida: cada questão deve ser um objeto!'}), 400
+        options = question.get('options')
+        correct_option = question.get('correct_option')
+        if (not isinstance(question.get('text'), str) or not question['text'] or not isinstance(options, list)
+                or len(options) < 2 or isinstance(correct_option, bool) or not isinstance(correct_option, int)
+                or not 0 <= correct_option < len(options)):
+            return jsonify({'message': 'Questão inválida: informe texto, ao menos duas alternativas e a alternativa correta!'}), 400
+    
+    try:
+        pass_score = float(data.get('pass_score', 70))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Nota mínima inválida!'}), 400
+    
+    if data.get('title') is not None and not isinstance(data['title'], str):
+        return jsonify({'message': 'Título inválido!'}), 400
+    
+    quiz = Quiz.query.filter_by(lesson_id=lesson_id).first()
+    if not quiz:
+        quiz = Quiz(lesson_id=lesson_id, title=lesson.title)
+        db.session.add(quiz)
+    
+    publish_quiz(quiz, data.get('title') or quiz.title, pass_score, questions)
+    
+    return jsonify({
+        'message': 'Quiz publicado com sucesso!',
+        'quiz': quiz.to_dict(include_answers=True)
+    }), 200
+
+@content_bp.route('/quiz/<int:lesson_id>/analytics', methods=['GET'])
+@read_replica
+@token_required
+def get_quiz_analytics(current_user, lesson_id):
+    lesson, error = _check_lesson_permission(current_user, lesson_id)
+    if error:
+        return error
     
-    # Remover as respostas corretas antes de enviar ao cliente
-    for question in quiz['questions']:
-        question.pop('correct_option', None)
+    compiled = quiz_keys.get(lesson_id)
+    if not compiled:
+        return jsonify({'message': 'Quiz não encontrado!'}), 404
     
-    return jsonify(quiz), 200
+    # Estatísticas da versão publicada, calculadas sobre todas as tentativas
+    return jsonify(quiz_analytics.get(compiled)), 200
 
 @content_bp.route('/quiz/<int:lesson_id>/submit', methods=['POST'])
 @token_required
 def submit_quiz(current_user, lesson_id):
     data = request.get_json()
     
-    if not data or not data.get('answers'):
+    if not data or not data.get('answers') or not isinstance(data['answers'], dict):
         return jsonify({'message': 'Respostas não fornecidas!'}), 400
     
-    lesson = Lesson.query.get(lesson_id)
-    if not lesson:
-        return jsonify({'message': 'Aula não encontrada!'}), 404
-    
-    # Verificar se o usuário está matriculado no curso
-    module = Module.query.get(lesson.module_id)
-    course = Course.query.get(module.course_id)
-    
-    enrollment = Enrollment.query.filter_by(
-        user_id=current_user.id,
-        course_id=course.id
-    ).first()
+    compiled = quiz_keys.get(lesson_id)
+    if not compiled:
+        return jsonify({'message': 'Quiz não encontrado!'}), 404
     
-    if not enrollment:
+    if not _is_enrolled(current_user.id, lesson_id):
         return jsonify({'message': 'Você não está matriculado neste curso!'}), 403
     
-    # Respostas corretas simuladas
-    correct_answers = {
-        1: 1,  # ID da questão: índice da opção correta
-        2: 2,
-        3: 2
-    }
-    
-    # Verificar respostas
-    user_answers = data['answers']
-    correct_count = 0
-    total_questions = len(correct_answers)
-    
-    for question_id, answer_index in user_answers.items():
-        if int(question_id) in correct_answers and correct_answers[int(question_id)] == answer_index:
-            correct_count += 1
+    # Correção feita só com o gabarito em memória
+    chosen, correct_count = grade(compiled, data['answers'])
+    total_questions = len(compiled.question_ids)
     
-    score = (correct_count / total_questions) * 100
-    passed = score >= 70  # Considerando 70% como nota de aprovação
+    score = (correct_count / total_questions) * 100 if total_questions else 0
+    passed = score >= compiled.pass_score
     
-    # Em uma implementação real, salvaríamos o resultado no banco de dados
+    try:
+        attempt_id = record_attempt(compiled, current_user.id, chosen, correct_count, score, passed)
+    except SQLAlchemyError:
+        return jsonify({'message': 'Não foi possível registrar a tentativa. Tente novamente.'}), 503
     
     return jsonify({
         'message': 'Quiz enviado com sucesso!',
+        'attempt_id': attempt_id,
         'score': score,
         'correct_count': correct_count,
         'total_questions': total_questions,
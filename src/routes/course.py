@@ -1,12 +1,15 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db, User
 from src.models.course import Course, Category, Module, Lesson, Material, Review, Enrollment, Progress
-from src.routes.auth import token_required
+from src.routes.auth import token_required, user_from_request
+from src.services.db_routing import read_replica
+from src.services.signing import sign_material_url
 from datetime import datetime
 
 course_bp = Blueprint('course', __name__)
 
 @course_bp.route('/courses', methods=['GET'])
+@read_replica
 def get_courses():
     # Parâmetros de filtro
     category_id = request.args.get('category_id', type=int)
@@ -32,15 +35,17 @@ def get_courses():
         query = query.filter(Course.price <= max_price)
     
     # Filtro de avaliação é aplicado após buscar os cursos
-    courses = query.all()
+    courses = query.options(db.joinedload(Course.category)).all()
+    stats = Course.stats_for([course.id for course in courses])
     
     # Filtrar por avaliação média
     if min_rating is not None:
-        courses = [course for course in courses if course.average_rating() >= min_rating]
+        courses = [course for course in courses if stats[course.id][0] >= min_rating]
     
-    return jsonify([course.to_dict() for course in courses]), 200
+    return jsonify([course.to_dict(stats[course.id]) for course in courses]), 200
 
 @course_bp.route('/courses/<int:course_id>', methods=['GET'])
+@read_replica
 def get_course(course_id):
     course = Course.query.get(course_id)
     
@@ -50,29 +55,61 @@ def get_course(course_id):
     return jsonify(course.to_dict()), 200
 
 @course_bp.route('/categories', methods=['GET'])
+@read_replica
 def get_categories():
     categories = Category.query.all()
     return jsonify([category.to_dict() for category in categories]), 200
 
+def _can_access_content(course):
+    # Alunos matriculados, o instrutor do curso e administradores recebem as
+    # URLs de vídeos e materiais; o currículo público mostra só a estrutura
+    user = user_from_request()
+    if user is None:
+        return False
+    if user.role == 'admin' or user.id == course.instructor_id:
+        return True
+    return Enrollment.query.filter_by(user_id=user.id, course_id=course.id).first() is not None
+
+def _lesson_dict(lesson_dict, can_access):
+    # URLs locais assinadas para quem tem acesso, removidas para os demais
+    lesson_dict['video_url'] = sign_material_url(lesson_dict['video_url']) if can_access else None
+    for material in lesson_dict['materials']:
+        material['url'] = sign_material_url(material['url']) if can_access else None
+    return lesson_dict
+
 @course_bp.route('/courses/<int:course_id>/modules', methods=['GET'])
+@read_replica
 def get_course_modules(course_id):
     course = Course.query.get(course_id)
     
     if not course:
         return jsonify({'message': 'Curso não encontrado!'}), 404
     
-    modules = Module.query.filter_by(course_id=course_id).order_by(Module.order).all()
-    return jsonify([module.to_dict() for module in modules]), 200
+    # Aulas e materiais em uma consulta cada, para todos os módulos
+    modules = Module.query.filter_by(course_id=course_id).order_by(Module.order).options(
+        db.selectinload(Module.lessons).selectinload(Lesson.materials)
+    ).all()
+    can_access = _can_access_content(course)
+    result = []
+    for module in modules:
+        module_dict = module.to_dict()
+        module_dict['lessons'] = [_lesson_dict(lesson, can_access) for lesson in module_dict['lessons']]
+        result.append(module_dict)
+    return jsonify(result), 200
 
 @course_bp.route('/modules/<int:module_id>/lessons', methods=['GET'])
+@read_replica
 def get_module_lessons(module_id):
     module = Module.query.get(module_id)
     
     if not module:
         return jsonify({'message': 'Módulo não encontrado!'}), 404
     
-    lessons = Lesson.query.filter_by(module_id=module_id).order_by(Lesson.order).all()
-    return jsonify([lesson.to_dict() for lesson in lessons]), 200
+    lessons = Lesson.query.filter_by(module_id=module_id).order_by(Lesson.order).options(
+        db.selectinload(Lesson.materials)
+    ).all()
+    can_access = _can_access_content(module.course)
+    return jsonify([_lesson_dict(lesson.to_dict(), can_access) for lesson in lessons]), 200
 
 @course_bp.route('/lessons/<int:lesson_id>/materials', methods=['GET'])
 @token_required
@@ -93,9 +130,22 @@ def get_lesson_materials(current_user, lesson_id):
         return jsonify({'message': 'Você não está matriculado neste curso!'}), 403
     
     materials = Material.query.filter_by(lesson_id=lesson_id).all()
-    return jsonify([material.to_dict() for material in materials]), 200
+    
+    # URLs assinadas e com validade: o download não precisa repetir esta verificação
+    result = []
+    for material in materials:
+        material_dict = material.to_dict()
+        material_dict['url'] = sign_material_url(material.url)
+        result.append(material_dict)
+    
+    return jsonify({
+        'lesson_id': lesson.id,
+        'video_url': sign_material_url(lesson.video_url),
+        'materials': result
+    }), 200
 
 @course_bp.route('/courses/<int:course_id>/reviews', methods=['GET'])
+@read_replica
 def get_course_reviews(course_id):
     course = Course.query.get(course_id)
     
@@ -168,34 +218,46 @@ def add_course_review(current_user, course_id):
     }), 201
 
 @course_bp.route('/my-courses', methods=['GET'])
+@read_replica
 @token_required
 def get_my_courses(current_user):
-    enrollments = Enrollment.query.filter_by(user_id=current_user.id).all()
+    # Número fixo de consultas, qualquer que seja o número de cursos e aulas:
+    # matrículas com cursos, estatísticas, total de aulas e aulas concluídas
+    rows = db.session.query(Enrollment, Course).join(
+        Course, Course.id == Enrollment.course_id
+    ).options(
+        db.joinedload(Course.category)
+    ).filter(
+        Enrollment.user_id == current_user.id
+    ).order_by(Enrollment.id).all()
+    
+    course_ids = [course.id for _, course in rows]
+    stats = Course.stats_for(course_ids)
+    lesson_totals = dict(db.session.query(Module.course_id, db.func.count(Lesson.id)).join(
+        Lesson, Lesson.module_id == Module.id
+    ).filter(
+        Module.course_id.in_(course_ids)
+    ).group_by(Module.course_id).all()) if course_ids else {}
+    completed_totals = dict(db.session.query(Progress.enrollment_id, db.func.count(Progress.id)).join(
+        Enrollment, Enrollment.id == Progress.enrollment_id
+    ).join(
+        Lesson, Lesson.id == Progress.lesson_id
+    ).join(
+        Module, db.and_(Module.id == Lesson.module_id, Module.course_id == Enrollment.course_id)
+    ).filter(
+        Enrollment.user_id == current_user.id,
+        Progress.completed == True
+    ).group_by(Progress.enrollment_id).all()) if course_ids else {}
     
     result = []
-    for enrollment in enrollments:
-        course = Course.query.get(enrollment.course_id)
+    for enrollment, course in rows:
         if course:
-            course_dict = course.to_dict()
+            course_dict = course.to_dict(stats[course.id])
             course_dict['enrollment'] = enrollment.to_dict()
             
             # Calcular progresso
-            total_lessons = 0
-            completed_lessons = 0
-            
-            for module in course.modules:
-                module_lessons = Lesson.query.filter_by(module_id=module.id).all()
-                total_lessons += len(module_lessons)
-                
-                for lesson in module_lessons:
-                    progress = Progress.query.filter_by(
-                        enrollment_id=enrollment.id,
-                        lesson_id=lesson.id,
-                        completed=True
-                    ).first()
-                    
-                    if progress:
-                        completed_lessons += 1
+            total_lessons = lesson_totals.get(course.id, 0)
+            completed_lessons = completed_totals.get(enrollment.id, 0)
             
             progress_percent = 0
             if total_lessons > 0:
@@ -1,28 +1,31 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db, User
-from src.models.course import Course, Category, Review, Enrollment
-from src.models.payment import Payment, Cart, CartItem, Coupon
+from src.models.course import Course, Enrollment
+from src.models.payment import Payment
 from src.routes.auth import token_required
+from src.services.db_routing import read_replica
+from src.services.coupon_cache import get_coupon
+from src.services.idempotency import idempotent
+from src.services.webhooks import (
+    InvalidWebhook, enqueue_event, parse_pagseguro_event, parse_stripe_event,
+    verify_pagseguro_signature, verify_stripe_signature
+)
+from src.services.gateway import GatewayError, GatewayUnavailable, get_pagseguro_client, get_stripe_client
+from src.services.cart_store import cart_store, cart_item_from_course, cart_total, cart_to_dict, persist_cart
 from datetime import datetime
-import stripe
-import os
+import hashlib
+import uuid
 
 payment_bp = Blueprint('payment', __name__)
 
-# Configuração do Stripe (simulada)
-stripe.api_key = os.getenv('STRIPE_API_KEY', 'sk_test_example')
+# A configuração dos gateways (chaves, timeouts, modo simulado) fica em src/services/gateway.py
 
 @payment_bp.route('/cart', methods=['GET'])
 @token_required
 def get_cart(current_user):
-    cart = Cart.query.filter_by(user_id=current_user.id).first()
-    
-    if not cart:
-        cart = Cart(user_id=current_user.id)
-        db.session.add(cart)
-        db.session.commit()
-    
-    return jsonify(cart.to_dict()), 200
+    # O carrinho fica no cart_store até o checkout; abrir o carrinho não escreve no banco
+    cart = cart_store.get(current_user.id)
+    return jsonify(cart_to_dict(cart)), 200
 
 @payment_bp.route('/cart/add', methods=['POST'])
 @token_required
@@ -45,57 +48,47 @@ def add_to_cart(current_user):
     if enrollment:
         return jsonify({'message': 'Você já está matriculado neste curso!'}), 400
     
-    # Busca ou cria o carrinho do usuário
-    cart = Cart.query.filter_by(user_id=current_user.id).first()
-    if not cart:
-        cart = Cart(user_id=current_user.id)
-        db.session.add(cart)
-        db.session.commit()
-    
-    # Verifica se o curso já está no carrinho
-    existing_item = CartItem.query.filter_by(
-        cart_id=cart.id,
-        course_id=course.id
-    ).first()
+    item = cart_item_from_course(course)
+    cart = cart_store.add_item(current_user.id, item)
     
-    if existing_item:
+    if cart is None:
         return jsonify({'message': 'Este curso já está no seu carrinho!'}), 400
     
-    # Adiciona o curso ao carrinho
-    price = course.discount_price if course.discount_price else course.price
-    cart_item = CartItem(
-        cart_id=cart.id,
-        course_id=course.id,
-        price=price
-    )
-    
-    db.session.add(cart_item)
-    db.session.commit()
-    
+    # Retorna apenas o item adicionado e o novo total
     return jsonify({
         'message': 'Curso adicionado ao carrinho!',
-        'cart': cart.to_dict()
+        'item': item,
+        'total': cart_total(cart)
     }), 201
 
 @payment_bp.route('/cart/remove/<int:item_id>', methods=['DELETE'])
 @token_required
 def remove_from_cart(current_user, item_id):
-    cart = Cart.query.filter_by(user_id=current_user.id).first()
-    
-    if not cart:
-        return jsonify({'message': 'Carrinho não encontrado!'}), 404
+    # item_id é o 'id' do item retornado em /cart
+    cart = cart_store.remove_item(current_user.id, item_id=item_id)
     
-    cart_item = CartItem.query.filter_by(id=item_id, cart_id=cart.id).first()
-    
-    if not cart_item:
+    if cart is None:
         return jsonify({'message': 'Item não encontrado no carrinho!'}), 404
     
-    db.session.delete(cart_item)
-    db.session.commit()
+    # Retorna apenas o item removido e o novo total
+    return jsonify({
+        'message': 'Item removido do carrinho!',
+        'removed_item_id': item_id,
+        'total': cart_total(cart)
+    }), 200
+
+@payment_bp.route('/cart/courses/<int:course_id>', methods=['DELETE'])
+@token_required
+def remove_course_from_cart(current_user, course_id):
+    cart = cart_store.remove_item(current_user.id, course_id=course_id)
+    
+    if cart is None:
+        return jsonify({'message': 'Curso não encontrado no carrinho!'}), 404
     
     return jsonify({
         'message': 'Item removido do carrinho!',
-        'cart': cart.to_dict()
+        'removed_course_id': course_id,
+        'total': cart_total(cart)
     }), 200
 
 @payment_bp.route('/apply-coupon', methods=['POST'])
@@ -106,7 +99,8 @@ def apply_coupon(current_user):
     if not data or not data.get('code'):
         return jsonify({'message': 'Código do cupom não fornecido!'}), 400
     
-    coupon = Coupon.query.filter_by(code=data['code']).first()
+    # Consulta o cache em memória (inclusive para códigos inexistentes)
+    coupon = get_coupon(data['code'])
     
     if not coupon:
         return jsonify({'message': 'Cupom não encontrado!'}), 404
@@ -122,44 +116,87 @@ def apply_coupon(current_user):
         'coupon': coupon.to_dict()
     }), 200
 
+def _payment_reference(prefix, user_id, idempotency_key=None):
+    # O webhook localiza os pagamentos por este ID. Sem chave de idempotência
+    # o sufixo é aleatório; com ela, a referência é a mesma em todas as
+    # retentativas, para que o gateway receba os mesmos parâmetros
+    if not idempotency_key:
+        return prefix + datetime.now().strftime('%Y%m%d%H%M%S') + uuid.uuid4().hex[:8].upper()
+
+    base = prefix + hashlib.sha256(f'{user_id}:{idempotency_key}'.encode()).hexdigest()[:20].upper()
+    reference = base
+    generation = 1
+    # Pagamentos com a referência indicam que a chave já concluiu uma compra e
+    # expirou; a nova compra recebe outra referência
+    while Payment.query.filter_by(payment_id=reference).first():
+        generation += 1
+        reference = f'{base}-{generation}'
+    return reference
+
+def _gateway_idempotency_key(user_id, idempotency_key, reference):
+    # A chave enviada ao gateway é derivada da do cliente e da referência:
+    # chaves iguais de usuários diferentes não colidem no gateway
+    if not idempotency_key:
+        return None
+    return hashlib.sha256(f'{user_id}:{idempotency_key}:{reference}'.encode()).hexdigest()
+
+def _create_pending_payments(current_user, cart, payment_method, reference):
+    # Cria os registros de pagamento no banco em um único INSERT
+    db.session.execute(db.insert(Payment), [
+        {
+            'amount': item.price,
+            'status': 'pending',
+            'payment_method': payment_method,
+            'payment_id': reference,
+            'user_id': current_user.id,
+            'course_id': item.course_id
+        }
+        for item in cart.items
+    ])
+    db.session.commit()
+
 @payment_bp.route('/checkout/stripe', methods=['POST'])
 @token_required
+@idempotent
 def stripe_checkout(current_user):
-    cart = Cart.query.filter_by(user_id=current_user.id).first()
+    # O carrinho só é gravado em Cart/CartItem quando o checkout começa
+    cart = persist_cart(current_user.id)
     
     if not cart or not cart.items:
         return jsonify({'message': 'Carrinho vazio!'}), 400
     
+    idempotency_key = request.headers.get('Idempotency-Key')
+    reference = _payment_reference('STR', current_user.id, idempotency_key)
+    
     try:
-        # Criação do checkout do Stripe (simulado)
-        checkout_session = {
-            'id': 'cs_test_' + datetime.now().strftime('%Y%m%d%H%M%S'),
-            'payment_status': 'unpaid',
-            'url': 'https://checkout.stripe.com/example',
-            'amount_total': int(cart.total() * 100)  # Stripe usa centavos
-        }
-        
-        # Em uma implementação real, usaríamos:
-        # checkout_session = stripe.checkout.Session.create(
-        #     payment_method_types=['card'],
-        #     line_items=[...],
-        #     mode='payment',
-        #     success_url='...',
-        #     cancel_url='...'
-        # )
-        
-        return jsonify({
-            'checkout_url': checkout_session['url'],
-            'session_id': checkout_session['id']
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'message': f'Erro ao processar pagamento: {str(e)}'}), 500
+        checkout_session = get_stripe_client().create_checkout_session(
+            reference=reference,
+            amount_cents=int(round(cart.total() * 100)),  # Stripe usa centavos
+            currency='BRL',
+            success_url=request.host_url + 'checkout/sucesso',
+            cancel_url=request.host_url + 'checkout/cancelado',
+            idempotency_key=_gateway_idempotency_key(current_user.id, idempotency_key, reference)
+        )
+    except GatewayUnavailable as e:
+        return jsonify({'message': str(e)}), 503
+    except GatewayError as e:
+        return jsonify({'message': f'Erro ao processar pagamento: {str(e)}'}), 502
+    
+    _create_pending_payments(current_user, cart, 'credit_card', reference)
+    # Os itens seguem nos pagamentos pendentes; o carrinho recomeça vazio
+    cart_store.clear(current_user.id)
+    
+    return jsonify({
+        'checkout_url': checkout_session['url'],
+        'session_id': checkout_session['id']
+    }), 200
 
 @payment_bp.route('/checkout/pagseguro', methods=['POST'])
 @token_required
+@idempotent
 def pagseguro_checkout(current_user):
-    cart = Cart.query.filter_by(user_id=current_user.id).first()
+    # O carrinho só é gravado em Cart/CartItem quando o checkout começa
+    cart = persist_cart(current_user.id)
     
     if not cart or not cart.items:
         return jsonify({'message': 'Carrinho vazio!'}), 400
@@ -168,67 +205,108 @@ def pagseguro_checkout(current_user):
     if not payment_method or payment_method not in ['pix', 'boleto', 'credit_card']:
         return jsonify({'message': 'Método de pagamento inválido!'}), 400
     
+    idempotency_key = request.headers.get('Idempotency-Key')
+    reference = _payment_reference('PAG', current_user.id, idempotency_key)
+    
     try:
-        # Simulação de integração com PagSeguro
-        payment_info = {
-            'id': 'PAG' + datetime.now().strftime('%Y%m%d%H%M%S'),
-            'status': 'pending',
-            'payment_method': payment_method,
-            'amount': cart.total(),
-            'currency': 'BRL'
-        }
-        
-        # Cria registro de pagamento no banco
-        for item in cart.items:
-            payment = Payment(
-                amount=item.price,
-                status='pending',
-                payment_method=payment_method,
-                payment_id=payment_info['id'],
-                user_id=current_user.id,
-                course_id=item.course_id
-            )
-            db.session.add(payment)
-        
-        db.session.commit()
-        
-        # Retorna informações de pagamento simuladas
-        if payment_method == 'pix':
-            return jsonify({
-                'payment_id': payment_info['id'],
-                'qr_code': 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==',
-                'expiration': '30 minutos'
-            }), 200
-        elif payment_method == 'boleto':
-            return jsonify({
-                'payment_id': payment_info['id'],
-                'boleto_url': 'https://exemplo.com/boleto',
-                'barcode': '23790123456789012345678901234567890123456789'
-            }), 200
-        else:  # credit_card
-            return jsonify({
-                'payment_id': payment_info['id'],
-                'redirect_url': 'https://exemplo.com/pagamento'
-            }), 200
-            
-    except Exception as e:
-        return jsonify({'message': f'Erro ao processar pagamento: {str(e)}'}), 500
+        order = get_pagseguro_client().create_order(
+            reference=reference,
+            amount_cents=int(round(cart.total() * 100)),
+            payment_method=payment_method,
+            customer={
+                'name': f"{current_user.first_name or ''} {current_user.last_name or ''}".strip() or current_user.username,
+                'email': current_user.email
+            },
+            idempotency_key=_gateway_idempotency_key(current_user.id, idempotency_key, reference)
+        )
+    except GatewayUnavailable as e:
+        return jsonify({'message': str(e)}), 503
+    except GatewayError as e:
+        return jsonify({'message': f'Erro ao processar pagamento: {str(e)}'}), 502
+    
+    _create_pending_payments(current_user, cart, payment_method, reference)
+    cart_store.clear(current_user.id)
+    
+    if payment_method == 'pix':
+        return jsonify({
+            'payment_id': reference,
+            'qr_code': order.get('qr_code'),
+            'expiration': order.get('expiration')
+        }), 200
+    elif payment_method == 'boleto':
+        return jsonify({
+            'payment_id': reference,
+            'boleto_url': order.get('boleto_url'),
+            'barcode': order.get('barcode')
+        }), 200
+    else:  # credit_card
+        return jsonify({
+            'payment_id': reference,
+            'redirect_url': order.get('redirect_url')
+        }), 200
 
 @payment_bp.route('/webhook/stripe', methods=['POST'])
 def stripe_webhook():
-    # Implementação futura para webhook do Stripe
-    return jsonify({'received': True}), 200
+    return _receive_webhook('stripe', verify_stripe_signature, parse_stripe_event, 'Stripe-Signature')
 
 @payment_bp.route('/webhook/pagseguro', methods=['POST'])
 def pagseguro_webhook():
-    # Implementação futura para webhook do PagSeguro
+    return _receive_webhook('pagseguro', verify_pagseguro_signature, parse_pagseguro_event, 'x-authenticity-token')
+
+def _receive_webhook(gateway, verify, parse, signature_header):
+    # Apenas valida e enfileira o evento; o worker (flask webhooks worker)
+    # atualiza os pagamentos e cria as matrículas em lote
+    payload = request.get_data()
+    
+    try:
+        verify(payload, request.headers.get(signature_header))
+        parsed = parse(payload)
+    except InvalidWebhook as e:
+        return jsonify({'message': f'Webhook inválido: {str(e)}'}), 400
+    
+    if parsed is not None:
+        enqueue_event(gateway, payload, parsed)
+    
     return jsonify({'received': True}), 200
 
 @payment_bp.route('/payment-history', methods=['GET'])
+@read_replica
 @token_required
 def payment_history(current_user):
-    payments = Payment.query.filter_by(user_id=current_user.id).all()
-    return jsonify([payment.to_dict() for payment in payments]), 200
+    # Paginação por cursor (keyset) do mais recente para o mais antigo,
+    # atendida pelo índice (user_id, created_at, id)
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    cursor = request.args.get('cursor')
+    
+    query = Payment.query.filter(Payment.user_id == current_user.id)
+    
+    if cursor:
+        try:
+            created_at_str, last_id = cursor.rsplit('_', 1)
+            created_at = datetime.fromisoformat(created_at_str)
+            last_id = int(last_id)
+        except ValueError:
+            return jsonify({'message': 'Cursor inválido!'}), 400
+        
+        query = query.filter(
+            db.tuple_(Payment.created_at, Payment.id) < db.tuple_(created_at, last_id)
+        )
+    
+    payments = query.order_by(
+        Payment.created_at.desc(),
+        Payment.id.desc()
+    ).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(payments) > limit:
+        payments = payments[:limit]
+        last = payments[-1]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+    
+    return jsonify({
+        'payments': [payment.to_dict() for payment in payments],
+        'next_cursor': next_cursor
+    }), 200
 
 @payment_bp.route('/payment/<payment_id>', methods=['GET'])
 @token_required
@@ -0,0 +1,225 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from src.services.delivery import IMMUTABLE_MAX_AGE, deliver_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Manifesto dos arquivos de src/static montado uma vez na inicialização.
+# Cada arquivo ganha um nome com hash do conteúdo (app.css -> app.3f2a9c1b7d4e.css),
+# servido com cache imutável, e variantes gzip/brotli pré-comprimidas; as
+# requisições são resolvidas em memória, sem consultar o disco.
+# As variantes .gz/.br são geradas no build ("flask assets build"), não na
+# inicialização; sem elas, os arquivos são servidos sem compressão.
+
+# Pastas com conteúdo enviado em tempo de execução, servidas por outras rotas
+EXCLUDED_DIRS = {'materials', 'certificates'}
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json',
+                      'application/xml', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 1024
+# Níveis usados no build e, mais rápidos, para o index.html reescrito na inicialização
+BUILD_GZIP_LEVEL = 9
+BUILD_BROTLI_QUALITY = 11
+RUNTIME_GZIP_LEVEL = 6
+RUNTIME_BROTLI_QUALITY = 5
+# Arquivos maiores que isso ficam em disco e são servidos por deliver_file
+MAX_IN_MEMORY_SIZE = 1024 ** 2
+# Valores dos atributos src/href (entre aspas duplas, simples ou sem aspas)
+URL_ATTRIBUTE = re.compile(
+    r'''(?P<prefix>[\s<](?:src|href)\s*=\s*)(?:"(?P<double>[^"]*)"|'(?P<single>[^']*)'|(?P<bare>[^\s"'=<>`]+))''',
+    re.IGNORECASE
+)
+
+
+def static_files(root):
+    # (caminho completo, caminho relativo) dos arquivos servidos pelo manifesto
+    for directory, dirnames, filenames in os.walk(root):
+        if directory == root:
+            dirnames[:] = [name for name in dirnames if name not in EXCLUDED_DIRS]
+        for filename in filenames:
+            if filename.endswith(('.gz', '.br')):
+                continue
+            full_path = os.path.join(directory, filename)
+            yield full_path, os.path.relpath(full_path, root).replace(os.sep, '/')
+
+
+def compress(data, mimetype, gzip_level=BUILD_GZIP_LEVEL, brotli_quality=BUILD_BROTLI_QUALITY):
+    # Variantes comprimidas que realmente ficaram menores que o original
+    if len(data) < MIN_COMPRESS_SIZE or not mimetype.startswith(COMPRESSIBLE_TYPES):
+        return {}
+    variants = {'gzip': gzip.compress(data, compresslevel=gzip_level, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=brotli_quality)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def compress_static(root):
+    # Grava as variantes .gz/.br ao lado de cada arquivo e remove as que não
+    # compensam mais. Retorna quantos arquivos ganharam variantes.
+    compressed = 0
+    for full_path, relative_path in static_files(root):
+        if os.path.getsize(full_path) > MAX_IN_MEMORY_SIZE:
+            continue
+        with open(full_path, 'rb') as fileobj:
+            data = fileobj.read()
+        mimetype = mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+        variants = compress(data, mimetype)
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            if encoding in variants:
+                with open(full_path + suffix, 'wb') as fileobj:
+                    fileobj.write(variants[encoding])
+            elif os.path.exists(full_path + suffix):
+                os.remove(full_path + suffix)
+        compressed += bool(variants)
+    return compressed
+
+
+class Asset:
+    __slots__ = ('path', 'fingerprinted', 'mimetype', 'etag', 'variants')
+
+    def __init__(self, path, fingerprinted, mimetype, etag, variants):
+        self.path = path
+        self.fingerprinted = fingerprinted
+        self.mimetype = mimetype
+        self.etag = etag
+        self.variants = variants  # codificação -> bytes ('identity', 'gzip', 'br')
+
+
+class AssetManifest:
+
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}
+        self._by_fingerprint = {}
+
+    def build(self):
+        assets = {}
+        for full_path, relative_path in static_files(self.root):
+            assets[relative_path] = self._load(full_path, relative_path)
+
+        self._rewrite_index(assets)
+        self.assets = assets
+        self._by_fingerprint = {asset.fingerprinted: asset for asset in assets.values()}
+        return self
+
+    def resolve(self, path):
+        # Retorna (asset, se o caminho pedido é o nome com hash)
+        asset = self._by_fingerprint.get(path)
+        if asset is not None:
+            return asset, True
+        return self.assets.get(path), False
+
+    def to_json(self):
+        return json.dumps({path: asset.fingerprinted for path, asset in self.assets.items()}, sort_keys=True)
+
+    def response(self, asset, fingerprinted):
+        if 'identity' not in asset.variants:
+            # Arquivo grande: servido do disco com Range
+            return deliver_file(self.root, asset.path, immutable=fingerprinted,
+                                max_age=None if fingerprinted else 0)
+
+        encoding = self._choose_encoding(asset)
+        response = current_app.response_class(asset.variants[encoding], mimetype=asset.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        if len(asset.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        # ETag forte distinto por representação
+        response.set_etag(asset.etag if encoding == 'identity' else f'{asset.etag}-{encoding}')
+
+        if fingerprinted:
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    @staticmethod
+    def _choose_encoding(asset):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and accepted[encoding]:
+                return encoding
+        return 'identity'
+
+    def _load(self, full_path, relative_path):
+        with open(full_path, 'rb') as fileobj:
+            data = fileobj.read()
+
+        digest = hashlib.sha256(data).hexdigest()
+        mimetype = mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+        name, dot, extension = relative_path.rpartition('.')
+        fingerprinted = f'{name}.{digest[:12]}.{extension}' if dot else f'{relative_path}.{digest[:12]}'
+
+        variants = {}
+        if len(data) <= MAX_IN_MEMORY_SIZE:
+            variants['identity'] = data
+            variants.update(self._prebuilt_variants(data, full_path))
+        return Asset(relative_path, fingerprinted, mimetype, digest[:32], variants)
+
+    @staticmethod
+    def _prebuilt_variants(data, full_path):
+        # Variantes gravadas pelo build (flask assets build ou o build do
+        # frontend). Arquivos mais antigos que o original estão desatualizados.
+        variants = {}
+        modified = os.path.getmtime(full_path)
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            path = full_path + suffix
+            if os.path.exists(path) and os.path.getmtime(path) >= modified:
+                with open(path, 'rb') as fileobj:
+                    variants[encoding] = fileobj.read()
+        return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+    def _rewrite_index(self, assets):
+        # Faz o index.html referenciar os nomes com hash dos demais arquivos
+        index = assets.get('index.html')
+        if index is None or 'identity' not in index.variants:
+            return
+
+        def rewrite(match):
+            url = match.group('double')
+            quote = '"'
+            if url is None:
+                url, quote = match.group('single'), "'"
+            if url is None:
+                url, quote = match.group('bare'), ''
+
+            # Apenas URLs absolutas do próprio site; query e fragmento são mantidos
+            path, suffix = re.match(r'([^?#]*)(.*)', url, re.DOTALL).groups()
+            if path.startswith('/static/'):
+                path = path[len('/static'):]
+            asset = assets.get(path[1:]) if path.startswith('/') and path[1:] != 'index.html' else None
+            if asset is None:
+                return match.group(0)
+            return f"{match.group('prefix')}{quote}/{asset.fingerprinted}{suffix}{quote}"
+
+        # Só os valores de src/href: o mesmo caminho em texto ou em scripts inline
+        # não é alterado
+        html = URL_ATTRIBUTE.sub(rewrite, index.variants['identity'].decode('utf-8'))
+
+        data = html.encode('utf-8')
+        if data != index.variants['identity']:
+            index.variants = {'identity': data}
+            # Pequeno e gerado aqui: comprimido com níveis rápidos
+            index.variants.update(compress(data, index.mimetype, RUNTIME_GZIP_LEVEL, RUNTIME_BROTLI_QUALITY))
+            index.etag = hashlib.sha256(data).hexdigest()[:32]
+
+
+assets_cli = AppGroup('assets', help='Arquivos estáticos.')
+
+
+@assets_cli.command('build')
+def build_command():
+    """Gera as variantes gzip/brotli dos arquivos estáticos (rodar a cada deploy)."""
+    compressed = compress_static(current_app.static_folder)
+    click.echo(f'{compressed} arquivos comprimidos em {current_app.static_folder}.')
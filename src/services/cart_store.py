@@ -0,0 +1,363 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from src.models.user import db
+from src.models.course import Course
+from src.models.payment import Cart, CartItem
+
+# Carrinhos abandonados expiram após CART_TTL segundos sem alteração
+CART_TTL = int(os.getenv('CART_TTL', 3 * 24 * 3600))
+# memory: apenas no processo atual (um único worker / desenvolvimento)
+# local: SQLite local compartilhado por todos os workers do mesmo host
+# database: tabelas Cart/CartItem (deploy com vários hosts)
+CART_STORE = os.getenv('CART_STORE', 'local')
+CART_STORE_PATH = os.getenv(
+    'CART_STORE_PATH',
+    os.path.join(tempfile.gettempdir(), 'ia_cursos_carts.sqlite3')
+)
+
+
+def _new_cart(user_id):
+    now = datetime.utcnow().isoformat()
+    return {
+        'user_id': user_id,
+        'items': [],
+        'next_item_id': 1,
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+class CartStore(ABC):
+    # Guarda carrinhos fora do banco principal até o início do checkout.
+    # Cada carrinho é um dict com 'user_id', 'items', 'created_at' e
+    # 'updated_at'; cada item tem o formato compacto de CartItem.summary_from_row.
+    # O 'id' do item é próprio do carrinho (como o ID de CartItem), distinto
+    # do ID do curso.
+
+    def __init__(self, ttl=CART_TTL):
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, user_id):
+        pass
+
+    @abstractmethod
+    def add_item(self, user_id, item):
+        # Preenche item['id'] e retorna o carrinho atualizado, ou None se o
+        # curso já estiver nele
+        pass
+
+    @abstractmethod
+    def remove_item(self, user_id, item_id=None, course_id=None):
+        # Remove pelo ID do item ou do curso; retorna o carrinho atualizado
+        # ou None se o item não existir
+        pass
+
+    @abstractmethod
+    def clear(self, user_id):
+        pass
+
+    @staticmethod
+    def _add(cart, item):
+        if any(existing['course_id'] == item['course_id'] for existing in cart['items']):
+            return False
+        # Carrinhos gravados antes do contador usam o maior ID existente
+        next_id = cart.get('next_item_id') or max((existing['id'] for existing in cart['items']), default=0) + 1
+        item['id'] = next_id
+        cart['next_item_id'] = next_id + 1
+        cart['items'].append(item)
+        cart['updated_at'] = datetime.utcnow().isoformat()
+        return True
+
+    @staticmethod
+    def _remove(cart, item_id=None, course_id=None):
+        if item_id is not None:
+            items = [item for item in cart['items'] if item['id'] != item_id]
+        else:
+            items = [item for item in cart['items'] if item['course_id'] != course_id]
+        if len(items) == len(cart['items']):
+            return False
+        cart['items'] = items
+        cart['updated_at'] = datetime.utcnow().isoformat()
+        return True
+
+
+class MemoryCartStore(CartStore):
+
+    def __init__(self, ttl=CART_TTL, max_carts=100000):
+        super().__init__(ttl)
+        self.max_carts = max_carts
+        self._carts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            cart = self._get(user_id)
+            return _copy(cart) if cart else _new_cart(user_id)
+
+    def add_item(self, user_id, item):
+        with self._lock:
+            cart = self._get(user_id) or _new_cart(user_id)
+            if not self._add(cart, item):
+                return None
+            self._put(user_id, cart)
+            return _copy(cart)
+
+    def remove_item(self, user_id, item_id=None, course_id=None):
+        with self._lock:
+            cart = self._get(user_id)
+            if not cart or not self._remove(cart, item_id, course_id):
+                return None
+            self._put(user_id, cart)
+            return _copy(cart)
+
+    def clear(self, user_id):
+        with self._lock:
+            self._carts.pop(user_id, None)
+
+    def _get(self, user_id):
+        entry = self._carts.get(user_id)
+        if entry is None:
+            return None
+        expires_at, cart = entry
+        if expires_at < time.time():
+            del self._carts[user_id]
+            return None
+        return cart
+
+    def _put(self, user_id, cart):
+        self._carts[user_id] = (time.time() + self.ttl, cart)
+        self._carts.move_to_end(user_id)
+        # Remove os carrinhos menos recentes quando o limite é atingido
+        while len(self._carts) > self.max_carts:
+            self._carts.popitem(last=False)
+
+
+class LocalCartStore(CartStore):
+    # KV local em SQLite (modo WAL), compartilhado entre os workers do Gunicorn
+    # no mesmo host. Nenhuma escrita chega ao banco principal.
+
+    def __init__(self, path=CART_STORE_PATH, ttl=CART_TTL):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+
+    def get(self, user_id):
+        conn = self._connection()
+        cart = self._get(conn, user_id)
+        return cart or _new_cart(user_id)
+
+    def add_item(self, user_id, item):
+        conn = self._connection()
+        with _Transaction(conn):
+            cart = self._get(conn, user_id) or _new_cart(user_id)
+            if not self._add(cart, item):
+                return None
+            self._put(conn, user_id, cart)
+        return cart
+
+    def remove_item(self, user_id, item_id=None, course_id=None):
+        conn = self._connection()
+        with _Transaction(conn):
+            cart = self._get(conn, user_id)
+            if not cart or not self._remove(cart, item_id, course_id):
+                return None
+            self._put(conn, user_id, cart)
+        return cart
+
+    def clear(self, user_id):
+        conn = self._connection()
+        with _Transaction(conn):
+            conn.execute('DELETE FROM carts WHERE user_id = ?', (user_id,))
+
+    def _connection(self):
+        # Uma conexão por thread e por processo (os workers são criados via fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS carts ('
+                'user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, conn, user_id):
+        row = conn.execute(
+            'SELECT data FROM carts WHERE user_id = ? AND expires_at >= ?',
+            (user_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _put(self, conn, user_id, cart):
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO carts (user_id, data, expires_at) VALUES (?, ?, ?)',
+            (user_id, json.dumps(cart), now + self.ttl)
+        )
+        # Limpeza ocasional dos carrinhos expirados
+        if random.random() < 0.01:
+            conn.execute('DELETE FROM carts WHERE expires_at < ?', (now,))
+
+
+class DatabaseCartStore(CartStore):
+    # Implementação sobre Cart/CartItem, para quando os workers não
+    # compartilham disco. O TTL não se aplica: os carrinhos ficam no banco.
+
+    def get(self, user_id):
+        cart = Cart.query.filter_by(user_id=user_id).first()
+        if not cart:
+            return _new_cart(user_id)
+        return self._to_store_dict(cart)
+
+    def add_item(self, user_id, item):
+        cart = Cart.query.filter_by(user_id=user_id).first()
+        if not cart:
+            cart = Cart(user_id=user_id)
+            db.session.add(cart)
+            db.session.flush()
+        elif CartItem.query.filter_by(cart_id=cart.id, course_id=item['course_id']).first():
+            return None
+
+        cart_item = CartItem(cart_id=cart.id, course_id=item['course_id'], price=item['price'])
+        db.session.add(cart_item)
+        db.session.commit()
+        item['id'] = cart_item.id
+        return self._to_store_dict(cart)
+
+    def remove_item(self, user_id, item_id=None, course_id=None):
+        cart = Cart.query.filter_by(user_id=user_id).first()
+        if not cart:
+            return None
+
+        query = CartItem.query.filter_by(cart_id=cart.id)
+        if item_id is not None:
+            query = query.filter_by(id=item_id)
+        else:
+            query = query.filter_by(course_id=course_id)
+        deleted = query.delete()
+        if not deleted:
+            return None
+        db.session.commit()
+        return self._to_store_dict(cart)
+
+    def clear(self, user_id):
+        cart = Cart.query.filter_by(user_id=user_id).first()
+        if cart:
+            CartItem.query.filter_by(cart_id=cart.id).delete()
+            db.session.commit()
+
+    @staticmethod
+    def _to_store_dict(cart):
+        summary = cart.to_summary_dict()
+        return {
+            'user_id': cart.user_id,
+            'items': summary['items'],
+            'created_at': cart.created_at.isoformat(),
+            'updated_at': cart.updated_at.isoformat()
+        }
+
+
+class _Transaction:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def _copy(cart):
+    return dict(cart, items=list(cart['items']))
+
+
+def create_cart_store(kind=CART_STORE):
+    if kind == 'memory':
+        return MemoryCartStore()
+    if kind == 'local':
+        return LocalCartStore()
+    if kind == 'database':
+        return DatabaseCartStore()
+    raise ValueError(f'CART_STORE inválido: {kind}')
+
+
+cart_store = create_cart_store()
+
+
+def cart_item_from_course(course):
+    # O ID do item é atribuído pelo cart_store ao adicionar
+    return {
+        'id': None,
+        'price': course.discount_price if course.discount_price else course.price,
+        'course_id': course.id,
+        'course': {
+            'id': course.id,
+            'title': course.title,
+            'image_url': course.image_url,
+            'price': course.price
+        }
+    }
+
+
+def cart_total(cart):
+    return sum(item['price'] for item in cart['items'])
+
+
+def cart_to_dict(cart):
+    data = {key: value for key, value in cart.items() if key != 'next_item_id'}
+    data['total'] = cart_total(cart)
+    return data
+
+
+def remove_purchased(purchases):
+    # Tira dos carrinhos os cursos já matriculados (pares (user_id, course_id)).
+    # Chamado depois do commit das matrículas: uma falha aqui não desfaz a compra.
+    for user_id, course_id in purchases:
+        cart_store.remove_item(user_id, course_id=course_id)
+
+
+def persist_cart(user_id):
+    # Materializa o carrinho em Cart/CartItem no início do checkout. Os preços
+    # são relidos do banco para refletir alterações feitas desde a adição.
+    stored = cart_store.get(user_id)
+    course_ids = [item['course_id'] for item in stored['items']]
+    if not course_ids:
+        return None
+
+    courses = Course.query.filter(Course.id.in_(course_ids)).all()
+    if not courses:
+        return None
+
+    cart = Cart.query.filter_by(user_id=user_id).first()
+    if not cart:
+        cart = Cart(user_id=user_id)
+        db.session.add(cart)
+        db.session.flush()
+    else:
+        CartItem.query.filter_by(cart_id=cart.id).delete()
+
+    for course in courses:
+        db.session.add(CartItem(
+            cart_id=cart.id,
+            course_id=course.id,
+            price=course.discount_price if course.discount_price else course.price
+        ))
+
+    db.session.commit()
+    return cart
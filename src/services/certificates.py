@@ -0,0 +1,278 @@
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from src.models.user import db, User
+from src.models.course import Course, Enrollment
+from src.models.payment import Certificate, CertificateJob
+from src.services.storage import CERTIFICATES_URL_PREFIX, certificates_dir
+
+CERTIFICATE_PROCESSES = int(os.getenv('CERTIFICATE_PROCESSES', os.cpu_count() or 2))
+# Quantos certificados são gravados no banco por commit
+CERTIFICATE_BATCH_SIZE = 200
+# Segundos sem renovação até um job 'running' ser considerado abandonado
+CERTIFICATE_JOB_LEASE = int(os.getenv('CERTIFICATE_JOB_LEASE', 15 * 60))
+# Modelo alternativo (fluxo de conteúdo PDF com marcadores {{campo}})
+CERTIFICATE_TEMPLATE = os.getenv('CERTIFICATE_TEMPLATE')
+
+DEFAULT_TEMPLATE = """BT
+/F1 30 Tf 200 470 Td (Certificado de Conclusao) Tj
+/F1 16 Tf -80 -60 Td (Certificamos que) Tj
+/F1 24 Tf 0 -40 Td ({{name}}) Tj
+/F1 16 Tf 0 -40 Td (concluiu o curso) Tj
+/F1 20 Tf 0 -35 Td ({{course}}) Tj
+/F1 12 Tf 0 -60 Td (Emitido em {{date}} - Codigo {{code}}) Tj
+ET
+"""
+
+_PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+# Modelo já analisado, carregado uma vez por processo do pool
+_template = None
+
+
+def parse_template(source):
+    # Separa o modelo em trechos fixos e nomes de campos; renderizar passa a
+    # ser apenas juntar os trechos, sem reprocessar o modelo a cada certificado
+    parts = _PLACEHOLDER.split(source)
+    return [(part.encode('latin-1'), None) if i % 2 == 0 else (None, part)
+            for i, part in enumerate(parts)]
+
+
+def _init_worker(template_path):
+    global _template
+    source = DEFAULT_TEMPLATE
+    if template_path:
+        with open(template_path, encoding='latin-1') as fileobj:
+            source = fileobj.read()
+    _template = parse_template(source)
+
+
+def _pdf_text(value):
+    text = str(value).encode('latin-1', 'replace')
+    return text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def build_pdf(template, fields):
+    content = b''.join(literal if name is None else _pdf_text(fields[name])
+                       for literal, name in template)
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 842 595] '
+        b'/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream'
+    ]
+
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+
+    xref_offset = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b'%010d 00000 n \n' % offset
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref_offset)
+    return bytes(pdf)
+
+
+def render_certificate(item):
+    # Executado nos processos do pool: gera o PDF e grava em CERTIFICATES_DIR
+    filename = f"certificate_{item['user_id']}_{item['course_id']}_{item['code']}.pdf"
+    path = os.path.join(item['output_dir'], filename)
+    data = build_pdf(_template, item)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as fileobj:
+        fileobj.write(data)
+    os.replace(tmp_path, path)
+    return item['user_id'], item['course_id'], f'{CERTIFICATES_URL_PREFIX}{filename}'
+
+
+def _pending_certificates(job):
+    # Matrículas concluídas ainda sem certificado, com os dados para o PDF, em uma consulta
+    query = db.session.query(
+        Enrollment.user_id, User.first_name, User.last_name, User.username
+    ).join(
+        User, User.id == Enrollment.user_id
+    ).outerjoin(
+        Certificate, db.and_(
+            Certificate.user_id == Enrollment.user_id,
+            Certificate.course_id == Enrollment.course_id
+        )
+    ).filter(
+        Enrollment.course_id == job.course_id,
+        Enrollment.completed == True,
+        Certificate.id.is_(None)
+    )
+
+    if job.user_id is not None:
+        query = query.filter(Enrollment.user_id == job.user_id)
+
+    return query.all()
+
+
+def _insert_certificates():
+    # INSERT que ignora certificados já emitidos (restrição uq_certificate_user_course),
+    # por exemplo por um job individual e um da turma rodando ao mesmo tempo
+    dialect = db.session.get_bind(Certificate.__mapper__).dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'Banco não suportado para emissão de certificados: {dialect}')
+    return insert(Certificate).on_conflict_do_nothing(index_elements=['user_id', 'course_id'])
+
+
+def _save_certificates(job, results):
+    now = datetime.utcnow()
+    # RETURNING traz só as linhas inseridas, não as ignoradas pelo ON CONFLICT
+    inserted = set(db.session.execute(
+        _insert_certificates().returning(Certificate.user_id, Certificate.course_id),
+        [{'user_id': user_id, 'course_id': course_id, 'certificate_url': url, 'issue_date': now}
+         for user_id, course_id, url in results]
+    ).all())
+    job.completed += len(inserted)
+    # Renova o lease
+    job.started_at = now
+    db.session.commit()
+
+    # PDFs de certificados que outro job emitiu antes: nenhum registro aponta para eles
+    for user_id, course_id, url in results:
+        if (user_id, course_id) not in inserted:
+            _remove_file(url)
+
+
+def _remove_file(url):
+    try:
+        os.remove(os.path.join(certificates_dir(), url[len(CERTIFICATES_URL_PREFIX):]))
+    except OSError:
+        pass
+
+
+def process_job(job, executor):
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    # Um job reenfileirado recomeça a contagem: os já emitidos não entram de novo
+    job.completed = 0
+    db.session.commit()
+
+    course = Course.query.get(job.course_id)
+    rows = _pending_certificates(job)
+    job.total = len(rows)
+    db.session.commit()
+
+    output_dir = certificates_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    issue_date = datetime.utcnow().strftime('%d/%m/%Y')
+
+    items = [{
+        'user_id': row.user_id,
+        'course_id': job.course_id,
+        'name': f"{row.first_name or ''} {row.last_name or ''}".strip() or row.username,
+        'course': course.title,
+        'date': issue_date,
+        'code': uuid.uuid4().hex[:12].upper(),
+        'output_dir': output_dir
+    } for row in rows]
+
+    try:
+        batch = []
+        for result in executor.map(render_certificate, items, chunksize=16):
+            batch.append(result)
+            if len(batch) >= CERTIFICATE_BATCH_SIZE:
+                _save_certificates(job, batch)
+                batch = []
+        if batch:
+            _save_certificates(job, batch)
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(e) or type(e).__name__
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        current_app.logger.exception('Falha ao emitir certificados do job %s', job.id)
+        if isinstance(e, BrokenProcessPool):
+            # O pool não aceita mais tarefas: quem chamou precisa recriá-lo
+            raise
+        return
+
+    job.status = 'completed'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def requeue_stale_jobs(lease=CERTIFICATE_JOB_LEASE):
+    # Devolve para a fila os jobs cujo worker parou sem concluir (crash, deploy)
+    expired = datetime.utcnow() - timedelta(seconds=lease)
+    count = CertificateJob.query.filter(
+        CertificateJob.status == 'running',
+        db.or_(CertificateJob.started_at.is_(None), CertificateJob.started_at < expired)
+    ).update({'status': 'pending', 'started_at': None}, synchronize_session=False)
+    db.session.commit()
+    if count:
+        current_app.logger.warning('%d jobs de certificado abandonados voltaram para a fila', count)
+    return count
+
+
+def _claim_job():
+    job = CertificateJob.query.filter_by(status='pending').order_by(
+        CertificateJob.id
+    ).with_for_update(skip_locked=True).first()
+    if job:
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return job
+
+
+def _create_executor(processes):
+    return ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                               initargs=(CERTIFICATE_TEMPLATE,))
+
+
+def run_worker(processes=CERTIFICATE_PROCESSES, poll_interval=2.0, once=False):
+    # O pool é reaproveitado entre os jobs: cada processo carrega o modelo
+    # apenas na inicialização. Só é recriado se um processo morrer (ex.: OOM).
+    executor = _create_executor(processes)
+    try:
+        while True:
+            requeue_stale_jobs()
+            job = _claim_job()
+            if job:
+                try:
+                    process_job(job, executor)
+                except BrokenProcessPool:
+                    current_app.logger.warning('Pool de certificados quebrado; criando um novo')
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = _create_executor(processes)
+            elif once:
+                return
+            else:
+                time.sleep(poll_interval)
+    finally:
+        executor.shutdown()
+
+
+certificates_cli = AppGroup('certificates', help='Emissão de certificados.')
+
+
+@certificates_cli.command('worker')
+@click.option('--processes', default=CERTIFICATE_PROCESSES, show_default=True)
+@click.option('--poll-interval', default=2.0, show_default=True)
+@click.option('--once', is_flag=True, help='Sai quando não houver jobs pendentes.')
+def worker_command(processes, poll_interval, once):
+    """Renderiza os certificados enfileirados."""
+    run_worker(processes, poll_interval, once)
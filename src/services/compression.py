@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from flask import request
+from src.services.assets import COMPRESSIBLE_TYPES
+from src.services.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressão das respostas dinâmicas (JSON do catálogo, currículo, quizzes...).
+# Arquivos estáticos já saem pré-comprimidos do manifesto e arquivos enviados
+# com send_file/streaming passam direto. Os corpos comprimidos ficam num LRU
+# indexado pelo hash do conteúdo: respostas idênticas (vindas de cache ou da
+# mesma listagem) são comprimidas uma vez só por processo.
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+# Corpos menores que isso não compensam o custo da compressão
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+# Níveis para compressão em tempo de requisição (os estáticos usam o máximo)
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+# Tamanho do cache de corpos comprimidos, em bytes comprimidos (0 desativa)
+COMPRESSION_CACHE_BYTES = int(os.getenv('COMPRESSION_CACHE_BYTES', 32 * 1024 ** 2))
+# Corpos maiores que isso são comprimidos mas não entram no cache
+COMPRESSION_CACHE_MAX_BODY = int(os.getenv('COMPRESSION_CACHE_MAX_BODY', 1024 ** 2))
+
+
+class CompressedBodyCache:
+    # LRU de (hash do corpo, codificação) -> bytes comprimidos, limitado pelo
+    # total de bytes armazenados
+
+    def __init__(self, max_bytes=COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+        record_cache('compressed_bodies', body is not None)
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+compressed_bodies = CompressedBodyCache()
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressible(response):
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def compress_response(response):
+    if request.method == 'HEAD' or not _compressible(response):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_SIZE:
+        return response
+
+    # A representação depende do Accept-Encoding mesmo quando não é comprimida
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    cacheable = COMPRESSION_CACHE_BYTES and len(data) <= COMPRESSION_CACHE_MAX_BODY
+    body = None
+    if cacheable:
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+        body = compressed_bodies.get(key)
+    if body is None:
+        body = _compress(data, encoding)
+        if cacheable:
+            compressed_bodies.put(key, body)
+
+    if len(body) >= len(data):
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # ETag distinto por representação, como nos arquivos estáticos
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    return response
+
+
+def init_app(app):
+    if not COMPRESSION_ENABLED:
+        return
+    app.after_request(compress_response)
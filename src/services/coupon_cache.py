@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from src.models.payment import Coupon
+from src.services.metrics import record_cache
+
+# Tempo (segundos) que uma definição de cupom válida fica em memória
+COUPON_CACHE_TTL = int(os.getenv('COUPON_CACHE_TTL', 300))
+# Tempo (segundos) que um código desconhecido é respondido sem consultar o banco
+COUPON_NEGATIVE_TTL = int(os.getenv('COUPON_NEGATIVE_TTL', 30))
+
+
+class CouponCache:
+    # Mantém um snapshot de todos os cupons em memória, indexado pelo código.
+    # A tabela de cupons é pequena, então recarregá-la inteira em uma única
+    # consulta é mais barato do que consultar o banco a cada tentativa. Códigos
+    # ausentes do snapshot são tratados como cache negativo: enquanto o snapshot
+    # tiver menos de COUPON_NEGATIVE_TTL segundos, tentativas de força bruta não
+    # chegam ao banco, e mesmo depois disso custam no máximo uma consulta por
+    # intervalo, independentemente do volume de tráfego.
+
+    def __init__(self, ttl=COUPON_CACHE_TTL, negative_ttl=COUPON_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._coupons = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def get(self, code):
+        coupon = self._lookup(code)
+        if coupon is not _STALE:
+            self.hits += 1
+            record_cache('coupons', True)
+            return coupon
+
+        self.misses += 1
+        record_cache('coupons', False)
+        with self._lock:
+            # Outra thread pode ter recarregado enquanto esperávamos o lock
+            coupon = self._lookup(code)
+            if coupon is _STALE:
+                self._reload()
+                coupon = self._coupons.get(code)
+        return coupon
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _lookup(self, code):
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            return _STALE
+
+        age = time.monotonic() - loaded_at
+        coupon = self._coupons.get(code)
+        if coupon is not None and age < self.ttl:
+            return coupon
+        if coupon is None and age < self.negative_ttl:
+            return None
+        return _STALE
+
+    def _reload(self):
+        columns = [column.key for column in Coupon.__table__.columns]
+        rows = Coupon.query.with_entities(*[getattr(Coupon, key) for key in columns]).all()
+
+        # Instâncias transitórias (fora da sessão) preservam is_valid() e
+        # to_dict() sem manter objetos ORM vivos entre requisições
+        coupons = {}
+        for row in rows:
+            coupons[row.code] = Coupon(**dict(zip(columns, row)))
+
+        self._coupons = coupons
+        self._loaded_at = time.monotonic()
+
+
+_STALE = object()
+
+coupon_cache = CouponCache()
+
+
+def get_coupon(code):
+    return coupon_cache.get(code)
+
+
+# A invalidação vale para este processo; os demais workers enxergam a mudança
+# em no máximo COUPON_NEGATIVE_TTL (cupons novos) ou COUPON_CACHE_TTL segundos
+@event.listens_for(Coupon, 'after_insert')
+@event.listens_for(Coupon, 'after_update')
+@event.listens_for(Coupon, 'after_delete')
+def _invalidate_coupon_cache(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['coupons_changed'] = True
+    coupon_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_coupon_cache_on_commit(session):
+    # Invalida de novo após o commit para descartar um snapshot que outra
+    # requisição possa ter carregado entre o flush e o commit
+    if session.info.pop('coupons_changed', False):
+        coupon_cache.invalidate()
@@ -0,0 +1,210 @@
+import hashlib
+import hmac
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Pool de conexões configurável e leitura em réplica.
+#
+# Rotas marcadas com @read_replica consultam a réplica (DATABASE_REPLICA_URL)
+# em vez do primário. Escritas sempre vão ao primário, e depois que um
+# usuário escreve, suas leituras ficam no primário por REPLICA_STICKY_SECONDS,
+# para que ele veja os próprios dados mesmo com atraso de replicação. A marca
+# vale em qualquer worker: vai num cookie e no cabeçalho X-DB-Primary-Until
+# (assinados; o cliente pode devolver qualquer um dos dois) e, para clientes
+# que não devolvem nada, num SQLite compartilhado pelos workers do host,
+# indexado pelo token da requisição.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# Tempo máximo de cada comando no PostgreSQL (0 = sem limite)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+# Relatórios e exportações na réplica costumam precisar de mais tempo
+DB_REPLICA_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_REPLICA_STATEMENT_TIMEOUT_MS', DB_STATEMENT_TIMEOUT_MS))
+
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+REPLICA_BIND = 'replica'
+STICKY_COOKIE = 'db_primary_until'
+STICKY_HEADER = 'X-DB-Primary-Until'
+REPLICA_STICKY_PATH = os.getenv(
+    'REPLICA_STICKY_PATH',
+    os.path.join(tempfile.gettempdir(), 'ia_cursos_replica_sticky.sqlite3')
+)
+
+
+def _normalize_url(url):
+    # Render usa formato postgres://, mas SQLAlchemy precisa de postgresql://
+    if url and url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+
+def _engine_options(url, statement_timeout_ms):
+    options = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING
+    }
+    if statement_timeout_ms and url.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout_ms}'}
+    return options
+
+
+class RoutingSession(Session):
+    # Sessão do Flask-SQLAlchemy que envia leituras à réplica quando a
+    # requisição atual permite (ver _use_replica)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is None and not self._flushing and engine is self._db.engine and _use_replica():
+            return self._db.engines.get(REPLICA_BIND, engine)
+        return engine
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(session, flush_context):
+    # A partir da primeira escrita, a requisição só lê do primário
+    if has_request_context():
+        g.db_wrote = True
+
+
+class StickyWriters:
+    # Escritas recentes por token, em SQLite (modo WAL) compartilhado pelos
+    # workers do mesmo host; guarda só o hash do token
+
+    def __init__(self, path=REPLICA_STICKY_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT until FROM sticky_writers WHERE key = ?', (self._hash(key),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, until):
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO sticky_writers (key, until) VALUES (?, ?)', (self._hash(key), until))
+        # Limpeza ocasional das entradas vencidas
+        if random.random() < 0.01:
+            conn.execute('DELETE FROM sticky_writers WHERE until < ?', (time.time(),))
+
+    @staticmethod
+    def _hash(key):
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _connection(self):
+        # Uma conexão por thread e por processo (os workers são criados via fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS sticky_writers (key TEXT PRIMARY KEY, until REAL NOT NULL)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+sticky_writers = StickyWriters()
+
+
+def _sign(until):
+    key = current_app.config['SECRET_KEY'].encode()
+    return hmac.new(key, f'db-primary:{until}'.encode(), hashlib.sha256).hexdigest()
+
+
+def sticky_token(until):
+    return f'{until}.{_sign(until)}'
+
+
+def _token_until(token):
+    # Validade de um cookie/cabeçalho assinado, ou None
+    until, _, signature = (token or '').partition('.')
+    if not until.isdigit() or not hmac.compare_digest(_sign(int(until)), signature):
+        return None
+    return int(until)
+
+
+def _sticky_key():
+    return request.headers.get('Authorization')
+
+
+def _is_sticky():
+    now = time.time()
+    for token in (request.cookies.get(STICKY_COOKIE), request.headers.get(STICKY_HEADER)):
+        until = _token_until(token)
+        if until and until > now:
+            return True
+
+    key = _sticky_key()
+    if key:
+        until = sticky_writers.get(key)
+        return until is not None and until > now
+    return False
+
+
+def _use_replica():
+    if not has_request_context() or not g.get('use_replica') or g.get('db_wrote'):
+        return False
+    if 'replica_allowed' not in g:
+        g.replica_allowed = not _is_sticky()
+    return g.replica_allowed
+
+
+def read_replica(f):
+    # Marca uma rota somente leitura para consultar a réplica
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.use_replica = True
+        return f(*args, **kwargs)
+
+    return decorated
+
+
+def _remember_write(response):
+    if not g.get('db_wrote') or not REPLICA_STICKY_SECONDS:
+        return response
+
+    until = int(time.time()) + REPLICA_STICKY_SECONDS + 1
+    token = sticky_token(until)
+    response.set_cookie(STICKY_COOKIE, token, max_age=REPLICA_STICKY_SECONDS,
+                        httponly=True, samesite='Lax')
+    response.headers[STICKY_HEADER] = token
+
+    key = _sticky_key()
+    if key:
+        try:
+            sticky_writers.set(key, until)
+        except sqlite3.Error:
+            # O cookie e o cabeçalho continuam valendo
+            current_app.logger.exception('Falha ao registrar escrita recente para leitura no primário')
+    return response
+
+
+def init_app(app):
+    # Deve ser chamado antes de db.init_app: define as opções dos engines e o bind da réplica
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.update(_engine_options(url, DB_STATEMENT_TIMEOUT_MS))
+
+    replica_url = _normalize_url(os.getenv('DATABASE_REPLICA_URL'))
+    if replica_url:
+        # As opções gerais valem também para os binds; connect_args é
+        # redefinido para não herdar o statement_timeout do primário
+        replica = {'url': replica_url, 'connect_args': {}}
+        replica.update(_engine_options(replica_url, DB_REPLICA_STATEMENT_TIMEOUT_MS))
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = replica
+
+    app.after_request(_remember_write)
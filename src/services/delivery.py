@@ -0,0 +1,76 @@
+import mimetypes
+import os
+import stat
+from flask import current_app, send_file
+from werkzeug.security import safe_join
+from src.services.storage import certificates_dir, materials_dir
+
+# python: o próprio worker envia o arquivo (com Range, ETag e cache)
+# x-accel: o Nginx envia o arquivo a partir de X-Accel-Redirect
+# x-sendfile: Apache/lighttpd via X-Sendfile (USE_X_SENDFILE do Flask)
+FILE_DELIVERY = os.getenv('FILE_DELIVERY', 'python')
+# Locations internas do Nginx para a pasta static, os materiais e os certificados, ex.:
+#   location /protected/ { internal; alias /app/src/static/; }
+#   location /protected-materials/ { internal; alias /app/storage/materials/; }
+#   location /protected-certificates/ { internal; alias /app/storage/certificates/; }
+X_ACCEL_PREFIX = os.getenv('X_ACCEL_PREFIX', '/protected')
+X_ACCEL_MATERIALS_PREFIX = os.getenv('X_ACCEL_MATERIALS_PREFIX', '/protected-materials')
+X_ACCEL_CERTIFICATES_PREFIX = os.getenv('X_ACCEL_CERTIFICATES_PREFIX', '/protected-certificates')
+# Arquivos que nunca mudam (materiais são nomeados pelo conteúdo ou por UUID)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def deliver_file(directory, filename, max_age=None, immutable=False, etag=True,
+                 accel_prefix=X_ACCEL_PREFIX):
+    # Retorna a resposta para o arquivo ou None se ele não existir. Um único
+    # stat() resolve existência, tipo, tamanho e data de modificação.
+    path = safe_join(directory, filename)
+    if path is None:
+        return None
+
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+
+    if FILE_DELIVERY == 'x-accel':
+        # accel_prefix é a location interna que aponta para `directory`
+        relative_path = os.path.relpath(path, directory).replace(os.sep, '/')
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = f'{accel_prefix}/{relative_path}'
+        response.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if isinstance(etag, str):
+            response.set_etag(etag)
+        response.last_modified = file_stat.st_mtime
+    else:
+        # conditional=True trata If-None-Match/If-Modified-Since (304) e Range (206)
+        response = send_file(path, conditional=True, etag=etag, max_age=max_age,
+                             last_modified=file_stat.st_mtime)
+
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    elif max_age is not None:
+        response.cache_control.max_age = max_age
+    return response
+
+
+def deliver_material(filename):
+    # Materiais novos ficam em <aa>/<sha256>.<ext>: o próprio hash é um ETag forte
+    etag = True
+    name = os.path.basename(filename).rsplit('.', 1)[0]
+    if len(name) == 64 and all(c in '0123456789abcdef' for c in name):
+        etag = name
+    return deliver_file(materials_dir(), filename, immutable=True, etag=etag,
+                        accel_prefix=X_ACCEL_MATERIALS_PREFIX)
+
+
+def deliver_certificate(filename):
+    # Resposta de um usuário autenticado: não fica em caches compartilhados
+    response = deliver_file(certificates_dir(), filename, accel_prefix=X_ACCEL_CERTIFICATES_PREFIX)
+    if response is not None:
+        response.cache_control.private = True
+    return response
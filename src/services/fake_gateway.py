@@ -0,0 +1,145 @@
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+import click
+from flask.cli import AppGroup
+
+# Servidor HTTP falso que imita os endpoints do Stripe e do PagSeguro usados
+# no checkout, para medir o throughput do checkout sem acesso à rede.
+
+
+class FakeGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        config = self.server.config
+
+        if config['latency']:
+            time.sleep(config['latency'])
+
+        if random.random() < config['error_rate']:
+            return self._send(503, {'error': {'message': 'Serviço indisponível (simulado)'}})
+
+        if self.path == '/v1/checkout/sessions':
+            form = parse_qs(body.decode())
+            session_id = f'cs_test_{uuid.uuid4().hex[:24]}'
+            return self._send(200, {
+                'id': session_id,
+                'object': 'checkout.session',
+                'client_reference_id': form.get('client_reference_id', [None])[0],
+                'url': f'https://checkout.stripe.com/c/pay/{session_id}',
+                'payment_status': 'unpaid'
+            })
+
+        if self.path == '/orders':
+            order = json.loads(body or b'{}')
+            return self._send(201, _fake_order(order))
+
+        self._send(404, {'error': {'message': 'Rota não encontrada'}})
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _fake_order(order):
+    order_id = f'ORDE_{uuid.uuid4().hex.upper()}'
+    result = {'id': order_id, 'reference_id': order.get('reference_id')}
+    if order.get('qr_codes'):
+        result['qr_codes'] = [{
+            'id': f'QRCO_{uuid.uuid4().hex.upper()}',
+            'text': '00020101021226830014br.gov.bcb.pix2561fake',
+            'expiration_date': '30 minutos'
+        }]
+    for charge in order.get('charges') or []:
+        payment_type = charge['payment_method']['type']
+        links = [{'rel': 'PAY', 'href': f'https://pagseguro.example/pay/{order_id}'}]
+        payment_method = {'type': payment_type}
+        if payment_type == 'BOLETO':
+            payment_method['boleto'] = {'barcode': '23790123456789012345678901234567890123456789'}
+            links.append({'rel': 'SELF', 'media': 'application/pdf',
+                          'href': f'https://pagseguro.example/boleto/{order_id}.pdf'})
+        result['charges'] = [{
+            'id': f'CHAR_{uuid.uuid4().hex.upper()}',
+            'status': 'WAITING',
+            'payment_method': payment_method,
+            'links': links
+        }]
+    return result
+
+
+def start_fake_gateway(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0):
+    # Inicia o servidor em uma thread daemon e retorna sua URL base
+    server = ThreadingHTTPServer((host, port), FakeGatewayHandler)
+    server.daemon_threads = True
+    server.config = {'latency': latency, 'error_rate': error_rate}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f'http://{host}:{server.server_address[1]}'
+
+
+gateway_cli = AppGroup('gateway', help='Ferramentas do gateway de pagamento.')
+
+
+@gateway_cli.command('fake-server')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8765, show_default=True)
+@click.option('--latency', default=0.05, show_default=True, help='Latência simulada (segundos).')
+@click.option('--error-rate', default=0.0, show_default=True, help='Fração de respostas 503.')
+def fake_server_command(host, port, latency, error_rate):
+    """Sobe o gateway falso; use STRIPE_API_BASE/PAGSEGURO_API_BASE para apontar para ele."""
+    base_url = start_fake_gateway(host, port, latency, error_rate)
+    click.echo(f'Gateway falso em {base_url} (Ctrl+C para sair)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+@gateway_cli.command('bench')
+@click.option('--requests', 'total', default=1000, show_default=True)
+@click.option('--concurrency', default=32, show_default=True)
+@click.option('--latency', default=0.05, show_default=True)
+@click.option('--error-rate', default=0.0, show_default=True)
+def bench_command(total, concurrency, latency, error_rate):
+    """Mede o throughput do cliente de gateway contra o servidor falso."""
+    from src.services.gateway import PagSeguroClient, GatewayError
+
+    base_url = start_fake_gateway(latency=latency, error_rate=error_rate)
+    client = PagSeguroClient(base_url=base_url, pool_size=concurrency)
+    customer = {'name': 'Benchmark', 'email': 'bench@example.com'}
+
+    def call(i):
+        started = time.monotonic()
+        try:
+            client.create_order(f'BENCH{i}', 1000, 'pix', customer)
+            ok = True
+        except GatewayError:
+            ok = False
+        return ok, time.monotonic() - started
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(total)))
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(duration for _, duration in results)
+    failures = sum(1 for ok, _ in results if not ok)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    click.echo(f'{total} chamadas em {elapsed:.2f}s ({total / elapsed:.0f}/s), '
+               f'p50 {p50:.1f}ms, p99 {p99:.1f}ms, {failures} falhas, circuito {client.breaker.state}')
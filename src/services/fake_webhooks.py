@@ -0,0 +1,121 @@
+import json
+import random
+import time
+import uuid
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import click
+from flask.cli import with_appcontext
+from src.models.payment import Payment
+from src.services.webhooks import (
+    STRIPE_WEBHOOK_SECRET, PAGSEGURO_WEBHOOK_TOKEN, sign_stripe_payload, sign_pagseguro_payload
+)
+
+# Gerador de eventos de gateway falsos, assinados como os reais, para testes de carga
+
+
+def fake_stripe_event(payment_ref, status='completed'):
+    event_type = {
+        'completed': 'checkout.session.completed',
+        'failed': 'checkout.session.expired',
+        'refunded': 'charge.refunded'
+    }[status]
+    if status == 'refunded':
+        # Estornos chegam como cobrança, com a referência nos metadados
+        obj = {
+            'id': f'ch_test_{uuid.uuid4().hex[:24]}',
+            'metadata': {'reference': payment_ref},
+            'refunded': True
+        }
+    else:
+        obj = {
+            'id': f'cs_test_{uuid.uuid4().hex[:24]}',
+            'client_reference_id': payment_ref,
+            'metadata': {'reference': payment_ref},
+            'payment_status': 'paid' if status == 'completed' else 'unpaid'
+        }
+    return {
+        'id': f'evt_{uuid.uuid4().hex}',
+        'type': event_type,
+        'created': int(time.time()),
+        'data': {'object': obj}
+    }
+
+
+def fake_pagseguro_event(payment_ref, status='completed'):
+    charge_status = {'completed': 'PAID', 'failed': 'DECLINED', 'refunded': 'CANCELED'}[status]
+    return {
+        'id': f'ORDE_{uuid.uuid4().hex.upper()}',
+        'reference_id': payment_ref,
+        'charges': [{
+            'id': f'CHAR_{uuid.uuid4().hex.upper()}',
+            'status': charge_status
+        }]
+    }
+
+
+def generate_events(gateway, payment_refs, count, duplicate_rate=0.05, failure_rate=0.1, seed=None):
+    # Gera (caminho, corpo, cabeçalhos) prontos para POST. Uma fração dos eventos
+    # é reenviada, como os gateways fazem, para exercitar a deduplicação.
+    rng = random.Random(seed)
+    sent = []
+    for _ in range(count):
+        if sent and rng.random() < duplicate_rate:
+            yield rng.choice(sent)
+            continue
+
+        status = 'failed' if rng.random() < failure_rate else 'completed'
+        ref = rng.choice(payment_refs)
+        if gateway == 'stripe':
+            payload = json.dumps(fake_stripe_event(ref, status)).encode()
+            timestamp = int(time.time())
+            headers = {'Stripe-Signature': f't={timestamp},v1={sign_stripe_payload(payload, timestamp)}'}
+        else:
+            payload = json.dumps(fake_pagseguro_event(ref, status)).encode()
+            headers = {'x-authenticity-token': sign_pagseguro_payload(payload)}
+        headers['Content-Type'] = 'application/json'
+
+        event = (f'/api/payments/webhook/{gateway}', payload, headers)
+        sent.append(event)
+        yield event
+
+
+def _post(base_url, event):
+    path, payload, headers = event
+    request = urllib.request.Request(base_url + path, data=payload, headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+@click.command('fake')
+@click.option('--gateway', type=click.Choice(['stripe', 'pagseguro']), default='pagseguro', show_default=True)
+@click.option('--count', default=1000, show_default=True)
+@click.option('--url', default='http://localhost:5000', show_default=True)
+@click.option('--concurrency', default=16, show_default=True)
+@click.option('--seed', default=None, type=int)
+@with_appcontext
+def fake_webhooks_command(gateway, count, url, concurrency, seed):
+    """Envia eventos de webhook falsos para uma instância da aplicação."""
+    secret = STRIPE_WEBHOOK_SECRET if gateway == 'stripe' else PAGSEGURO_WEBHOOK_TOKEN
+    if not secret:
+        raise click.UsageError('Configure STRIPE_WEBHOOK_SECRET / PAGSEGURO_WEBHOOK_TOKEN para assinar os eventos.')
+
+    refs = [ref for (ref,) in Payment.query.with_entities(Payment.payment_id).filter(
+        Payment.status == 'pending', Payment.payment_id.isnot(None)
+    ).distinct().limit(10000).all()]
+    if not refs:
+        refs = [f'PAG{uuid.uuid4().hex[:14].upper()}' for _ in range(100)]
+        click.echo('Nenhum pagamento pendente; usando referências aleatórias.')
+
+    events = list(generate_events(gateway, refs, count, seed=seed))
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = list(executor.map(lambda event: _post(url, event), events))
+    elapsed = time.monotonic() - started
+
+    accepted = sum(1 for status in statuses if status == 200)
+    click.echo(f'{len(events)} eventos em {elapsed:.2f}s ({len(events) / elapsed:.0f}/s), {accepted} aceitos')
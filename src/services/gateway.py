@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+
+# simulated: respostas simuladas sem rede (padrão, desenvolvimento)
+# live: APIs reais do Stripe e do PagSeguro
+# fake: servidor falso em processo (src/services/fake_gateway.py), para benchmarks
+PAYMENT_GATEWAY_MODE = os.getenv('PAYMENT_GATEWAY_MODE', 'simulated')
+
+STRIPE_API_KEY = os.getenv('STRIPE_API_KEY', 'sk_test_example')
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', 'https://api.stripe.com')
+PAGSEGURO_TOKEN = os.getenv('PAGSEGURO_TOKEN', '')
+PAGSEGURO_API_BASE = os.getenv('PAGSEGURO_API_BASE', 'https://sandbox.api.pagseguro.com')
+
+GATEWAY_CONNECT_TIMEOUT = float(os.getenv('GATEWAY_CONNECT_TIMEOUT', 2))
+GATEWAY_READ_TIMEOUT = float(os.getenv('GATEWAY_READ_TIMEOUT', 10))
+GATEWAY_POOL_SIZE = int(os.getenv('GATEWAY_POOL_SIZE', 10))
+# Falhas consecutivas até abrir o circuito e tempo (segundos) até testar de novo
+GATEWAY_FAILURE_THRESHOLD = int(os.getenv('GATEWAY_FAILURE_THRESHOLD', 5))
+GATEWAY_RESET_TIMEOUT = float(os.getenv('GATEWAY_RESET_TIMEOUT', 30))
+
+
+class GatewayError(Exception):
+    pass
+
+
+class GatewayUnavailable(GatewayError):
+    # Circuito aberto: a chamada nem chegou a ser feita
+    pass
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=GATEWAY_FAILURE_THRESHOLD, reset_timeout=GATEWAY_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'open':
+                raise GatewayUnavailable('Gateway de pagamento indisponível')
+            if state == 'half_open':
+                # Apenas uma chamada de teste por vez enquanto meio aberto
+                if self._trial_in_flight:
+                    raise GatewayUnavailable('Gateway de pagamento indisponível')
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class GatewayClient:
+    # Cliente HTTP com conexões keep-alive reaproveitadas, timeouts explícitos
+    # de conexão/leitura e circuit breaker. Não há retentativas automáticas:
+    # chamadas de cobrança só devem ser repetidas com chave de idempotência.
+
+    def __init__(self, base_url, headers=None, connect_timeout=GATEWAY_CONNECT_TIMEOUT,
+                 read_timeout=GATEWAY_READ_TIMEOUT, pool_size=GATEWAY_POOL_SIZE, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        # Importado aqui: o cliente só é criado no primeiro checkout de cada processo
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, **kwargs):
+        import requests
+        self.breaker.before_call()
+        healthy = False
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            # Erros 4xx são do pedido, não indicam degradação do gateway
+            healthy = response.status_code < 500
+        except requests.RequestException as e:
+            raise GatewayError(f'Falha na comunicação com o gateway: {e}') from e
+        finally:
+            # Registrado em qualquer saída, inclusive exceções inesperadas
+            # (timeouts do gevent, interrupções), para liberar a chamada de teste
+            if healthy:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+        if response.status_code >= 500:
+            raise GatewayError(f'Gateway respondeu {response.status_code}')
+        if response.status_code >= 400:
+            raise GatewayError(f'Gateway recusou a requisição ({response.status_code}): {response.text[:200]}')
+        try:
+            return response.json()
+        except ValueError as e:
+            raise GatewayError('Resposta inválida do gateway') from e
+
+
+class StripeClient(GatewayClient):
+
+    def __init__(self, base_url=STRIPE_API_BASE, api_key=STRIPE_API_KEY, **kwargs):
+        super().__init__(base_url, headers={'Authorization': f'Bearer {api_key}'}, **kwargs)
+
+    def create_checkout_session(self, reference, amount_cents, currency, success_url, cancel_url,
+                                idempotency_key=None):
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else {}
+        session = self.request('POST', '/v1/checkout/sessions', headers=headers, data={
+            'mode': 'payment',
+            'client_reference_id': reference,
+            # Copiada para o PaymentIntent e a cobrança, para que charge.refunded
+            # possa ser associado ao pagamento
+            'metadata[reference]': reference,
+            'payment_intent_data[metadata][reference]': reference,
+            'payment_method_types[]': 'card',
+            'line_items[0][quantity]': 1,
+            'line_items[0][price_data][currency]': currency.lower(),
+            'line_items[0][price_data][unit_amount]': amount_cents,
+            'line_items[0][price_data][product_data][name]': 'IA Cursos Online',
+            'success_url': success_url,
+            'cancel_url': cancel_url
+        })
+        return {'id': session['id'], 'url': session['url']}
+
+
+class PagSeguroClient(GatewayClient):
+
+    def __init__(self, base_url=PAGSEGURO_API_BASE, token=PAGSEGURO_TOKEN, **kwargs):
+        super().__init__(base_url, headers={'Authorization': f'Bearer {token}'}, **kwargs)
+
+    def create_order(self, reference, amount_cents, payment_method, customer, idempotency_key=None):
+        headers = {'x-idempotency-key': idempotency_key} if idempotency_key else {}
+        order = {
+            'reference_id': reference,
+            'customer': customer,
+            'items': [{'name': 'IA Cursos Online', 'quantity': 1, 'unit_amount': amount_cents}]
+        }
+        if payment_method == 'pix':
+            order['qr_codes'] = [{'amount': {'value': amount_cents}}]
+        else:
+            order['charges'] = [{
+                'reference_id': reference,
+                'amount': {'value': amount_cents, 'currency': 'BRL'},
+                'payment_method': {'type': payment_method.upper()}
+            }]
+
+        result = self.request('POST', '/orders', headers=headers, json=order)
+        return _summarize_pagseguro_order(result)
+
+
+def _summarize_pagseguro_order(order):
+    summary = {'id': order.get('id')}
+    for qr_code in order.get('qr_codes') or []:
+        summary['qr_code'] = qr_code.get('text')
+        summary['expiration'] = qr_code.get('expiration_date')
+    for charge in order.get('charges') or []:
+        boleto = (charge.get('payment_method') or {}).get('boleto') or {}
+        summary['barcode'] = boleto.get('barcode')
+        for link in charge.get('links') or []:
+            if link.get('media') == 'application/pdf':
+                summary['boleto_url'] = link.get('href')
+            elif link.get('rel') == 'PAY':
+                summary['redirect_url'] = link.get('href')
+    return summary
+
+
+class SimulatedStripeClient:
+
+    def create_checkout_session(self, reference, amount_cents, currency, success_url, cancel_url,
+                                idempotency_key=None):
+        return {'id': 'cs_test_' + reference, 'url': 'https://checkout.stripe.com/example'}
+
+
+class SimulatedPagSeguroClient:
+
+    def create_order(self, reference, amount_cents, payment_method, customer, idempotency_key=None):
+        return {
+            'id': 'ORDE_' + reference,
+            'qr_code': 'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==',
+            'expiration': '30 minutos',
+            'boleto_url': 'https://exemplo.com/boleto',
+            'barcode': '23790123456789012345678901234567890123456789',
+            'redirect_url': 'https://exemplo.com/pagamento'
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _create_clients(mode):
+    if mode == 'simulated':
+        return SimulatedStripeClient(), SimulatedPagSeguroClient()
+    if mode == 'live':
+        return StripeClient(), PagSeguroClient()
+    if mode == 'fake':
+        from src.services.fake_gateway import start_fake_gateway
+        base_url = start_fake_gateway()
+        return StripeClient(base_url=base_url), PagSeguroClient(base_url=base_url)
+    raise ValueError(f'PAYMENT_GATEWAY_MODE inválido: {mode}')
+
+
+def _get_clients():
+    # Um par de clientes (e pools de conexão) por processo; os workers do
+    # Gunicorn são criados via fork e não podem compartilhar sockets
+    pid = os.getpid()
+    clients = _clients.get(pid)
+    if clients is None:
+        with _clients_lock:
+            clients = _clients.get(pid)
+            if clients is None:
+                clients = _clients[pid] = _create_clients(PAYMENT_GATEWAY_MODE)
+    return clients
+
+
+def get_stripe_client():
+    return _get_clients()[0]
+
+
+def get_pagseguro_client():
+    return _get_clients()[1]
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request, jsonify, make_response, Response
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.payment import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# Por quanto tempo uma chave continua valendo
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))
+# Quanto tempo uma requisição duplicada espera a primeira terminar
+IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', 15))
+# Uma chave em andamento há mais que isso pertence a um worker que morreu
+# (crash, OOM, deploy) e pode ser retomada; deve superar a requisição mais lenta
+IDEMPOTENCY_LEASE = int(os.getenv('IDEMPOTENCY_LEASE', 60))
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+
+
+def _request_hash():
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_code,
+                        mimetype=record.response_mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _lease_expired(record):
+    locked_at = record.locked_at or record.created_at
+    return record.status == 'in_progress' and locked_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_LEASE)
+
+
+def _claim(user_id, key, request_hash):
+    # Tenta registrar a chave; a restrição única garante que apenas uma
+    # requisição (em qualquer worker) execute o handler
+    record = IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash,
+                            locked_at=datetime.utcnow())
+    db.session.add(record)
+    try:
+        db.session.commit()
+        return record, True
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if existing and existing.created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL):
+        db.session.delete(existing)
+        db.session.commit()
+        return _claim(user_id, key, request_hash)
+    if existing and _lease_expired(existing):
+        return _reclaim(existing, request_hash)
+    return existing, False
+
+
+def _reclaim(record, request_hash):
+    # Retoma a chave de uma requisição que nunca terminou. O UPDATE condicional
+    # ao lease antigo garante que só um dos workers retome a chave.
+    now = datetime.utcnow()
+    expired = now - timedelta(seconds=IDEMPOTENCY_LEASE)
+    reclaimed = IdempotencyKey.query.filter(
+        IdempotencyKey.id == record.id,
+        IdempotencyKey.status == 'in_progress',
+        db.or_(
+            IdempotencyKey.locked_at < expired,
+            db.and_(IdempotencyKey.locked_at.is_(None), IdempotencyKey.created_at < expired)
+        )
+    ).update({'locked_at': now, 'request_hash': request_hash}, synchronize_session=False)
+    db.session.commit()
+
+    record = IdempotencyKey.query.filter_by(id=record.id).populate_existing().first()
+    if reclaimed:
+        current_app.logger.warning('Chave de idempotência %s retomada após lease expirado', record.key)
+    return record, bool(reclaimed)
+
+
+def _wait_for(record_id):
+    # Retorna (registro, terminou); registro None com terminou=True indica que
+    # a primeira requisição falhou e liberou a chave, ou que seu lease expirou
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT
+    while time.monotonic() < deadline:
+        # Encerra a transação atual para enxergar o commit da outra requisição
+        db.session.rollback()
+        record = IdempotencyKey.query.filter_by(id=record_id).populate_existing().first()
+        if record is None or record.status == 'completed':
+            return record, True
+        if _lease_expired(record):
+            return None, True
+        time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+    return None, False
+
+
+def idempotent(f):
+    # Deve ser aplicado abaixo de token_required, que fornece current_user
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(current_user, *args, **kwargs)
+
+        if len(key) > 255:
+            return jsonify({'message': 'Chave de idempotência inválida!'}), 400
+
+        request_hash = _request_hash()
+        record, claimed = _claim(current_user.id, key, request_hash)
+
+        if not claimed:
+            if record is None:
+                # A primeira requisição falhou e liberou a chave no meio tempo
+                return decorated(current_user, *args, **kwargs)
+            if record.request_hash != request_hash:
+                return jsonify({'message': 'Chave de idempotência já usada com outra requisição!'}), 422
+            if record.status != 'completed':
+                record, finished = _wait_for(record.id)
+                if not finished:
+                    return jsonify({'message': 'Requisição com esta chave ainda em processamento!'}), 409
+                if record is None:
+                    return decorated(current_user, *args, **kwargs)
+            return _replay(record)
+
+        # Só altera a chave enquanto o lease for desta requisição: se ela demorou
+        # além de IDEMPOTENCY_LEASE, outra requisição pode tê-la retomado
+        owned = IdempotencyKey.query.filter_by(id=record.id, locked_at=record.locked_at)
+        try:
+            response = make_response(f(current_user, *args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            owned.delete()
+            db.session.commit()
+            raise
+
+        if response.status_code >= 500:
+            # Erros do servidor não são memorizados: o cliente pode tentar de novo
+            db.session.rollback()
+            owned.delete()
+        elif not owned.update({
+            'status': 'completed',
+            'response_code': response.status_code,
+            'response_body': response.get_data(as_text=True),
+            'response_mimetype': response.mimetype
+        }):
+            current_app.logger.warning('Chave de idempotência %s retomada por outra requisição antes do fim', key)
+        db.session.commit()
+        return response
+
+    return decorated
@@ -0,0 +1,109 @@
+import json
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from src.models.user import db
+from src.models.course import Module, Lesson, Material, Enrollment, Progress, Review
+from src.models.payment import Payment, Cart, CartItem, Certificate
+
+# Verificação dos índices das consultas mais frequentes. Cada consulta abaixo
+# reproduz o formato usado pelas rotas; o comando roda EXPLAIN com
+# enable_seqscan desligado e falha se alguma delas ainda precisar percorrer a
+# tabela inteira (ou ordenar, quando a ordem deveria vir do índice). Desligar
+# o seq scan torna o resultado independente do volume de dados: em tabelas
+# pequenas o planejador preferiria o seq scan mesmo com o índice certo.
+
+
+def _hot_queries():
+    now = datetime.utcnow()
+    # (nome, tabela, consulta, ordem vem do índice)
+    return [
+        ('enrollment_by_user_course', 'enrollment',
+         select(Enrollment).filter_by(user_id=1, course_id=1), False),
+        ('enrollments_by_user', 'enrollment', select(Enrollment).filter_by(user_id=1), False),
+        ('enrollments_by_course', 'enrollment', select(Enrollment).filter_by(course_id=1), False),
+        ('progress_by_enrollment_lesson', 'progress',
+         select(Progress).filter_by(enrollment_id=1, lesson_id=1), False),
+        ('progress_by_enrollment', 'progress', select(Progress).filter_by(enrollment_id=1), False),
+        ('reviews_by_course', 'review', select(Review).filter_by(course_id=1), False),
+        ('review_by_user_course', 'review', select(Review).filter_by(user_id=1, course_id=1), False),
+        ('modules_by_course', 'module',
+         select(Module).filter_by(course_id=1).order_by(Module.order), True),
+        ('lessons_by_module', 'lesson',
+         select(Lesson).filter_by(module_id=1).order_by(Lesson.order), True),
+        ('materials_by_lesson', 'material', select(Material).filter_by(lesson_id=1), False),
+        ('payment_history', 'payment',
+         select(Payment).filter(Payment.user_id == 1).order_by(
+             Payment.created_at.desc(), Payment.id.desc()
+         ).limit(20), True),
+        ('payments_by_status_period', 'payment',
+         select(Payment).filter(
+             Payment.created_at >= now - timedelta(days=30),
+             Payment.created_at <= now,
+             Payment.status == 'completed'
+         ), False),
+        ('payment_by_gateway_ref', 'payment', select(Payment).filter_by(payment_id='ref'), False),
+        ('cart_by_user', 'cart', select(Cart).filter_by(user_id=1), False),
+        ('cart_item_by_cart_course', 'cart_item', select(CartItem).filter_by(cart_id=1, course_id=1), False),
+        ('certificate_by_user_course', 'certificate',
+         select(Certificate).filter_by(user_id=1, course_id=1), False),
+    ]
+
+
+def _nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _nodes(child)
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    result = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + compiled.string, compiled.params).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]['Plan']
+
+
+def check_plan(plan, table, ordered):
+    # Retorna (problemas, índices usados)
+    nodes = list(_nodes(plan))
+    problems = []
+    if any(node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == table for node in nodes):
+        problems.append(f'seq scan em {table}')
+    if ordered and any(node['Node Type'] in ('Sort', 'Incremental Sort') for node in nodes):
+        problems.append('ordenação fora do índice')
+    indexes = sorted({node['Index Name'] for node in nodes if 'Index Name' in node})
+    return problems, indexes
+
+
+def check_indexes(echo=click.echo, verbose=False):
+    failures = []
+    with db.engine.connect() as connection:
+        if connection.dialect.name != 'postgresql':
+            raise click.ClickException('flask check-indexes requer PostgreSQL.')
+
+        with connection.begin():
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            for name, table, statement, ordered in _hot_queries():
+                plan = explain(connection, statement)
+                problems, indexes = check_plan(plan, table, ordered)
+                if problems:
+                    failures.append(name)
+                    echo(f"FALHA {name}: {', '.join(problems)}")
+                else:
+                    echo(f"ok    {name}: {', '.join(indexes)}")
+                if verbose or problems:
+                    echo(json.dumps(plan, indent=2))
+    return failures
+
+
+@click.command('check-indexes')
+@click.option('--verbose', is_flag=True, help='Mostra o plano de todas as consultas.')
+@with_appcontext
+def check_indexes_command(verbose):
+    """Confere com EXPLAIN se as consultas mais usadas são atendidas por índices."""
+    failures = check_indexes(verbose=verbose)
+    if failures:
+        raise click.ClickException(f'{len(failures)} consulta(s) sem índice adequado.')
+    click.echo('Todas as consultas usam índice.')
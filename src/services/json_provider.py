@@ -0,0 +1,107 @@
+import os
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from src.models.user import db
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Serialização JSON da aplicação. Com o orjson instalado (e JSON_PROVIDER=orjson,
+# o padrão), jsonify e request.get_json passam a usar o orjson, que gera os
+# bytes da resposta diretamente, sem a string intermediária do módulo json.
+# Sem ele, ou com JSON_PROVIDER=default, fica o provider padrão do Flask.
+JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson').lower()
+# Itens serializados por pedaço enviado nas respostas em streaming
+JSON_STREAM_CHUNK_SIZE = int(os.getenv('JSON_STREAM_CHUNK_SIZE', 500))
+# Linhas lidas do banco por vez nas listagens em streaming
+JSON_STREAM_YIELD_PER = int(os.getenv('JSON_STREAM_YIELD_PER', 1000))
+
+
+class OrJSONProvider(DefaultJSONProvider):
+    # Mesmo comportamento do provider padrão (chaves ordenadas, datas no
+    # formato HTTP, Decimal/UUID/dataclasses via default); argumentos
+    # específicos do módulo json caem no provider padrão
+
+    def _option(self, indent=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _dumps_bytes(self, obj, indent=False):
+        return orjson.dumps(obj, default=self.default, option=self._option(indent))
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._dumps_bytes(obj).decode()
+        except orjson.JSONEncodeError:
+            # Inteiros acima de 64 bits, por exemplo; o json da biblioteca
+            # padrão serializa ou levanta o mesmo TypeError
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = self._dumps_bytes(obj, indent)
+        except orjson.JSONEncodeError:
+            return super().response(obj)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    if JSON_PROVIDER == 'orjson' and orjson is not None:
+        app.json = OrJSONProvider(app)
+
+
+def stream_json_array(items, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    # Resposta com um array JSON gerado à medida que `items` (dicionários,
+    # normalmente vindos de uma consulta com yield_per) é consumido: o pico de
+    # memória não depende do tamanho da lista. Se a consulta falhar no meio,
+    # a conexão é encerrada com o JSON incompleto.
+    dumps = current_app.json.dumps
+
+    def generate():
+        chunk = ['[']
+        separator = ''
+        for item in items:
+            chunk.append(separator)
+            chunk.append(dumps(item))
+            separator = ','
+            if len(chunk) >= 2 * chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append(']\n')
+        yield ''.join(chunk)
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
+def _to_dicts(objects):
+    return [obj.to_dict() for obj in objects]
+
+
+def stream_query(statement, serialize=_to_dicts, chunk_size=JSON_STREAM_CHUNK_SIZE):
+    # Executa um select() lendo JSON_STREAM_YIELD_PER linhas por vez e
+    # serializa cada bloco com serialize(objetos) -> dicionários. Relações
+    # usadas na serialização devem vir de selectinload (uma consulta por
+    # bloco) ou ser agregadas em serialize; o Query legado não serve aqui,
+    # porque aplica unique() e o yield_per do ORM não aceita unique().
+    result = db.session.execute(statement.execution_options(yield_per=JSON_STREAM_YIELD_PER)).scalars()
+
+    def items():
+        for partition in result.partitions():
+            yield from serialize(partition)
+
+    return stream_json_array(items(), chunk_size)
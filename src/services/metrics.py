@@ -0,0 +1,132 @@
+import hmac
+import os
+import time
+from flask import current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+
+# Métricas no formato Prometheus em /metrics. Com vários workers do gunicorn,
+# PROMETHEUS_MULTIPROC_DIR (definido no gunicorn.conf.py) faz cada processo
+# gravar seus valores em arquivos nesse diretório, somados na coleta.
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+# Se definido, /metrics exige "Authorization: Bearer <token>". Sem ele, /metrics
+# só responde em modo debug ou com METRICS_PUBLIC=true (ex.: quando a rota só
+# é alcançável pela rede interna do Prometheus)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'false').lower() == 'true'
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Latência das requisições HTTP.',
+    ['blueprint', 'endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requisições em andamento.',
+    multiprocess_mode='livesum'
+)
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Espera para obter uma conexão do pool.',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+DB_CONNECTIONS_IN_USE = Gauge(
+    'db_pool_connections_in_use', 'Conexões do pool em uso.',
+    multiprocess_mode='livesum'
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'Consultas aos caches em memória.',
+    ['cache', 'result']
+)
+WRITE_FAILURES = Counter(
+    'write_failures_total', 'Gravações que falharam (a requisição recebe erro).',
+    ['kind']
+)
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool que mede quanto tempo cada checkout espera por uma conexão livre.
+    # Como recreate() usa a mesma classe, a medição sobrevive a engine.dispose().
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+@event.listens_for(Pool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_CONNECTIONS_IN_USE.inc()
+
+
+@event.listens_for(Pool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    DB_CONNECTIONS_IN_USE.dec()
+
+
+def record_cache(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_write_failure(kind):
+    WRITE_FAILURES.labels(kind).inc()
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+def _observe(status):
+    REQUEST_LATENCY.labels(
+        request.blueprint or 'app',
+        # Rotas inexistentes ficam agrupadas para não criar uma série por URL
+        request.endpoint or 'unmatched',
+        request.method,
+        str(status)
+    ).observe(time.perf_counter() - g.metrics_start)
+    g.metrics_observed = True
+
+
+def _finish_request(response):
+    if 'metrics_start' in g:
+        _observe(response.status_code)
+    return response
+
+
+def _teardown_request(exception):
+    if 'metrics_start' not in g:
+        return
+    # Exceções não tratadas não passam pelo after_request
+    if not g.get('metrics_observed'):
+        _observe(500)
+    REQUESTS_IN_FLIGHT.dec()
+
+
+def _metrics_allowed():
+    if METRICS_TOKEN:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}')
+    return METRICS_PUBLIC or current_app.debug
+
+
+def metrics_view():
+    if not _metrics_allowed():
+        return 'Unauthorized', 401
+
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+
+def init_app(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
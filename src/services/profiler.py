@@ -0,0 +1,279 @@
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.services.storage import STORAGE_DIR
+
+# Profiler sob demanda para administradores. Com PROFILER_ENABLED=true, uma
+# requisição com o cabeçalho "X-Profile: 1" (ou "X-Profile: cprofile") ou com
+# ?__profile=1 é perfilada e o resultado fica em PROFILE_DIR para download em
+# /api/admin/profiles. Desligado, nenhum hook é registrado.
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(STORAGE_DIR, 'profiles'))
+# Intervalo entre amostras do profiler estatístico (ms); pode ser alterado por
+# requisição com o cabeçalho X-Profile-Interval
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 1))
+# Limite de arquivos mantidos em PROFILE_DIR (os mais antigos são removidos)
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 200))
+SQL_FRAME_CHARS = 120
+
+_listening = False
+# Sessões ativas por thread, para associar as consultas SQL à requisição perfilada
+_sessions = {}
+
+
+class SamplingSession:
+    # Lê a pilha da thread da requisição a cada intervalo via sys._current_frames
+    # e gera um perfil no formato do speedscope (https://www.speedscope.app).
+    # Consultas SQL em andamento aparecem como um quadro "SQL ..." no topo da
+    # pilha, além de um perfil separado com os intervalos de cada consulta.
+
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000
+        self.thread_id = threading.get_ident()
+        self.frames = []
+        self._frame_index = {}
+        self.samples = []
+        self.weights = []
+        self.sql_spans = []
+        self._current_sql = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def sql_start(self, statement):
+        self._current_sql = (time.perf_counter(), statement)
+
+    def sql_end(self):
+        if self._current_sql is not None:
+            started, statement = self._current_sql
+            self.sql_spans.append((started - self.started, time.perf_counter() - self.started, statement))
+            self._current_sql = None
+
+    def _frame(self, name, filename=None, line=None):
+        key = (name, filename, line)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            frame = {'name': name}
+            if filename:
+                frame.update({'file': filename, 'line': line})
+            self.frames.append(frame)
+        return index
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(self._frame(code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+
+            current_sql = self._current_sql
+            if current_sql is not None:
+                stack.append(self._frame('SQL ' + ' '.join(current_sql[1].split())[:SQL_FRAME_CHARS]))
+
+            self.samples.append(stack)
+            self.weights.append((now - last) * 1000)
+            last = now
+
+    def save(self, path, name):
+        duration_ms = self.duration * 1000
+        profiles = [{
+            'type': 'sampled',
+            'name': name,
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': duration_ms,
+            'samples': self.samples,
+            'weights': self.weights
+        }]
+
+        if self.sql_spans:
+            events = []
+            for started, finished, statement in self.sql_spans:
+                index = self._frame('SQL ' + ' '.join(statement.split())[:SQL_FRAME_CHARS])
+                events.append({'type': 'O', 'frame': index, 'at': started * 1000})
+                events.append({'type': 'C', 'frame': index, 'at': finished * 1000})
+            profiles.append({
+                'type': 'evented',
+                'name': f'{name} (SQL)',
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': duration_ms,
+                'events': events
+            })
+
+        with open(path, 'w') as fileobj:
+            json.dump({
+                '$schema': 'https://www.speedscope.app/file-format-schema.json',
+                'shared': {'frames': self.frames},
+                'profiles': profiles,
+                'name': name,
+                'exporter': 'ia-cursos-online'
+            }, fileobj)
+
+
+class CProfileSession:
+    # Perfil determinístico; o arquivo .pstats abre no snakeviz ou no
+    # speedscope. As consultas aparecem como chamadas a cursor.execute.
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def sql_start(self, statement):
+        pass
+
+    def sql_end(self):
+        pass
+
+    def save(self, path, name):
+        self.profile.dump_stats(path)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    session = _sessions.get(threading.get_ident())
+    if session is not None:
+        session.sql_start(statement)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    session = _sessions.get(threading.get_ident())
+    if session is not None:
+        session.sql_end()
+
+
+def _gevent_patched():
+    # Com workers gevent as "threads" são greenlets, invisíveis para
+    # sys._current_frames; nesse caso só o cProfile funciona
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('threading')
+
+
+def _requested_mode():
+    flag = request.headers.get('X-Profile') or request.args.get('__profile')
+    if not flag or flag.lower() in ('0', 'false'):
+        return None
+    return 'cprofile' if flag.lower() == 'cprofile' or _gevent_patched() else 'sample'
+
+
+def _start_profile():
+    mode = _requested_mode()
+    if mode is None:
+        return
+
+    from src.routes.auth import user_from_request
+    user = user_from_request()
+    if user is None or not user.is_admin():
+        return
+
+    if mode == 'cprofile':
+        session = CProfileSession()
+    else:
+        try:
+            interval = float(request.headers.get('X-Profile-Interval', PROFILE_SAMPLE_INTERVAL_MS))
+        except ValueError:
+            interval = PROFILE_SAMPLE_INTERVAL_MS
+        session = SamplingSession(max(interval, 0.1))
+
+    g.profile_session = session
+    _sessions[threading.get_ident()] = session
+    session.start()
+
+
+def _stop_profile():
+    session = g.pop('profile_session', None)
+    if session is None:
+        return None
+    session.stop()
+    _sessions.pop(threading.get_ident(), None)
+
+    os.makedirs(profiles_dir(), exist_ok=True)
+    endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+    extension = 'pstats' if isinstance(session, CProfileSession) else 'speedscope.json'
+    filename = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}.{extension}"
+    session.save(os.path.join(profiles_dir(), filename), f'{request.method} {request.path}')
+    _prune()
+    return filename
+
+
+def _finish_profile(response):
+    filename = _stop_profile()
+    if filename:
+        response.headers['X-Profile-Id'] = filename
+    return response
+
+
+def _teardown_profile(exception):
+    # Requisições que terminaram em exceção também têm o perfil gravado
+    if 'profile_session' in g:
+        _stop_profile()
+
+
+def _prune():
+    entries = sorted(os.scandir(profiles_dir()), key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:-PROFILE_MAX_FILES]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def profiles_dir():
+    return PROFILE_DIR
+
+
+def list_profiles():
+    if not os.path.isdir(profiles_dir()):
+        return []
+    entries = sorted(os.scandir(profiles_dir()), key=lambda entry: entry.stat().st_mtime, reverse=True)
+    return [{
+        'id': entry.name,
+        'size': entry.stat().st_size,
+        'created_at': datetime.utcfromtimestamp(entry.stat().st_mtime).isoformat()
+    } for entry in entries if entry.is_file()]
+
+
+def init_app(app):
+    global _listening
+    if not PROFILER_ENABLED:
+        return
+
+    if not _listening:
+        # Os listeners são globais: registrá-los a cada app contaria cada consulta de novo
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_teardown_profile)
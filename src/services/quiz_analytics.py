@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import select
+from src.models.user import db
+from src.models.quiz import QuizAttempt
+from src.services.metrics import record_cache
+
+# Estatísticas por versão do quiz, recalculadas no máximo a cada QUIZ_ANALYTICS_TTL segundos
+QUIZ_ANALYTICS_TTL = int(os.getenv('QUIZ_ANALYTICS_TTL', 300))
+# Quantas tentativas são lidas do banco por vez
+QUIZ_ANALYTICS_CHUNK_SIZE = int(os.getenv('QUIZ_ANALYTICS_CHUNK_SIZE', 20000))
+# Fração de alunos nos grupos superior e inferior do índice de discriminação
+DISCRIMINATION_GROUP = 0.27
+HISTOGRAM_BINS = 10
+
+
+def load_answers(compiled):
+    # Carrega as respostas da versão em uma matriz (tentativas x questões),
+    # lendo em blocos com um cursor no servidor. Cada bloco é decodificado com
+    # um único json.loads e a matriz é montada com os blocos lidos, sem
+    # depender de uma contagem feita antes da leitura.
+    # NumPy só é importado quando as estatísticas são calculadas.
+    import numpy as np
+    filters = (
+        QuizAttempt.quiz_id == compiled.quiz_id,
+        QuizAttempt.quiz_version == compiled.version
+    )
+    max_id = db.session.execute(select(db.func.max(QuizAttempt.id)).where(*filters)).scalar()
+
+    chunks = []
+    if max_id is not None:
+        # max_id limita o conjunto lido: tentativas gravadas durante a leitura ficam para o próximo cálculo
+        result = db.session.execute(
+            select(QuizAttempt.answers).where(*filters, QuizAttempt.id <= max_id).order_by(
+                QuizAttempt.id
+            ).execution_options(yield_per=QUIZ_ANALYTICS_CHUNK_SIZE)
+        )
+        for partition in result.partitions():
+            chunks.append(np.array(
+                json.loads('[' + ','.join(row.answers for row in partition) + ']'),
+                dtype=np.int8
+            ).reshape(len(partition), len(compiled.question_ids)))
+
+    if not chunks:
+        return np.empty((0, len(compiled.question_ids)), dtype=np.int8)
+    return np.concatenate(chunks)
+
+
+def compute_statistics(compiled, answers):
+    import numpy as np
+    attempts, question_count = answers.shape
+    result = {
+        'quiz_id': compiled.quiz_id,
+        'version': compiled.version,
+        'attempts': attempts,
+        'question_count': question_count
+    }
+    if not attempts or not question_count:
+        result.update({'questions': [], 'scores': None})
+        return result
+
+    correct = answers == np.asarray(compiled.correct, dtype=np.int8)
+    totals = correct.sum(axis=1)
+
+    # Dificuldade: proporção de acertos por questão
+    difficulty = correct.mean(axis=0)
+
+    # Discriminação: acertos no grupo superior menos no inferior (27% de cada lado)
+    group_size = max(1, int(round(attempts * DISCRIMINATION_GROUP)))
+    order = np.argsort(totals, kind='stable')
+    discrimination = correct[order[-group_size:]].mean(axis=0) - correct[order[:group_size]].mean(axis=0)
+
+    # Frequência de cada alternativa (coluna 0 = em branco) com um único bincount
+    width = max(compiled.option_counts) + 1
+    offsets = np.arange(question_count, dtype=np.int64) * width
+    counts = np.bincount(
+        (answers.astype(np.int64) + 1 + offsets).ravel(),
+        minlength=question_count * width
+    ).reshape(question_count, width)
+
+    questions = []
+    for position, question_id in enumerate(compiled.question_ids):
+        option_counts = counts[position, 1:compiled.option_counts[position] + 1]
+        questions.append({
+            'question_id': question_id,
+            'correct_option': compiled.correct[position],
+            'difficulty': round(float(difficulty[position]), 4),
+            'discrimination': round(float(discrimination[position]), 4),
+            'blank': int(counts[position, 0]),
+            'options': option_counts.tolist(),
+            'option_rates': np.round(option_counts / attempts, 4).tolist()
+        })
+
+    scores = totals * (100.0 / question_count)
+    histogram, edges = np.histogram(scores, bins=HISTOGRAM_BINS, range=(0, 100))
+    result['questions'] = questions
+    result['scores'] = {
+        'mean': round(float(scores.mean()), 2),
+        'median': round(float(np.median(scores)), 2),
+        'std': round(float(scores.std()), 2),
+        'pass_rate': round(float((scores >= compiled.pass_score).mean()), 4),
+        'histogram': {
+            'edges': edges.tolist(),
+            'counts': histogram.tolist()
+        }
+    }
+    return result
+
+
+class QuizAnalyticsCache:
+    # Resultados por (quiz, versão). Uma nova versão publicada gera outra chave,
+    # então as estatísticas antigas simplesmente deixam de ser consultadas.
+
+    def __init__(self, ttl=QUIZ_ANALYTICS_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        # Um lock por (quiz, versão): requisições do mesmo quiz esperam um único
+        # cálculo, sem bloquear o cálculo de outros quizzes
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, compiled):
+        key = (compiled.quiz_id, compiled.version)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            record_cache('quiz_analytics', True)
+            return entry[1]
+
+        record_cache('quiz_analytics', False)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+
+            result = compute_statistics(compiled, load_answers(compiled))
+            result['generated_at'] = datetime.utcnow().isoformat()
+            with self._lock:
+                # Versões anteriores do mesmo quiz não serão mais consultadas
+                self._entries = {
+                    entry_key: value for entry_key, value in self._entries.items()
+                    if entry_key[0] != compiled.quiz_id
+                }
+                self._entries[key] = (time.monotonic() + self.ttl, result)
+                self._key_locks = {
+                    entry_key: lock for entry_key, lock in self._key_locks.items()
+                    if entry_key[0] != compiled.quiz_id or entry_key == key
+                }
+            return result
+
+
+quiz_analytics = QuizAnalyticsCache()
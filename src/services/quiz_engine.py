@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from types import MappingProxyType
+from flask import current_app
+from src.models.user import db
+from src.models.quiz import Quiz, Question, QuizAttempt
+from src.services.metrics import record_cache, record_write_failure
+
+# Por quanto tempo um gabarito compilado é usado antes de conferir se há nova versão
+QUIZ_KEY_TTL = int(os.getenv('QUIZ_KEY_TTL', 60))
+# Máximo de tentativas gravadas em um único INSERT
+QUIZ_ATTEMPT_BATCH_SIZE = int(os.getenv('QUIZ_ATTEMPT_BATCH_SIZE', 200))
+# Espera opcional (segundos) antes de gravar um grupo, para juntar mais tentativas
+QUIZ_ATTEMPT_GROUP_WAIT = float(os.getenv('QUIZ_ATTEMPT_GROUP_WAIT', 0))
+
+
+# Gabarito imutável de uma versão publicada do quiz. `positions` mapeia o ID
+# da questão para sua posição; `correct` traz a alternativa correta por posição;
+# `public_json` é o quiz sem as respostas, já serializado para o GET.
+CompiledQuiz = namedtuple('CompiledQuiz', [
+    'quiz_id', 'version', 'lesson_id', 'title', 'pass_score',
+    'question_ids', 'positions', 'correct', 'option_counts', 'public_json'
+])
+
+
+def compile_quiz(quiz):
+    questions = list(quiz.questions)
+    return CompiledQuiz(
+        quiz_id=quiz.id,
+        version=quiz.version,
+        lesson_id=quiz.lesson_id,
+        title=quiz.title,
+        pass_score=quiz.pass_score,
+        question_ids=tuple(question.id for question in questions),
+        positions=MappingProxyType({question.id: i for i, question in enumerate(questions)}),
+        correct=tuple(question.correct_option for question in questions),
+        option_counts=tuple(len(json.loads(question.options)) for question in questions),
+        public_json=json.dumps({
+            'id': quiz.id,
+            'lesson_id': quiz.lesson_id,
+            'title': quiz.title,
+            'version': quiz.version,
+            'questions': [question.to_dict() for question in questions]
+        })
+    )
+
+
+class QuizKeyCache:
+    # Gabaritos compilados por aula, em memória no processo. Corrigir uma
+    # tentativa não faz nenhuma consulta enquanto o gabarito estiver em cache.
+
+    def __init__(self, ttl=QUIZ_KEY_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+
+    def get(self, lesson_id):
+        entry = self._entries.get(lesson_id)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            record_cache('quiz_keys', True)
+            return entry[1]
+
+        self.misses += 1
+        record_cache('quiz_keys', False)
+        quiz = Quiz.query.filter_by(lesson_id=lesson_id, published=True).options(
+            db.selectinload(Quiz.questions)
+        ).first()
+        if quiz is None:
+            # Ausência não vai para o cache: um quiz publicado em outro worker
+            # precisa aparecer aqui na hora
+            self._entries.pop(lesson_id, None)
+            return None
+        compiled = compile_quiz(quiz)
+        self._entries[lesson_id] = (time.monotonic() + self.ttl, compiled)
+        return compiled
+
+    def invalidate(self, lesson_id):
+        self._entries.pop(lesson_id, None)
+
+
+def grade(compiled, answers):
+    # answers: {ID da questão: índice da alternativa}. Retorna a lista de
+    # respostas alinhada ao gabarito e o número de acertos.
+    chosen = [-1] * len(compiled.question_ids)
+    for question_id, option in answers.items():
+        try:
+            position = compiled.positions.get(int(question_id))
+        except (TypeError, ValueError):
+            continue
+        if position is not None and isinstance(option, int) and 0 <= option < compiled.option_counts[position]:
+            chosen[position] = option
+
+    correct_count = sum(1 for option, correct in zip(chosen, compiled.correct) if option == correct)
+    return chosen, correct_count
+
+
+class _PendingAttempt:
+    __slots__ = ('row', 'wake', 'finished', 'attempt_id', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.wake = threading.Event()
+        self.finished = False
+        self.attempt_id = None
+        self.error = None
+
+
+class AttemptGroupCommit:
+    # Commit em grupo das tentativas: enquanto um grupo é gravado, as tentativas
+    # que chegam no processo esperam na fila e entram juntas no grupo seguinte,
+    # com um único INSERT e um único commit. Cada requisição só responde depois
+    # do commit do seu grupo, então nenhuma nota é devolvida com a tentativa
+    # apenas em memória. A requisição mais antiga da fila grava o grupo.
+
+    def __init__(self, batch_size=QUIZ_ATTEMPT_BATCH_SIZE, group_wait=QUIZ_ATTEMPT_GROUP_WAIT):
+        self.batch_size = batch_size
+        self.group_wait = group_wait
+        self._pending = []
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def write(self, row):
+        # Retorna o ID da tentativa gravada ou levanta o erro do grupo
+        item = _PendingAttempt(row)
+        with self._lock:
+            self._pending.append(item)
+            leader = not self._flushing
+            self._flushing = True
+
+        if not leader:
+            item.wake.wait()
+        if not item.finished:
+            # Primeira da fila: grava o grupo, que inclui a própria tentativa
+            self._flush_group()
+
+        if item.error is not None:
+            raise item.error
+        return item.attempt_id
+
+    def _flush_group(self):
+        if self.group_wait:
+            time.sleep(self.group_wait)
+        with self._lock:
+            group, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+
+        try:
+            ids = self._insert([item.row for item in group])
+            for item, attempt_id in zip(group, ids):
+                item.attempt_id = attempt_id
+        except Exception as exc:
+            current_app.logger.exception('Falha ao gravar %d tentativas de quiz', len(group))
+            for item in group:
+                item.error = exc
+                record_write_failure('quiz_attempt')
+        finally:
+            with self._lock:
+                next_leader = self._pending[0] if self._pending else None
+                if next_leader is None:
+                    self._flushing = False
+            for item in group:
+                item.finished = True
+                item.wake.set()
+            if next_leader is not None:
+                next_leader.wake.set()
+
+    @staticmethod
+    def _insert(rows):
+        # Conexão própria, fora da sessão da requisição; RETURNING na ordem das linhas
+        statement = db.insert(QuizAttempt).returning(QuizAttempt.id, sort_by_parameter_order=True)
+        with db.engine.begin() as connection:
+            return [attempt_id for (attempt_id,) in connection.execute(statement, rows)]
+
+
+quiz_keys = QuizKeyCache()
+attempt_writer = AttemptGroupCommit()
+
+
+def record_attempt(compiled, user_id, chosen, correct_count, score, passed):
+    # Retorna o ID da tentativa depois do commit; levanta o erro do banco se
+    # o grupo não pôde ser gravado
+    return attempt_writer.write({
+        'quiz_id': compiled.quiz_id,
+        'quiz_version': compiled.version,
+        'user_id': user_id,
+        'answers': json.dumps(chosen),
+        'correct_count': correct_count,
+        'score': score,
+        'passed': passed,
+        'created_at': datetime.utcnow()
+    })
+
+
+def publish_quiz(quiz, title, pass_score, questions):
+    # Substitui as questões e publica uma nova versão; tentativas antigas
+    # continuam associadas à versão que responderam
+    quiz.title = title
+    quiz.pass_score = pass_score
+    quiz.questions = [
+        Question(
+            text=question['text'],
+            options=json.dumps(question['options']),
+            correct_option=question['correct_option'],
+            order=i
+        )
+        for i, question in enumerate(questions)
+    ]
+    quiz.version = (quiz.version or 0) + 1
+    quiz.published = True
+    db.session.commit()
+    quiz_keys.invalidate(quiz.lesson_id)
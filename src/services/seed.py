@@ -0,0 +1,339 @@
+import csv
+import io
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+from src.models.user import db, User
+from src.models.course import Category, Course, Module, Lesson, Material, Enrollment, Progress, Review
+from src.models.payment import Payment, Coupon, Certificate
+from src.models.quiz import Quiz, Question
+
+# Geração de dados sintéticos em escala de produção. Os valores são gerados
+# em blocos com NumPy (a partir de uma semente, então a mesma execução gera o
+# mesmo conjunto) e gravados com COPY no PostgreSQL; em outros bancos, com
+# INSERT em lote. Os IDs são atribuídos aqui, a partir do maior ID existente,
+# para que as chaves estrangeiras sejam calculadas sem ida ao banco.
+
+SEED_CHUNK_SIZE = 100_000
+LEVELS = ['iniciante', 'intermediário', 'avançado']
+PRICES = [49.9, 79.9, 99.9, 149.9, 199.9, 299.9]
+PAYMENT_METHODS = ['credit_card', 'pix', 'boleto']
+PAYMENT_STATUSES = ['completed', 'refunded', 'failed']
+PAYMENT_STATUS_WEIGHTS = [0.95, 0.03, 0.02]
+RATING_WEIGHTS = [0.04, 0.06, 0.15, 0.35, 0.40]
+QUESTIONS_PER_QUIZ = 5
+
+
+class _Loader:
+    # Grava blocos de linhas com COPY (psycopg2) ou INSERT em lote
+
+    def __init__(self):
+        self.copy = db.engine.dialect.driver == 'psycopg2'
+        self.counts = Counter()
+        self.connection = db.engine.raw_connection() if self.copy else None
+
+    def load(self, model, columns, rows):
+        if not rows:
+            return
+        table = model.__table__.name
+        if self.copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor = self.connection.cursor()
+            # Colunas entre aspas: "order" é palavra reservada
+            column_list = ', '.join(f'"{column}"' for column in columns)
+            cursor.copy_expert(f'COPY "{table}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+            self.connection.commit()
+        else:
+            db.session.execute(model.__table__.insert(), [dict(zip(columns, row)) for row in rows])
+            db.session.commit()
+        self.counts[table] += len(rows)
+
+    def reset_sequences(self, models):
+        # COPY com IDs explícitos não avança as sequências do PostgreSQL
+        if not self.copy:
+            return
+        cursor = self.connection.cursor()
+        for model in models:
+            table = model.__table__.name
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM \"{table}\"), 1))"
+            )
+        self.connection.commit()
+
+    def analyze(self, models):
+        if not self.copy:
+            return
+        cursor = self.connection.cursor()
+        for model in models:
+            cursor.execute(f'ANALYZE "{model.__table__.name}"')
+        self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _dates(rng, size, days, now):
+    # Datas aleatórias nos últimos `days` dias, já como datetime do Python
+    import numpy as np
+    seconds = rng.integers(0, days * 86400, size).astype('timedelta64[s]')
+    return (np.datetime64(now, 's') - seconds).astype('datetime64[us]').tolist()
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+def _zipf_weights(rng, size, exponent):
+    # Lei de potência: poucos cursos concentram a maior parte das matrículas.
+    # A ordem de popularidade é embaralhada para não coincidir com o ID.
+    import numpy as np
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def _enrollment_keys(rng, users, courses, enrollments, exponent):
+    # Pares (usuário, curso) distintos codificados como usuário * courses + curso
+    import numpy as np
+    popularity = _zipf_weights(rng, courses, exponent)
+    target = min(enrollments, users * courses)
+    keys = np.empty(0, dtype=np.int64)
+    while len(keys) < target:
+        size = int((target - len(keys)) * 1.1) + 16
+        sampled = rng.integers(0, users, size, dtype=np.int64) * courses + rng.choice(courses, size, p=popularity)
+        keys = np.unique(np.concatenate([keys, sampled]))
+    if len(keys) > target:
+        keys = np.sort(rng.choice(keys, target, replace=False))
+    return keys
+
+
+def seed_database(users=500_000, instructors=500, courses=1_000, modules=8, lessons=6,
+                  enrollments=2_000_000, progress_rate=0.07, review_rate=0.15, paid_rate=0.8,
+                  coupons=1_000, categories=12, zipf=1.1, days=730, seed=42,
+                  chunk_size=SEED_CHUNK_SIZE, analyze=True, echo=click.echo):
+    # NumPy é importado só aqui, para não pesar na inicialização da aplicação
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    loader = _Loader()
+    started = time.perf_counter()
+    instructors = max(1, min(instructors, users))
+    lessons_per_course = modules * lessons
+
+    def report(label, start):
+        echo(f'{label}: {time.perf_counter() - start:.1f}s')
+
+    try:
+        # Categorias
+        category0 = _next_id(Category)
+        loader.load(Category, ['id', 'name', 'description'], [
+            (category0 + i, f'Categoria {category0 + i}', 'Categoria gerada pelo seed')
+            for i in range(categories)
+        ])
+
+        # Usuários (os primeiros são instrutores); todos com a senha "seed123"
+        step = time.perf_counter()
+        user0 = _next_id(User)
+        password_hash = generate_password_hash('seed123')
+        for start, end in _chunks(users, chunk_size):
+            ids = range(user0 + start, user0 + end)
+            created = _dates(rng, end - start, days, now)
+            loader.load(User, ['id', 'username', 'email', 'password_hash', 'first_name', 'last_name',
+                               'role', 'created_at'], [
+                (user_id, f'seed{user_id}', f'seed{user_id}@example.com', password_hash,
+                 'Aluno', str(user_id), 'instructor' if user_id - user0 < instructors else 'student', created_at)
+                for user_id, created_at in zip(ids, created)
+            ])
+        report(f'{users} usuários', step)
+
+        # Cursos e preços efetivos (usados nos pagamentos)
+        course0 = _next_id(Course)
+        prices = rng.choice(PRICES, courses)
+        discounted = rng.random(courses) < 0.3
+        discount_prices = np.round(prices * 0.7, 2)
+        effective_prices = np.where(discounted, discount_prices, prices)
+        loader.load(Course, ['id', 'title', 'subtitle', 'description', 'price', 'discount_price',
+                             'level', 'duration', 'created_at', 'updated_at', 'category_id',
+                             'instructor_id'], [
+            (course0 + i, f'Curso {course0 + i}', 'Gerado pelo seed', 'Curso gerado pelo seed',
+             float(prices[i]), float(discount_prices[i]) if discounted[i] else None,
+             LEVELS[i % len(LEVELS)], lessons_per_course * 10, created_at, created_at,
+             category0 + int(category), user0 + int(instructor))
+            for i, (created_at, category, instructor) in enumerate(zip(
+                _dates(rng, courses, days, now),
+                rng.integers(0, categories, courses),
+                rng.integers(0, instructors, courses)
+            ))
+        ])
+
+        # Currículo: IDs contíguos por curso. A aula j do curso c é lesson0 + c * lessons_per_course + j.
+        step = time.perf_counter()
+        module0, lesson0 = _next_id(Module), _next_id(Lesson)
+        material0, quiz0, question0 = _next_id(Material), _next_id(Quiz), _next_id(Question)
+        options = json.dumps(['Alternativa A', 'Alternativa B', 'Alternativa C', 'Alternativa D'])
+        course_step = max(1, chunk_size // max(1, lessons_per_course))
+        for start, end in _chunks(courses, course_step):
+            module_rows, lesson_rows, material_rows, quiz_rows, question_rows = [], [], [], [], []
+            for c in range(start, end):
+                for k in range(modules):
+                    module_index = c * modules + k
+                    module_id = module0 + module_index
+                    module_rows.append((module_id, f'Módulo {k + 1}', k, course0 + c))
+                    first_lesson = lesson0 + module_index * lessons
+                    for j in range(lessons):
+                        lesson_id = first_lesson + j
+                        lesson_rows.append((lesson_id, f'Aula {j + 1}', 'Conteúdo gerado pelo seed',
+                                            f'/static/videos/seed_{lesson_id}.mp4', 10, j, module_id))
+                    material_rows.append((material0 + module_index, f'Material do módulo {k + 1}', 'document',
+                                          f'/static/materials/seed_{module_id}.pdf', first_lesson))
+                    quiz_id = quiz0 + module_index
+                    quiz_rows.append((quiz_id, f'Quiz do módulo {k + 1}', 70, 1, True, now, now,
+                                      first_lesson + lessons - 1))
+                    for q in range(QUESTIONS_PER_QUIZ):
+                        question_rows.append((question0 + module_index * QUESTIONS_PER_QUIZ + q,
+                                              f'Questão {q + 1}', options, (module_index + q) % 4, q, quiz_id))
+            loader.load(Module, ['id', 'title', 'order', 'course_id'], module_rows)
+            loader.load(Lesson, ['id', 'title', 'content', 'video_url', 'duration', 'order', 'module_id'],
+                        lesson_rows)
+            loader.load(Material, ['id', 'title', 'type', 'url', 'lesson_id'], material_rows)
+            loader.load(Quiz, ['id', 'title', 'pass_score', 'version', 'published', 'created_at',
+                               'updated_at', 'lesson_id'], quiz_rows)
+            loader.load(Question, ['id', 'text', 'options', 'correct_option', 'order', 'quiz_id'],
+                        question_rows)
+        report(f'{courses} cursos com currículo', step)
+
+        # Cupons
+        coupon0 = _next_id(Coupon)
+        loader.load(Coupon, ['id', 'code', 'discount_percent', 'valid_from', 'valid_until', 'max_uses',
+                             'current_uses'], [
+            (coupon0 + i, f'SEED{coupon0 + i}', int(percent), valid_from,
+             valid_from + timedelta(days=365), 1000, 0)
+            for i, (percent, valid_from) in enumerate(zip(
+                rng.choice([5, 10, 15, 20, 30, 50], coupons), _dates(rng, coupons, days, now)
+            ))
+        ])
+
+        # Matrículas com popularidade em lei de potência, e os dados que dependem delas
+        step = time.perf_counter()
+        keys = _enrollment_keys(rng, users, courses, enrollments, zipf)
+        enrollment0, progress0 = _next_id(Enrollment), _next_id(Progress)
+        review0, payment0, certificate0 = _next_id(Review), _next_id(Payment), _next_id(Certificate)
+        # Fração de aulas concluídas por matrícula ~ Beta com média progress_rate
+        beta_a = 0.5
+        beta_b = beta_a * (1 - progress_rate) / max(progress_rate, 1e-6)
+
+        for start, end in _chunks(len(keys), chunk_size):
+            size = end - start
+            ids = np.arange(enrollment0 + start, enrollment0 + end)
+            user_ids = keys[start:end] // courses + user0
+            course_index = keys[start:end] % courses
+            dates = _dates(rng, size, days, now)
+            watched = rng.binomial(lessons_per_course, rng.beta(beta_a, beta_b, size))
+            completed = watched == lessons_per_course
+
+            loader.load(Enrollment, ['id', 'date', 'completed', 'user_id', 'course_id'], list(zip(
+                ids.tolist(), dates, completed.tolist(), user_ids.tolist(), (course_index + course0).tolist()
+            )))
+
+            # Progresso: as primeiras `watched` aulas de cada matrícula
+            total = int(watched.sum())
+            owners = np.repeat(np.arange(size), watched)
+            offsets = np.arange(total) - np.repeat(np.cumsum(watched) - watched, watched)
+            lesson_ids = lesson0 + course_index[owners] * lessons_per_course + offsets
+            loader.load(Progress, ['id', 'lesson_id', 'completed', 'last_watched', 'enrollment_id'], list(zip(
+                range(progress0, progress0 + total), lesson_ids.tolist(), [True] * total,
+                _dates(rng, total, days, now), ids[owners].tolist()
+            )))
+            progress0 += total
+
+            reviewed = np.flatnonzero(rng.random(size) < review_rate)
+            ratings = rng.choice(np.arange(1, 6), len(reviewed), p=RATING_WEIGHTS)
+            loader.load(Review, ['id', 'rating', 'comment', 'date', 'user_id', 'course_id'], list(zip(
+                range(review0, review0 + len(reviewed)), ratings.tolist(),
+                [None if rating < 4 else 'Ótimo curso!' for rating in ratings.tolist()],
+                [dates[i] for i in reviewed], user_ids[reviewed].tolist(), (course_index[reviewed] + course0).tolist()
+            )))
+            review0 += len(reviewed)
+
+            paid = np.flatnonzero(rng.random(size) < paid_rate)
+            payment_ids = range(payment0, payment0 + len(paid))
+            statuses = rng.choice(len(PAYMENT_STATUSES), len(paid), p=PAYMENT_STATUS_WEIGHTS)
+            methods = rng.integers(0, len(PAYMENT_METHODS), len(paid))
+            paid_dates = [dates[i] for i in paid]
+            loader.load(Payment, ['id', 'amount', 'currency', 'status', 'payment_method', 'payment_id',
+                                  'created_at', 'updated_at', 'user_id', 'course_id'], list(zip(
+                payment_ids, effective_prices[course_index[paid]].tolist(), ['BRL'] * len(paid),
+                [PAYMENT_STATUSES[s] for s in statuses.tolist()], [PAYMENT_METHODS[m] for m in methods.tolist()],
+                [f'SEED-{payment_id}' for payment_id in payment_ids], paid_dates, paid_dates,
+                user_ids[paid].tolist(), (course_index[paid] + course0).tolist()
+            )))
+            payment0 += len(paid)
+
+            finished = np.flatnonzero(completed)
+            loader.load(Certificate, ['id', 'issue_date', 'certificate_url', 'user_id', 'course_id'], [
+                (certificate0 + n, now, f'/api/content/certificates/files/seed_{user_id}_{course_id}.pdf', user_id, course_id)
+                for n, (user_id, course_id) in enumerate(zip(
+                    user_ids[finished].tolist(), (course_index[finished] + course0).tolist()
+                ))
+            ])
+            certificate0 += len(finished)
+            echo(f'  matrículas {end}/{len(keys)}')
+        report(f'{len(keys)} matrículas e dados associados', step)
+
+        models = [Category, User, Course, Module, Lesson, Material, Quiz, Question, Coupon,
+                  Enrollment, Progress, Review, Payment, Certificate]
+        loader.reset_sequences(models)
+        if analyze:
+            loader.analyze(models)
+    finally:
+        loader.close()
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(loader.counts.values())
+    echo(f'{total_rows} linhas em {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):,.0f} linhas/s, '
+         f"{'COPY' if loader.copy else 'INSERT'})")
+    for table, count in sorted(loader.counts.items()):
+        echo(f'  {table}: {count}')
+    return loader.counts
+
+
+@click.command('seed')
+@click.option('--scale', default=1.0, show_default=True, help='Multiplica todos os volumes.')
+@click.option('--users', default=500_000, show_default=True)
+@click.option('--instructors', default=500, show_default=True)
+@click.option('--courses', default=1_000, show_default=True)
+@click.option('--modules', default=8, show_default=True, help='Módulos por curso.')
+@click.option('--lessons', default=6, show_default=True, help='Aulas por módulo.')
+@click.option('--enrollments', default=2_000_000, show_default=True)
+@click.option('--progress-rate', default=0.07, show_default=True, help='Fração média de aulas concluídas.')
+@click.option('--review-rate', default=0.15, show_default=True, help='Fração de matrículas com avaliação.')
+@click.option('--paid-rate', default=0.8, show_default=True, help='Fração de matrículas com pagamento.')
+@click.option('--coupons', default=1_000, show_default=True)
+@click.option('--zipf', default=1.1, show_default=True, help='Expoente da popularidade dos cursos.')
+@click.option('--days', default=730, show_default=True, help='Período coberto pelas datas geradas.')
+@click.option('--seed', default=42, show_default=True, help='Semente do gerador aleatório.')
+@click.option('--chunk-size', default=SEED_CHUNK_SIZE, show_default=True)
+@click.option('--no-analyze', is_flag=True, help='Não executa ANALYZE ao final.')
+@with_appcontext
+def seed_command(scale, users, instructors, courses, modules, lessons, enrollments, progress_rate,
+                 review_rate, paid_rate, coupons, zipf, days, seed, chunk_size, no_analyze):
+    """Gera dados sintéticos (usuários, cursos, matrículas, progresso, avaliações, pagamentos...)."""
+    seed_database(
+        users=int(users * scale), instructors=max(1, int(instructors * scale)),
+        courses=max(1, int(courses * scale)), modules=modules, lessons=lessons,
+        enrollments=int(enrollments * scale), progress_rate=progress_rate, review_rate=review_rate,
+        paid_rate=paid_rate, coupons=int(coupons * scale), zipf=zipf, days=days, seed=seed,
+        chunk_size=chunk_size, analyze=not no_analyze
+    )
@@ -0,0 +1,71 @@
+import base64
+import hashlib
+import hmac
+import os
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from flask import current_app
+from src.services.storage import MATERIALS_URL_PREFIX
+
+# URLs assinadas para materiais e vídeos: ?expires=<epoch>&signature=<hmac>.
+# A assinatura é HMAC-SHA256 de "<caminho>\n<expires>" em base64url sem
+# padding, então qualquer servidor com a chave (Nginx com njs, CDN, a própria
+# aplicação) valida o acesso sem consultar o banco.
+SIGNED_URL_TTL = int(os.getenv('SIGNED_URL_TTL', 3600))
+# Arredondar a expiração faz a mesma URL valer para várias requisições
+# seguidas, o que permite ao navegador reaproveitar o cache
+SIGNED_URL_BUCKET = 300
+REQUIRE_SIGNED_MATERIALS = os.getenv('REQUIRE_SIGNED_MATERIALS', 'true').lower() == 'true'
+
+
+def _key():
+    return (os.getenv('SIGNED_URL_SECRET') or current_app.config['SECRET_KEY']).encode()
+
+
+def _signature(path, expires):
+    digest = hmac.new(_key(), f'{path}\n{expires}'.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+
+def sign_url(url, ttl=SIGNED_URL_TTL):
+    if not url:
+        return url
+
+    expires = int(time.time()) + ttl
+    expires += -expires % SIGNED_URL_BUCKET
+
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query)
+    query += [('expires', str(expires)), ('signature', _signature(parts.path, expires))]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def sign_material_url(url, ttl=SIGNED_URL_TTL):
+    # Apenas arquivos servidos pela aplicação em /static/materials/ são
+    # assinados, incluindo vídeos enviados pelo upload retomável. Vídeos e
+    # links em outros hosts (YouTube, Vimeo...) são devolvidos como estão: a
+    # proteção deles depende do próprio host. Só deve ser chamado para quem
+    # tem acesso à aula.
+    if not url:
+        return url
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path.startswith(MATERIALS_URL_PREFIX):
+        return url
+    return sign_url(url, ttl)
+
+
+def verify_signature(path, expires, signature):
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+
+    if expires < time.time() or not signature:
+        return False
+    return hmac.compare_digest(_signature(path, expires), signature)
+
+
+def verify_signed_url(url):
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    return verify_signature(parts.path, query.get('expires'), query.get('signature'))
@@ -0,0 +1,96 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Contagem de consultas e tempo de banco por requisição. Os totais vão nos
+# cabeçalhos X-DB-Query-Count / X-DB-Time-ms (e Server-Timing) em modo debug
+# ou com SQL_METRICS_HEADERS=true; consultas acima de SLOW_QUERY_MS são
+# registradas no log com o endpoint que as executou.
+SQL_METRICS_HEADERS = os.getenv('SQL_METRICS_HEADERS', 'false').lower() == 'true'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+# Tamanho máximo do SQL registrado no log de consultas lentas
+SLOW_QUERY_LOG_CHARS = 1000
+
+logger = logging.getLogger('src.sql')
+
+_listening = False
+_local = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+
+    if has_app_context() and 'sql_query_count' in g:
+        g.sql_query_count += 1
+        g.sql_time_ms += elapsed_ms
+
+    for counter in getattr(_local, 'counters', ()):
+        counter.append((statement, elapsed_ms))
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        endpoint = request.endpoint if has_request_context() else None
+        logger.warning('Consulta lenta (%.1f ms) em %s: %s', elapsed_ms, endpoint or '-',
+                       statement[:SLOW_QUERY_LOG_CHARS])
+
+
+def _start_request():
+    g.sql_query_count = 0
+    g.sql_time_ms = 0.0
+
+
+def _add_headers(response):
+    if 'sql_query_count' in g:
+        response.headers['X-DB-Query-Count'] = str(g.sql_query_count)
+        response.headers['X-DB-Time-ms'] = f'{g.sql_time_ms:.1f}'
+        response.headers.add('Server-Timing', f'db;dur={g.sql_time_ms:.1f}')
+    return response
+
+
+def init_app(app):
+    global _listening
+    if not _listening:
+        # Escuta todos os engines, inclusive os criados depois (binds, réplicas)
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+    app.before_request(_start_request)
+    if app.debug or SQL_METRICS_HEADERS:
+        app.after_request(_add_headers)
+
+
+@contextmanager
+def count_queries():
+    # Coleta (sql, ms) de cada consulta executada na thread atual dentro do bloco
+    queries = []
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    counters.append(queries)
+    try:
+        yield queries
+    finally:
+        counters.remove(queries)
+
+
+@contextmanager
+def assert_max_queries(max_queries):
+    # Uso em testes e benchmarks:
+    #     with assert_max_queries(5):
+    #         client.get('/api/courses/')
+    with count_queries() as queries:
+        yield queries
+    if len(queries) > max_queries:
+        statements = '\n'.join(f'{i}. {sql}' for i, (sql, _) in enumerate(queries, start=1))
+        raise AssertionError(
+            f'{len(queries)} consultas executadas, limite de {max_queries}:\n{statements}'
+        )
@@ -0,0 +1,264 @@
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from src.models.user import db
+from src.models.course import UploadSession
+
+# Os materiais são armazenados pelo SHA-256 do conteúdo, em
+# MATERIALS_DIR/<2 primeiros caracteres>/<sha256>.<extensão>, de modo que
+# o mesmo arquivo enviado para várias aulas é guardado uma única vez. A URL
+# pública continua /static/materials/..., atendida apenas pela rota que
+# confere a assinatura.
+
+# Dados gravados pela aplicação (fora do pacote e do diretório static)
+STORAGE_DIR = os.getenv(
+    'STORAGE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'storage')
+)
+# Fora do static_folder: a rota /static/<path> do Flask não confere
+# assinatura e serviria os materiais diretamente (ex.: /static/./materials/...)
+MATERIALS_DIR = os.getenv('MATERIALS_DIR', os.path.join(STORAGE_DIR, 'materials'))
+MATERIALS_URL_PREFIX = '/static/materials/'
+# Os uploads em andamento ficam fora de static para não serem servidos. Devem
+# estar no mesmo volume dos materiais, para que a publicação seja um rename atômico
+UPLOAD_TMP_DIR = os.getenv('UPLOAD_TMP_DIR', os.path.join(STORAGE_DIR, 'uploads'))
+# Certificados emitidos, entregues apenas ao dono pela rota autenticada
+CERTIFICATES_DIR = os.getenv('CERTIFICATES_DIR', os.path.join(STORAGE_DIR, 'certificates'))
+CERTIFICATES_URL_PREFIX = '/api/content/certificates/files/'
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 2 * 1024 ** 3))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 ** 2))  # sugerido ao cliente
+# Uploads sem atividade por mais que isso são descartados (flask uploads sweep)
+UPLOAD_TTL = int(os.getenv('UPLOAD_TTL', 24 * 3600))
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class OffsetMismatch(Exception):
+
+    def __init__(self, offset):
+        super().__init__(f'Offset esperado: {offset}')
+        self.offset = offset
+
+
+class UploadBusy(Exception):
+    pass
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def materials_dir():
+    return MATERIALS_DIR
+
+
+def certificates_dir():
+    return CERTIFICATES_DIR
+
+
+def copy_stream(stream, fileobj, hasher, limit):
+    # Copia no máximo `limit` bytes em blocos de tamanho fixo, atualizando o hash;
+    # a memória usada não depende do tamanho do arquivo. Se sobrarem bytes no
+    # stream, levanta UploadTooLarge em vez de truncar o arquivo.
+    written = 0
+    while written < limit:
+        block = stream.read(min(READ_BLOCK_SIZE, limit - written))
+        if not block:
+            return written
+        fileobj.write(block)
+        hasher.update(block)
+        written += len(block)
+    if stream.read(1):
+        raise UploadTooLarge()
+    return written
+
+
+def _move_into_place(path, destination):
+    try:
+        os.replace(path, destination)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # UPLOAD_TMP_DIR em outro volume: copia para um temporário ao lado do
+        # destino e renomeia, para que o destino nunca fique pela metade
+        partial = f'{destination}.{uuid.uuid4().hex}.tmp'
+        try:
+            shutil.copyfile(path, partial)
+            os.replace(partial, destination)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        os.remove(path)
+
+
+def store_content(path, digest, extension):
+    # Move o arquivo para o armazenamento por conteúdo; se já existir um
+    # arquivo com o mesmo hash, o novo é descartado
+    relative_path = f'{digest[:2]}/{digest}.{extension}'
+    destination = os.path.join(materials_dir(), relative_path)
+
+    if os.path.exists(destination):
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        _move_into_place(path, destination)
+
+    return MATERIALS_URL_PREFIX + relative_path
+
+
+def store_file(stream, extension):
+    # Upload em uma única requisição: grava em disco em blocos e calcula o hash no caminho
+    os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_TMP_DIR, f'{uuid.uuid4()}.part')
+    hasher = hashlib.sha256()
+    try:
+        with open(path, 'wb') as fileobj:
+            copy_stream(stream, fileobj, hasher, MAX_UPLOAD_SIZE)
+        return store_content(path, hasher.hexdigest(), extension)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+class ResumableUploads:
+    # Uploads em partes com retomada. O offset atual é o tamanho do arquivo
+    # parcial em disco, então não há escrita no banco a cada parte. O estado do
+    # SHA-256 fica em memória no processo que recebeu a última parte; se a parte
+    # seguinte cair em outro worker (ou após um restart), o hash é reconstruído
+    # lendo o arquivo parcial em blocos.
+
+    def __init__(self):
+        self._hashers = {}
+        self._lock = threading.Lock()
+
+    def part_path(self, upload_id):
+        return os.path.join(UPLOAD_TMP_DIR, f'{upload_id}.part')
+
+    def offset(self, upload_id):
+        try:
+            return os.path.getsize(self.part_path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def append(self, upload_id, stream, offset, remaining):
+        os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+        with open(self.part_path(upload_id), 'ab') as fileobj:
+            try:
+                fcntl.flock(fileobj, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadBusy()
+
+            current = fileobj.seek(0, os.SEEK_END)
+            if offset != current:
+                raise OffsetMismatch(current)
+
+            hasher = self._hasher(upload_id, current)
+            try:
+                written = copy_stream(stream, fileobj, hasher, remaining)
+            except UploadTooLarge:
+                # A parte passa do tamanho declarado: é descartada inteira
+                fileobj.truncate(current)
+                with self._lock:
+                    self._hashers.pop(upload_id, None)
+                raise
+            except BaseException:
+                # Conexão interrompida: o que foi gravado vale para a retomada
+                self._remember(upload_id, fileobj, hasher)
+                raise
+            self._remember(upload_id, fileobj, hasher)
+        return current + written
+
+    def finish(self, upload_id):
+        # Retorna (caminho do arquivo parcial, sha256 hexadecimal)
+        path = self.part_path(upload_id)
+        hasher = self._hasher(upload_id, os.path.getsize(path))
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        return path, hasher.hexdigest()
+
+    def discard(self, upload_id):
+        with self._lock:
+            self._hashers.pop(upload_id, None)
+        try:
+            os.remove(self.part_path(upload_id))
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, upload_id, fileobj, hasher):
+        fileobj.flush()
+        with self._lock:
+            self._hashers[upload_id] = (fileobj.tell(), hasher)
+
+    def _hasher(self, upload_id, offset):
+        with self._lock:
+            state = self._hashers.get(upload_id)
+        if state and state[0] == offset:
+            return state[1]
+
+        hasher = hashlib.sha256()
+        if offset:
+            with open(self.part_path(upload_id), 'rb') as fileobj:
+                while True:
+                    block = fileobj.read(READ_BLOCK_SIZE)
+                    if not block:
+                        break
+                    hasher.update(block)
+        return hasher
+
+
+resumable_uploads = ResumableUploads()
+
+
+def sweep_uploads(max_age=UPLOAD_TTL):
+    # Descarta os uploads em partes sem atividade há mais de max_age segundos
+    # (a última parte recebida é a data de modificação do arquivo parcial) e
+    # os arquivos .part órfãos, deixados por uploads em uma única requisição
+    # interrompidos por um restart. Retorna (sessões removidas, arquivos removidos).
+    cutoff = time.time() - max_age
+    removed_sessions = 0
+    for upload in UploadSession.query.filter(UploadSession.created_at < datetime.utcfromtimestamp(cutoff)).all():
+        try:
+            if os.path.getmtime(resumable_uploads.part_path(upload.id)) >= cutoff:
+                continue
+        except FileNotFoundError:
+            pass
+        resumable_uploads.discard(upload.id)
+        db.session.delete(upload)
+        removed_sessions += 1
+    db.session.commit()
+
+    if not os.path.isdir(UPLOAD_TMP_DIR):
+        return removed_sessions, 0
+
+    active = {upload_id for (upload_id,) in db.session.query(UploadSession.id).all()}
+    removed_files = 0
+    for entry in os.scandir(UPLOAD_TMP_DIR):
+        if not entry.name.endswith('.part') or entry.name[:-len('.part')] in active:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed_files += 1
+        except FileNotFoundError:
+            pass
+    return removed_sessions, removed_files
+
+
+uploads_cli = AppGroup('uploads', help='Manutenção dos uploads de materiais.')
+
+
+@uploads_cli.command('sweep')
+@click.option('--max-age', default=UPLOAD_TTL, show_default=True, help='Segundos sem atividade.')
+def sweep_command(max_age):
+    """Remove uploads abandonados e arquivos parciais órfãos."""
+    sessions, files = sweep_uploads(max_age)
+    click.echo(f'{sessions} uploads e {files} arquivos parciais removidos.')
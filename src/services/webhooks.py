@@ -0,0 +1,338 @@
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.course import Enrollment, Progress
+from src.models.payment import Payment, WebhookEvent
+from src.services.cart_store import remove_purchased
+
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+PAGSEGURO_WEBHOOK_TOKEN = os.getenv('PAGSEGURO_WEBHOOK_TOKEN')
+# Tolerância (segundos) para o timestamp da assinatura do Stripe
+STRIPE_SIGNATURE_TOLERANCE = 300
+
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 500))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 8))
+
+STRIPE_EVENT_STATUS = {
+    'checkout.session.completed': 'completed',
+    'checkout.session.async_payment_succeeded': 'completed',
+    'checkout.session.async_payment_failed': 'failed',
+    'checkout.session.expired': 'failed',
+    'charge.refunded': 'refunded'
+}
+
+# CANCELED é um estorno quando a cobrança já tinha sido paga e uma falha
+# quando ainda estava pendente; a decisão fica para next_status
+PAGSEGURO_CHARGE_STATUS = {
+    'PAID': 'completed',
+    'DECLINED': 'failed',
+    'CANCELED': 'canceled'
+}
+
+# Status de origem a partir dos quais cada transição é permitida; eventos
+# fora de ordem não fazem um pagamento concluído voltar a falhar
+ALLOWED_TRANSITIONS = {
+    'completed': ('pending', 'failed'),
+    'failed': ('pending',),
+    'refunded': ('completed',)
+}
+# Status de destino de um cancelamento conforme o status atual
+CANCEL_TRANSITIONS = {
+    'completed': 'refunded',
+    'pending': 'failed'
+}
+
+
+class InvalidWebhook(Exception):
+    pass
+
+
+def verify_stripe_signature(payload, header, secret=STRIPE_WEBHOOK_SECRET,
+                            tolerance=STRIPE_SIGNATURE_TOLERANCE):
+    if not secret or not header:
+        raise InvalidWebhook('Assinatura ausente')
+
+    parts = dict(item.split('=', 1) for item in header.split(',') if '=' in item)
+    signatures = [item.split('=', 1)[1] for item in header.split(',') if item.startswith('v1=')]
+    try:
+        timestamp = int(parts.get('t', ''))
+    except ValueError:
+        raise InvalidWebhook('Timestamp inválido')
+
+    if abs(time.time() - timestamp) > tolerance:
+        raise InvalidWebhook('Timestamp fora da tolerância')
+
+    expected = sign_stripe_payload(payload, timestamp, secret)
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise InvalidWebhook('Assinatura inválida')
+
+
+def sign_stripe_payload(payload, timestamp, secret=STRIPE_WEBHOOK_SECRET):
+    signed = f'{timestamp}.'.encode() + payload
+    return hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+
+
+def verify_pagseguro_signature(payload, header, token=PAGSEGURO_WEBHOOK_TOKEN):
+    if not token or not header:
+        raise InvalidWebhook('Assinatura ausente')
+
+    if not hmac.compare_digest(sign_pagseguro_payload(payload, token), header):
+        raise InvalidWebhook('Assinatura inválida')
+
+
+def sign_pagseguro_payload(payload, token=PAGSEGURO_WEBHOOK_TOKEN):
+    return hashlib.sha256(f'{token}-'.encode() + payload).hexdigest()
+
+
+def parse_stripe_event(payload):
+    # Retorna (event_id, payment_ref, payment_status) ou None se o evento
+    # não altera pagamentos
+    try:
+        event = json.loads(payload)
+        status = STRIPE_EVENT_STATUS.get(event['type'])
+        if status is None:
+            return None
+        obj = event['data']['object']
+        # Sessões trazem client_reference_id; cobranças (charge.refunded) trazem
+        # a referência nos metadados copiados da sessão (payment_intent_data)
+        reference = obj.get('client_reference_id') or (obj.get('metadata') or {}).get('reference')
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise InvalidWebhook('Evento malformado')
+
+    if not reference:
+        current_app.logger.warning('Evento %s do Stripe sem referência de pagamento; ignorado', event.get('id'))
+        return None
+    return event['id'], reference, status
+
+
+def parse_pagseguro_event(payload):
+    try:
+        order = json.loads(payload)
+        charge = (order.get('charges') or [{}])[0]
+        status = PAGSEGURO_CHARGE_STATUS.get(charge.get('status'))
+        if status is None:
+            return None
+        # O PagSeguro não envia um ID de evento; a cobrança + status identifica a notificação
+        event_id = f"{charge.get('id') or order['id']}:{charge['status']}"
+        return event_id, order['reference_id'], status
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise InvalidWebhook('Evento malformado')
+
+
+def enqueue_event(gateway, payload, parsed):
+    # Grava o evento de forma durável; eventos repetidos são descartados
+    # pela restrição única (gateway, event_id). Retorna False para duplicados.
+    event_id, payment_ref, payment_status = parsed
+    db.session.add(WebhookEvent(
+        gateway=gateway,
+        event_id=event_id,
+        payment_ref=payment_ref,
+        payment_status=payment_status,
+        payload=payload.decode('utf-8')
+    ))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def next_status(current, event_status):
+    # Status do pagamento depois de um evento; transições não permitidas
+    # (eventos fora de ordem) mantêm o status atual
+    if event_status == 'canceled':
+        return CANCEL_TRANSITIONS.get(current, current)
+    if current in ALLOWED_TRANSITIONS[event_status]:
+        return event_status
+    return current
+
+
+def apply_events(events):
+    # Aplica um lote de eventos: no máximo um UPDATE por transição
+    # (status de origem, status final), uma consulta das matrículas existentes
+    # e um INSERT das novas. Retorna os pares (user_id, course_id) pagos no lote.
+    now = datetime.utcnow()
+
+    # Eventos de cada pagamento na ordem em que chegaram
+    events_by_ref = {}
+    for event in sorted(events, key=lambda e: e.id):
+        events_by_ref.setdefault(event.payment_ref, []).append(event.payment_status)
+
+    current = set(db.session.query(Payment.payment_id, Payment.status).filter(
+        Payment.payment_id.in_(list(events_by_ref))
+    ).with_for_update().all())
+
+    # Cada status atual passa por todos os eventos do lote, um após o outro:
+    # "completed" seguido de "refunded" termina estornado, e não ignorado
+    refs_by_transition = {}
+    for ref, status in current:
+        final = status
+        for event_status in events_by_ref[ref]:
+            final = next_status(final, event_status)
+        if final != status:
+            refs_by_transition.setdefault((status, final), []).append(ref)
+
+    for (from_status, status), refs in refs_by_transition.items():
+        _update_payments(refs, (from_status,), status, now)
+
+    refunded_refs = [ref for (_, status), refs in refs_by_transition.items() if status == 'refunded' for ref in refs]
+    if refunded_refs:
+        _revoke_enrollments(refunded_refs)
+
+    completed_refs = [ref for (_, status), refs in refs_by_transition.items() if status == 'completed' for ref in refs]
+    if not completed_refs:
+        return set()
+
+    purchases = set(db.session.query(Payment.user_id, Payment.course_id).filter(
+        Payment.payment_id.in_(completed_refs),
+        Payment.status == 'completed'
+    ).all())
+    if not purchases:
+        return purchases
+
+    existing = set(db.session.query(Enrollment.user_id, Enrollment.course_id).filter(
+        db.tuple_(Enrollment.user_id, Enrollment.course_id).in_(list(purchases))
+    ).all())
+
+    new_enrollments = [
+        {'user_id': user_id, 'course_id': course_id, 'date': now, 'completed': False}
+        for user_id, course_id in purchases - existing
+    ]
+    if new_enrollments:
+        db.session.execute(db.insert(Enrollment), new_enrollments)
+    return purchases
+
+
+def _update_payments(refs, from_statuses, status, now):
+    Payment.query.filter(
+        Payment.payment_id.in_(refs),
+        Payment.status.in_(from_statuses)
+    ).update({'status': status, 'updated_at': now}, synchronize_session=False)
+
+
+def _revoke_enrollments(refs):
+    # Remove as matrículas (e o progresso) dos cursos estornados, exceto
+    # quando o aluno tem outro pagamento concluído do mesmo curso
+    refunded = set(db.session.query(Payment.user_id, Payment.course_id).filter(
+        Payment.payment_id.in_(refs),
+        Payment.status == 'refunded'
+    ).all())
+    if not refunded:
+        return
+
+    still_paid = set(db.session.query(Payment.user_id, Payment.course_id).filter(
+        db.tuple_(Payment.user_id, Payment.course_id).in_(list(refunded)),
+        Payment.status == 'completed'
+    ).all())
+    revoked = list(refunded - still_paid)
+    if not revoked:
+        return
+
+    enrollment_ids = [enrollment_id for (enrollment_id,) in db.session.query(Enrollment.id).filter(
+        db.tuple_(Enrollment.user_id, Enrollment.course_id).in_(revoked)
+    ).all()]
+    if enrollment_ids:
+        Progress.query.filter(Progress.enrollment_id.in_(enrollment_ids)).delete(synchronize_session=False)
+        Enrollment.query.filter(Enrollment.id.in_(enrollment_ids)).delete(synchronize_session=False)
+
+
+def _clear_carts(purchases):
+    try:
+        remove_purchased(purchases)
+    except Exception:
+        current_app.logger.exception('Falha ao remover cursos pagos dos carrinhos')
+
+
+def _claim_batch(batch_size):
+    return WebhookEvent.query.filter(
+        WebhookEvent.status == 'pending',
+        WebhookEvent.next_attempt_at <= datetime.utcnow()
+    ).order_by(
+        WebhookEvent.id
+    ).limit(batch_size).with_for_update(skip_locked=True).all()
+
+
+def _mark_processed(events):
+    now = datetime.utcnow()
+    WebhookEvent.query.filter(
+        WebhookEvent.id.in_([event.id for event in events])
+    ).update({'status': 'processed', 'processed_at': now}, synchronize_session=False)
+
+
+def _schedule_retry(event_id, error):
+    event = WebhookEvent.query.get(event_id)
+    event.attempts += 1
+    event.last_error = str(error)
+    if event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+        event.status = 'failed'
+    else:
+        # Backoff exponencial: 10s, 20s, 40s... limitado a 1 hora
+        delay = min(10 * 2 ** (event.attempts - 1), 3600)
+        event.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+
+
+def process_batch(batch_size=WEBHOOK_BATCH_SIZE):
+    # Processa um lote de eventos pendentes. SKIP LOCKED permite rodar vários
+    # workers em paralelo sem que disputem os mesmos eventos.
+    events = _claim_batch(batch_size)
+    if not events:
+        db.session.rollback()
+        return 0
+
+    event_ids = [event.id for event in events]
+    try:
+        purchases = apply_events(events)
+        _mark_processed(events)
+        db.session.commit()
+        _clear_carts(purchases)
+        return len(events)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Falha ao aplicar lote de webhooks; processando individualmente')
+
+    # Reprocessa um a um para isolar o evento problemático do restante do lote
+    for event_id in event_ids:
+        event = WebhookEvent.query.filter_by(id=event_id, status='pending').with_for_update(skip_locked=True).first()
+        if not event:
+            db.session.rollback()
+            continue
+        try:
+            purchases = apply_events([event])
+            _mark_processed([event])
+            db.session.commit()
+            _clear_carts(purchases)
+        except Exception as exc:
+            db.session.rollback()
+            _schedule_retry(event_id, exc)
+    return len(event_ids)
+
+
+def run_worker(batch_size=WEBHOOK_BATCH_SIZE, poll_interval=1.0, once=False):
+    while True:
+        processed = process_batch(batch_size)
+        if once and not processed:
+            return
+        if not processed:
+            time.sleep(poll_interval)
+
+
+webhooks_cli = AppGroup('webhooks', help='Processamento de webhooks de pagamento.')
+
+
+@webhooks_cli.command('worker')
+@click.option('--batch-size', default=WEBHOOK_BATCH_SIZE, show_default=True)
+@click.option('--poll-interval', default=1.0, show_default=True)
+@click.option('--once', is_flag=True, help='Sai quando a fila estiver vazia.')
+def worker_command(batch_size, poll_interval, once):
+    """Aplica os eventos de webhook enfileirados."""
+    run_worker(batch_size, poll_interval, once)
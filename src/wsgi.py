@@ -1,5 +1,6 @@
-import os
-from src.main import app
+from src.main import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run()
@@ -0,0 +1,46 @@
+import os
+import sys
+
+# Configuração lida na importação dos serviços: precisa vir antes de importar src
+os.environ.setdefault('CART_STORE', 'memory')
+os.environ.setdefault('PAYMENT_GATEWAY_MODE', 'simulated')
+os.environ.setdefault('SQL_METRICS_HEADERS', 'true')
+os.environ.setdefault('STRIPE_WEBHOOK_SECRET', 'whsec_test')
+os.environ.setdefault('PAGSEGURO_WEBHOOK_TOKEN', 'pagseguro-test')
+os.environ.pop('DATABASE_REPLICA_URL', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from src.main import create_app
+from src.models.user import db
+from src.services.cart_store import cart_store
+from src.services.coupon_cache import coupon_cache
+from src.services.quiz_analytics import quiz_analytics
+from src.services.quiz_engine import quiz_keys
+from tests.factories import SECRET_KEY
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    # Caches por processo indexados por IDs que se repetem entre os bancos dos testes
+    cart_store._carts.clear()
+    coupon_cache.invalidate()
+    quiz_keys._entries.clear()
+    quiz_analytics._entries.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
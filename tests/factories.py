@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+import jwt
+from src.models.user import db, User
+from src.models.course import Category, Course, Module, Lesson, Enrollment
+
+SECRET_KEY = 'test-secret'
+
+
+def auth_headers(user):
+    token = jwt.encode({'user_id': user.id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                       SECRET_KEY, algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def make_user(username='aluno', role='student'):
+    user = User(username=username, email=f'{username}@example.com', role=role)
+    user.set_password('senha')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_course(instructor, title='Curso', price=100.0, modules=2, lessons=3):
+    category = Category.query.first() or Category(name='IA')
+    course = Course(title=title, description='Descrição', price=price, level='iniciante',
+                    duration=60, category=category, instructor_id=instructor.id)
+    db.session.add(course)
+    db.session.flush()
+    for module_order in range(modules):
+        module = Module(title=f'Módulo {module_order}', order=module_order, course_id=course.id)
+        db.session.add(module)
+        db.session.flush()
+        for lesson_order in range(lessons):
+            db.session.add(Lesson(title=f'Aula {lesson_order}', order=lesson_order, module_id=module.id))
+    db.session.commit()
+    return course
+
+
+def enroll(user, course):
+    enrollment = Enrollment(user_id=user.id, course_id=course.id)
+    db.session.add(enrollment)
+    db.session.commit()
+    return enrollment
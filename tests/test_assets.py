@@ -0,0 +1,75 @@
+import gzip
+import os
+from src.services.assets import AssetManifest, compress_static
+
+INDEX = '''<!DOCTYPE html>
+<html>
+<head>
+    <link rel="stylesheet" href="/static/css/app.css?v=2">
+    <script src='/app.js' defer></script>
+    <link rel=icon href=/favicon.ico>
+</head>
+<body>
+    <a href="https://cdn.example.com/app.js">CDN</a>
+    <p>Arquivo principal: "/app.js"</p>
+    <script>const entry = "/app.js";</script>
+</body>
+</html>
+'''
+
+
+def build(tmp_path):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'app.css').write_text('body { color: black; }')
+    (tmp_path / 'app.js').write_text('console.log(1);')
+    (tmp_path / 'favicon.ico').write_bytes(b'\x00\x00\x01\x00')
+    (tmp_path / 'index.html').write_text(INDEX)
+    manifest = AssetManifest(str(tmp_path)).build()
+    return manifest, manifest.assets['index.html'].variants['identity'].decode()
+
+
+def test_index_rewrites_only_src_and_href_values(tmp_path):
+    manifest, html = build(tmp_path)
+    css = manifest.assets['css/app.css'].fingerprinted
+    js = manifest.assets['app.js'].fingerprinted
+    icon = manifest.assets['favicon.ico'].fingerprinted
+
+    assert f'href="/{css}?v=2"' in html
+    assert f"src='/{js}'" in html
+    assert f'href=/{icon}>' in html
+    # Texto, scripts inline e URLs externas ficam como estão
+    assert 'href="https://cdn.example.com/app.js"' in html
+    assert '<p>Arquivo principal: "/app.js"</p>' in html
+    assert 'const entry = "/app.js";' in html
+
+
+def test_fingerprinted_names_resolve(tmp_path):
+    manifest, _ = build(tmp_path)
+    js = manifest.assets['app.js'].fingerprinted
+    asset, fingerprinted = manifest.resolve(js)
+    assert asset.path == 'app.js' and fingerprinted
+    assert manifest.resolve('app.js') == (asset, False)
+
+
+def test_compression_comes_from_the_build_step(tmp_path):
+    css = ('.item { color: black; }\n' * 200).encode()
+    (tmp_path / 'app.css').write_bytes(css)
+
+    # Sem o build, a inicialização não comprime nada
+    assert set(AssetManifest(str(tmp_path)).build().assets['app.css'].variants) == {'identity'}
+
+    assert compress_static(str(tmp_path)) == 1
+    variants = AssetManifest(str(tmp_path)).build().assets['app.css'].variants
+    assert 'gzip' in variants and gzip.decompress(variants['gzip']) == css
+
+
+def test_outdated_variants_are_ignored(tmp_path):
+    (tmp_path / 'app.css').write_bytes(b'.old { color: red; }\n' * 200)
+    compress_static(str(tmp_path))
+    (tmp_path / 'app.css').write_bytes(b'.new { color: blue; }\n' * 200)
+    stale = os.path.getmtime(tmp_path / 'app.css') - 60
+    for suffix in ('.gz', '.br'):
+        if (tmp_path / f'app.css{suffix}').exists():
+            os.utime(tmp_path / f'app.css{suffix}', (stale, stale))
+
+    assert set(AssetManifest(str(tmp_path)).build().assets['app.css'].variants) == {'identity'}
@@ -0,0 +1,59 @@
+from src.models.payment import Payment
+from src.services.webhooks import process_batch, enqueue_event
+from tests.factories import auth_headers, make_course, make_user
+
+
+def test_remove_uses_item_id_not_course_id(client):
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    first = make_course(instructor, 'A')
+    second = make_course(instructor, 'B')
+    headers = auth_headers(student)
+
+    for course in (first, second):
+        assert client.post('/api/payments/cart/add', json={'course_id': course.id}, headers=headers).status_code == 201
+
+    items = client.get('/api/payments/cart', headers=headers).get_json()['items']
+    assert [item['course_id'] for item in items] == [first.id, second.id]
+    assert 'next_item_id' not in client.get('/api/payments/cart', headers=headers).get_json()
+
+    # O ID do item não é o ID do curso
+    second_item = items[1]
+    response = client.delete(f"/api/payments/cart/remove/{second_item['id']}", headers=headers)
+    assert response.status_code == 200
+    remaining = client.get('/api/payments/cart', headers=headers).get_json()['items']
+    assert [item['course_id'] for item in remaining] == [first.id]
+
+    response = client.delete(f'/api/payments/cart/courses/{first.id}', headers=headers)
+    assert response.status_code == 200
+    assert client.get('/api/payments/cart', headers=headers).get_json()['items'] == []
+
+
+def test_checkout_empties_cart(client):
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    course = make_course(instructor)
+    headers = auth_headers(student)
+
+    client.post('/api/payments/cart/add', json={'course_id': course.id}, headers=headers)
+    response = client.post('/api/payments/checkout/stripe', headers=headers)
+    assert response.status_code == 200
+    assert Payment.query.filter_by(user_id=student.id, status='pending').count() == 1
+    assert client.get('/api/payments/cart', headers=headers).get_json()['items'] == []
+
+
+def test_webhook_enrollment_removes_course_from_cart(client):
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    course = make_course(instructor)
+    headers = auth_headers(student)
+
+    client.post('/api/payments/cart/add', json={'course_id': course.id}, headers=headers)
+    client.post('/api/payments/checkout/stripe', headers=headers)
+    reference = Payment.query.filter_by(user_id=student.id).one().payment_id
+    # O aluno adiciona o curso de novo enquanto o pagamento está pendente
+    client.post('/api/payments/cart/add', json={'course_id': course.id}, headers=headers)
+
+    enqueue_event('stripe', b'{}', ('evt_1', reference, 'completed'))
+    assert process_batch() == 1
+    assert client.get('/api/payments/cart', headers=headers).get_json()['items'] == []
@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+import pytest
+from src.models.course import Enrollment
+from src.models.payment import Certificate, CertificateJob
+from src.models.user import db
+from src.services import certificates, storage
+from tests.factories import auth_headers, enroll, make_course, make_user
+
+
+@pytest.fixture
+def certificates_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'CERTIFICATES_DIR', str(tmp_path))
+    certificates._init_worker(None)
+    return tmp_path
+
+
+def completed_enrollments(course, count):
+    students = []
+    for index in range(count):
+        student = make_user(f'aluno{index}')
+        enroll(student, course)
+        students.append(student)
+    Enrollment.query.update({'completed': True})
+    db.session.commit()
+    return students
+
+
+def test_stale_running_jobs_are_requeued(app):
+    instructor = make_user('instrutor', 'instructor')
+    course = make_course(instructor)
+    stale = CertificateJob(course_id=course.id, requested_by=instructor.id, status='running',
+                           started_at=datetime.utcnow() - timedelta(hours=1))
+    fresh = CertificateJob(course_id=course.id, requested_by=instructor.id, status='running',
+                           started_at=datetime.utcnow())
+    db.session.add_all([stale, fresh])
+    db.session.commit()
+
+    assert certificates.requeue_stale_jobs(lease=60) == 1
+    assert db.session.get(CertificateJob, stale.id).status == 'pending'
+    assert db.session.get(CertificateJob, fresh.id).status == 'running'
+
+
+def test_requeued_job_skips_certificates_already_issued(app, certificates_dir):
+    instructor = make_user('instrutor', 'instructor')
+    course = make_course(instructor)
+    students = completed_enrollments(course, 3)
+    # Emitido antes de o worker anterior cair
+    db.session.add(Certificate(user_id=students[0].id, course_id=course.id, certificate_url='/x.pdf'))
+    job = CertificateJob(course_id=course.id, requested_by=instructor.id)
+    db.session.add(job)
+    db.session.commit()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        certificates.process_job(job, executor)
+
+    assert job.status == 'completed'
+    assert (job.total, job.completed) == (2, 2)
+    assert Certificate.query.filter_by(course_id=course.id).count() == 3
+    assert len(list(certificates_dir.glob('*.pdf'))) == 2
+
+
+def test_duplicate_certificates_are_ignored(app):
+    instructor = make_user('instrutor', 'instructor')
+    course = make_course(instructor)
+    student = completed_enrollments(course, 1)[0]
+    job = CertificateJob(course_id=course.id, requested_by=instructor.id, completed=0)
+    db.session.add(job)
+    db.session.commit()
+
+    for url in ('/a.pdf', '/b.pdf'):
+        certificates._save_certificates(job, [(student.id, course.id, url)])
+
+    assert [certificate.certificate_url for certificate in Certificate.query.all()] == ['/a.pdf']
+    # Só a inserção real conta como emitida
+    assert job.completed == 1
+
+
+def test_certificate_is_downloaded_only_by_its_owner(client, certificates_dir):
+    instructor = make_user('instrutor', 'instructor')
+    course = make_course(instructor)
+    student, other = completed_enrollments(course, 2)
+    job = CertificateJob(course_id=course.id, user_id=student.id, requested_by=student.id)
+    db.session.add(job)
+    db.session.commit()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        certificates.process_job(job, executor)
+
+    url = Certificate.query.filter_by(user_id=student.id).one().certificate_url
+    assert url.startswith('/api/content/certificates/files/')
+    filename = url.rsplit('/', 1)[1]
+    assert client.get(f'/static/certificates/{filename}').status_code == 404
+
+    response = client.get(url, headers=auth_headers(student))
+    assert response.status_code == 200
+    assert response.data.startswith(b'%PDF')
+    assert response.data == (certificates_dir / filename).read_bytes()
+    assert 'private' in response.headers['Cache-Control']
+
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=auth_headers(other)).status_code == 404
+
+
+class BrokenExecutor(ThreadPoolExecutor):
+
+    def map(self, *args, **kwargs):
+        raise BrokenProcessPool('processo do pool encerrado')
+
+
+def test_worker_replaces_a_broken_pool(app, certificates_dir, monkeypatch):
+    instructor = make_user('instrutor', 'instructor')
+    course = make_course(instructor)
+    completed_enrollments(course, 2)
+    first = CertificateJob(course_id=course.id, requested_by=instructor.id)
+    second = CertificateJob(course_id=course.id, requested_by=instructor.id)
+    db.session.add_all([first, second])
+    db.session.commit()
+
+    executors = [BrokenExecutor(max_workers=1), ThreadPoolExecutor(max_workers=1)]
+    monkeypatch.setattr(certificates, '_create_executor', lambda processes: executors.pop(0))
+    certificates.run_worker(processes=1, once=True)
+
+    assert db.session.get(CertificateJob, first.id).status == 'failed'
+    assert db.session.get(CertificateJob, second.id).status == 'completed'
+    assert Certificate.query.filter_by(course_id=course.id).count() == 2
@@ -0,0 +1,103 @@
+import gzip
+import io
+import pytest
+from flask import Response, jsonify, send_file
+from src.services import compression
+from src.services.compression import CompressedBodyCache
+
+requires_brotli = pytest.mark.skipif(compression.brotli is None, reason='brotli não instalado')
+
+ITEMS = [{'id': index, 'title': f'Curso de IA {index}'} for index in range(200)]
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setattr(compression, 'compressed_bodies', CompressedBodyCache())
+
+    app.add_url_rule('/test/items', 'test_items', lambda: jsonify(ITEMS))
+    app.add_url_rule('/test/small', 'test_small', lambda: jsonify({'ok': True}))
+    app.add_url_rule('/test/stream', 'test_stream',
+                     lambda: Response((line for line in ['x' * 2048] * 4), mimetype='text/plain'))
+    app.add_url_rule('/test/file', 'test_file',
+                     lambda: send_file(io.BytesIO(b'x' * 8192), mimetype='text/plain'))
+    return app.test_client()
+
+
+def assert_length_matches(response):
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+
+@requires_brotli
+def test_brotli_is_preferred_when_accepted(client):
+    plain = client.get('/test/items').data
+    response = client.get('/test/items', headers={'Accept-Encoding': 'gzip, deflate, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert_length_matches(response)
+    assert compression.brotli.decompress(response.data) == plain
+
+
+def test_gzip_when_brotli_is_not_accepted(client):
+    plain = client.get('/test/items').data
+    response = client.get('/test/items', headers={'Accept-Encoding': 'br;q=0, gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert_length_matches(response)
+    assert gzip.decompress(response.data) == plain
+    assert len(response.data) < len(plain)
+
+
+def test_identity_still_varies_on_accept_encoding(client):
+    response = client.get('/test/items', headers={'Accept-Encoding': 'identity'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert_length_matches(response)
+    assert response.get_json() == ITEMS
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get('/test/small', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Vary' not in response.headers
+    assert response.get_json() == {'ok': True}
+
+
+@pytest.mark.parametrize('path', ['/test/stream', '/test/file'])
+def test_streamed_and_passthrough_responses_are_skipped(client, path):
+    response = client.get(path, headers={'Accept-Encoding': 'gzip, br'})
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'x' * 8192
+
+
+def test_cache_hit_returns_identical_bytes(client, monkeypatch):
+    calls = []
+    compress = compression._compress
+    monkeypatch.setattr(compression, '_compress', lambda data, encoding: calls.append(encoding) or compress(data, encoding))
+    headers = {'Accept-Encoding': 'gzip'}
+
+    first = client.get('/test/items', headers=headers)
+    second = client.get('/test/items', headers=headers)
+
+    assert calls == ['gzip']
+    assert second.data == first.data
+    assert second.headers['Content-Length'] == first.headers['Content-Length']
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    cache = CompressedBodyCache(max_bytes=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    assert cache.get('a') == b'1234'
+
+    cache.put('c', b'1234')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'1234'
+    assert cache.size == 8
+
+    cache.put('grande', b'x' * 11)
+    assert cache.get('grande') is None
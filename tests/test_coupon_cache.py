@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+import pytest
+from src.models.payment import Coupon
+from src.models.user import db
+from src.services import coupon_cache as coupon_cache_module
+from src.services.coupon_cache import CouponCache, get_coupon
+from src.services.sql_metrics import count_queries
+
+
+@pytest.fixture
+def cache(app, monkeypatch):
+    cache = CouponCache(ttl=300, negative_ttl=30)
+    monkeypatch.setattr(coupon_cache_module, 'coupon_cache', cache)
+    return cache
+
+
+def make_coupon(code='IA10', discount_percent=10):
+    now = datetime.utcnow()
+    coupon = Coupon(code=code, discount_percent=discount_percent, current_uses=0,
+                    valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=1))
+    db.session.add(coupon)
+    db.session.commit()
+    return coupon
+
+
+def test_hit_is_answered_without_querying(cache):
+    make_coupon()
+    assert get_coupon('IA10').discount_percent == 10
+
+    with count_queries() as queries:
+        coupon = get_coupon('IA10')
+    assert queries == []
+    assert coupon.is_valid()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_unknown_code_is_cached_until_negative_ttl(cache):
+    make_coupon()
+    assert get_coupon('NOVO20') is None
+
+    # Fora do ORM (outro worker, SQL manual): nenhum listener invalida este processo
+    now = datetime.utcnow()
+    db.session.execute(db.text(
+        'INSERT INTO coupon (code, discount_percent, valid_from, valid_until, current_uses) '
+        'VALUES (:code, 20, :valid_from, :valid_until, 0)'
+    ), {'code': 'NOVO20', 'valid_from': now - timedelta(days=1), 'valid_until': now + timedelta(days=1)})
+    db.session.commit()
+
+    with count_queries() as queries:
+        assert get_coupon('NOVO20') is None
+    assert queries == []
+
+    cache._loaded_at -= cache.negative_ttl
+    with count_queries() as queries:
+        assert get_coupon('NOVO20').discount_percent == 20
+    assert len(queries) == 1
+    # Cupons conhecidos continuam no cache até o TTL normal
+    assert get_coupon('IA10').discount_percent == 10
+
+
+def test_update_through_the_orm_invalidates(cache):
+    coupon = make_coupon()
+    assert get_coupon('IA10').discount_percent == 10
+
+    coupon.discount_percent = 50
+    db.session.commit()
+    assert get_coupon('IA10').discount_percent == 50
+
+
+def test_delete_through_the_orm_invalidates(cache):
+    coupon = make_coupon()
+    assert get_coupon('IA10') is not None
+
+    db.session.delete(coupon)
+    db.session.commit()
+    assert get_coupon('IA10') is None
+
+
+def test_cached_coupon_is_detached_from_the_session(cache):
+    make_coupon()
+    coupon = get_coupon('IA10')
+    db.session.remove()
+
+    assert coupon.to_dict()['code'] == 'IA10'
+    assert coupon not in db.session
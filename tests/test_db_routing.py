@@ -0,0 +1,98 @@
+import sqlite3
+import pytest
+from src.main import create_app
+from src.models.user import db
+from src.services import db_routing
+from src.services.db_routing import REPLICA_BIND, STICKY_COOKIE, STICKY_HEADER, StickyWriters
+from tests.factories import SECRET_KEY, auth_headers, enroll, make_course, make_user
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    # Réplica em outro arquivo SQLite, copiada do primário antes das escritas
+    # do teste: o que for escrito depois só aparece no primário (réplica atrasada)
+    monkeypatch.setenv('DATABASE_REPLICA_URL', f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setattr(db_routing, 'sticky_writers', StickyWriters(str(tmp_path / 'sticky.sqlite3')))
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}"
+    })
+    with app.app_context():
+        db.create_all()
+        student = make_user()
+        course = make_course(make_user('instrutor', 'instructor'))
+        enroll(student, course)
+        headers, course_id = auth_headers(student), course.id
+        assert REPLICA_BIND in db.engines
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+    primary = sqlite3.connect(tmp_path / 'primary.db')
+    replica = sqlite3.connect(tmp_path / 'replica.db')
+    primary.backup(replica)
+    primary.close()
+    replica.close()
+
+    # Sem contexto de aplicação ativo: cada requisição tem o seu próprio g
+    yield app, headers, course_id
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registra um MetaData por bind no db compartilhado pelos testes
+    db.metadatas.pop(REPLICA_BIND, None)
+
+
+def write_review(client, course_id, headers):
+    response = client.post(f'/api/courses/courses/{course_id}/reviews', json={'rating': 5}, headers=headers)
+    assert response.status_code == 201
+    return response
+
+
+def read_reviews(client, course_id, headers=None):
+    response = client.get(f'/api/courses/courses/{course_id}/reviews', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_reads_go_to_the_replica_without_recent_writes(replica_app):
+    app, headers, course_id = replica_app
+    write_review(app.test_client(), course_id, headers)
+
+    # Outro cliente, sem cookie nem token: lê a réplica, ainda sem a avaliação
+    assert read_reviews(app.test_client(), course_id) == []
+
+
+def test_writer_reads_the_primary_with_the_cookie(replica_app):
+    app, headers, course_id = replica_app
+    client = app.test_client()
+    write_review(client, course_id, headers)
+
+    assert client.get_cookie(STICKY_COOKIE) is not None
+    # Sem o token: só o cookie garante a leitura no primário
+    assert len(read_reviews(client, course_id)) == 1
+
+
+def test_token_client_reads_the_primary_without_the_cookie(replica_app):
+    app, headers, course_id = replica_app
+    write_review(app.test_client(), course_id, headers)
+
+    # Cliente novo (como outro worker atendendo a leitura): nada em memória
+    # nem cookie, só o mesmo token, encontrado no store compartilhado
+    db_routing.sticky_writers = StickyWriters(db_routing.sticky_writers.path)
+    assert len(read_reviews(app.test_client(), course_id, headers)) == 1
+
+
+def test_echoed_header_routes_reads_to_the_primary(replica_app, tmp_path):
+    app, headers, course_id = replica_app
+    token = write_review(app.test_client(), course_id, headers).headers[STICKY_HEADER]
+
+    # Outro host, sem o store compartilhado: o cabeçalho devolvido basta
+    db_routing.sticky_writers = StickyWriters(str(tmp_path / 'other-host.sqlite3'))
+    assert read_reviews(app.test_client(), course_id, headers) == []
+    assert len(read_reviews(app.test_client(), course_id, {STICKY_HEADER: token})) == 1
+
+    until = token.split('.')[0]
+    forged = {STICKY_HEADER: f'{until}.assinatura-falsa'}
+    assert read_reviews(app.test_client(), course_id, forged) == []
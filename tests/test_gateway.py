@@ -0,0 +1,119 @@
+import pytest
+import requests
+from src.models.payment import Payment
+from src.models.user import db
+from src.routes import payment as payment_routes
+from src.services.gateway import CircuitBreaker, GatewayClient, GatewayError, GatewayUnavailable
+from tests.factories import auth_headers, make_course, make_user
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.text = ''
+        self._body = body or {}
+
+    def json(self):
+        return self._body
+
+
+def client_with(responses, breaker=None):
+    # Cada item é uma resposta ou uma exceção levantada por session.request
+    client = GatewayClient('http://gateway.test', breaker=breaker or CircuitBreaker(failure_threshold=2, reset_timeout=0))
+    pending = list(responses)
+
+    def fake_request(*args, **kwargs):
+        result = pending.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    client.session.request = fake_request
+    return client
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = client_with([FakeResponse(503), requests.ConnectionError('recusada')], breaker)
+
+    for _ in range(2):
+        with pytest.raises(GatewayError):
+            client.request('POST', '/v1')
+    assert breaker.state == 'open'
+    with pytest.raises(GatewayUnavailable):
+        client.request('POST', '/v1')
+
+
+def test_client_errors_do_not_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    client = client_with([FakeResponse(400), FakeResponse(200, {'ok': True})], breaker)
+
+    with pytest.raises(GatewayError):
+        client.request('POST', '/v1')
+    assert breaker.state == 'closed'
+    assert client.request('POST', '/v1') == {'ok': True}
+
+
+def test_unexpected_error_releases_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == 'half_open'
+    client = client_with([RuntimeError('interrompida'), FakeResponse(200, {'ok': True})], breaker)
+
+    with pytest.raises(RuntimeError):
+        client.request('POST', '/v1')
+    assert not breaker._trial_in_flight
+    # A próxima chamada de teste é liberada e fecha o circuito
+    assert client.request('POST', '/v1') == {'ok': True}
+    assert breaker.state == 'closed'
+
+
+class FlakyStripeClient:
+    # Falha com 5xx na primeira chamada, como um gateway instável
+
+    def __init__(self):
+        self.calls = []
+
+    def create_checkout_session(self, reference, amount_cents, currency, success_url, cancel_url,
+                                idempotency_key=None):
+        self.calls.append((reference, idempotency_key))
+        if len(self.calls) == 1:
+            raise GatewayError('Gateway respondeu 502')
+        return {'id': 'cs_test_' + reference, 'url': 'https://checkout.stripe.com/example'}
+
+
+def test_retry_after_gateway_error_reuses_reference_and_key(client, monkeypatch):
+    gateway = FlakyStripeClient()
+    monkeypatch.setattr(payment_routes, 'get_stripe_client', lambda: gateway)
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    course = make_course(instructor)
+    headers = auth_headers(student)
+    client.post('/api/payments/cart/add', json={'course_id': course.id}, headers=headers)
+
+    headers['Idempotency-Key'] = 'checkout-1'
+    assert client.post('/api/payments/checkout/stripe', headers=headers).status_code == 502
+    response = client.post('/api/payments/checkout/stripe', headers=headers)
+    assert response.status_code == 200
+
+    (first_ref, first_key), (second_ref, second_key) = gateway.calls
+    assert first_ref == second_ref
+    assert first_key == second_key
+    # A chave do cliente não é repassada ao gateway como está
+    assert first_key != 'checkout-1'
+    assert Payment.query.filter_by(user_id=student.id).one().payment_id == first_ref
+
+
+def test_reference_changes_when_key_is_reused_after_a_purchase(client):
+    student = make_user()
+    reference = payment_routes._payment_reference('STR', student.id, 'chave')
+    assert payment_routes._payment_reference('STR', student.id, 'chave') == reference
+    assert payment_routes._payment_reference('STR', student.id + 1, 'chave') != reference
+
+    instructor = make_user('instrutor', 'instructor')
+    course = make_course(instructor)
+    db.session.add(Payment(amount=1, status='completed', payment_method='credit_card',
+                           payment_id=reference, user_id=student.id, course_id=course.id))
+    db.session.commit()
+    assert payment_routes._payment_reference('STR', student.id, 'chave') == reference + '-2'
@@ -0,0 +1,86 @@
+import os
+import re
+import uuid
+import pytest
+from sqlalchemy import MetaData, create_engine
+from src.models.user import db
+from src.services.index_check import _hot_queries, check_plan, explain
+
+# Monta as tabelas sem os índices do script, aplica sql/hot_path_indexes.sql e
+# confere com EXPLAIN que as consultas mais usadas passam a usar índice.
+# Requer PostgreSQL: TEST_DATABASE_URL=postgresql://... (o teste cria e remove
+# um schema próprio).
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL', '').replace('postgres://', 'postgresql://', 1)
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'hot_path_indexes.sql')
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason='TEST_DATABASE_URL não configurada')
+
+
+def script_statements(script):
+    # Divide o script em comandos, ignorando comentários e meta-comandos do
+    # psql; blocos $$ ... $$ contêm ';' e ficam inteiros
+    statements, current, quoted = [], [], False
+    for line in script.splitlines():
+        if not current and (not line.strip() or line.startswith(('--', '\\'))):
+            continue
+        current.append(line)
+        quoted ^= line.count('$$') % 2 == 1
+        if not quoted and line.rstrip().endswith(';'):
+            statements.append('\n'.join(current))
+            current = []
+    return statements
+
+
+def tables_without(names):
+    # Cópia dos modelos sem os índices e restrições que o script cria
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        copy.indexes = {index for index in copy.indexes if index.name not in names}
+        copy.constraints = {constraint for constraint in copy.constraints if constraint.name not in names}
+    return metadata
+
+
+@pytest.fixture(scope='module')
+def connection():
+    with open(SCRIPT) as fileobj:
+        statements = script_statements(fileobj.read())
+    names = {match for statement in statements for match in re.findall(r'IF NOT EXISTS (\w+) ON', statement)}
+
+    schema = f'test_indexes_{uuid.uuid4().hex[:8]}'
+    admin = create_engine(TEST_DATABASE_URL, isolation_level='AUTOCOMMIT')
+    with admin.connect() as conn:
+        conn.exec_driver_sql(f'CREATE SCHEMA {schema}')
+
+    engine = create_engine(TEST_DATABASE_URL, isolation_level='AUTOCOMMIT',
+                           connect_args={'options': f'-csearch_path={schema}'})
+    try:
+        with engine.connect() as conn:
+            tables_without(names).create_all(conn)
+            # CREATE INDEX CONCURRENTLY exige autocommit, como no psql; sem
+            # parâmetros, os '%' do format() no bloco DO chegam intactos
+            for statement in statements:
+                conn.execution_options(no_parameters=True).exec_driver_sql(statement)
+            conn.exec_driver_sql('SET enable_seqscan = off')
+            yield conn
+    finally:
+        engine.dispose()
+        with admin.connect() as conn:
+            conn.exec_driver_sql(f'DROP SCHEMA {schema} CASCADE')
+        admin.dispose()
+
+
+def test_script_creates_all_constraints(connection):
+    constraints = {name for (name,) in connection.exec_driver_sql(
+        "SELECT conname FROM pg_constraint WHERE connamespace = current_schema()::regnamespace AND contype = 'u'"
+    )}
+    assert {'uq_enrollment_user_course', 'uq_progress_enrollment_lesson', 'uq_review_course_user',
+            'uq_cart_user', 'uq_cart_item_cart_course', 'uq_certificate_user_course'} <= constraints
+
+
+@pytest.mark.parametrize('name, table, statement, ordered', _hot_queries(), ids=[query[0] for query in _hot_queries()])
+def test_hot_query_uses_index(connection, name, table, statement, ordered):
+    plan = explain(connection, statement)
+    problems, indexes = check_plan(plan, table, ordered)
+    assert not problems, f'{name}: {problems}\n{plan}'
+    assert indexes
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from src.models.payment import IdempotencyKey, Payment
+from src.models.user import db
+from src.services import idempotency
+from tests.factories import auth_headers, make_course, make_user
+
+
+def prepare_cart(client):
+    student = make_user()
+    course = make_course(make_user('instrutor', 'instructor'))
+    headers = auth_headers(student)
+    client.post('/api/payments/cart/add', json={'course_id': course.id}, headers=headers)
+    return student, headers
+
+
+def test_repeated_checkout_is_replayed(client):
+    student, headers = prepare_cart(client)
+    headers['Idempotency-Key'] = 'checkout-1'
+
+    first = client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'pix'}, headers=headers)
+    second = client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'pix'}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert 'Idempotent-Replayed' not in first.headers
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.get_json() == first.get_json()
+    assert Payment.query.filter_by(user_id=student.id).count() == 1
+    assert IdempotencyKey.query.filter_by(user_id=student.id, status='completed').count() == 1
+
+
+def test_key_reused_with_other_body_is_rejected(client):
+    student, headers = prepare_cart(client)
+    headers['Idempotency-Key'] = 'checkout-1'
+
+    assert client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'pix'},
+                       headers=headers).status_code == 200
+    response = client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'boleto'},
+                           headers=headers)
+
+    assert response.status_code == 422
+    assert Payment.query.filter_by(user_id=student.id).count() == 1
+
+
+def abandoned_key(client, student, locked_at):
+    # Chave deixada 'in_progress' por um worker que morreu durante o mesmo checkout
+    with client.application.test_request_context('/api/payments/checkout/pagseguro', method='POST',
+                                                 json={'payment_method': 'pix'}):
+        request_hash = idempotency._request_hash()
+    db.session.add(IdempotencyKey(user_id=student.id, key='checkout-1', request_hash=request_hash,
+                                  locked_at=locked_at))
+    db.session.commit()
+
+
+def test_key_of_a_crashed_request_is_reclaimed_after_the_lease(client, monkeypatch):
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_WAIT', 0.2)
+    student, headers = prepare_cart(client)
+    headers['Idempotency-Key'] = 'checkout-1'
+    abandoned_key(client, student, datetime.utcnow() - timedelta(seconds=idempotency.IDEMPOTENCY_LEASE + 1))
+
+    response = client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'pix'}, headers=headers)
+
+    assert response.status_code == 200
+    assert 'Idempotent-Replayed' not in response.headers
+    assert Payment.query.filter_by(user_id=student.id).count() == 1
+    assert IdempotencyKey.query.filter_by(user_id=student.id, status='completed').count() == 1
+
+    replay = client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'pix'}, headers=headers)
+    assert replay.headers['Idempotent-Replayed'] == 'true'
+
+
+def test_key_within_the_lease_is_still_in_progress(client, monkeypatch):
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_WAIT', 0.2)
+    student, headers = prepare_cart(client)
+    headers['Idempotency-Key'] = 'checkout-1'
+    abandoned_key(client, student, datetime.utcnow())
+
+    response = client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'pix'}, headers=headers)
+
+    assert response.status_code == 409
+    assert Payment.query.filter_by(user_id=student.id).count() == 0
+
+
+def test_waiting_request_takes_over_when_the_lease_expires(client, monkeypatch):
+    # O lease vence durante a espera: a requisição duplicada retoma a chave
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_LEASE', 1)
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_WAIT', 5)
+    student, headers = prepare_cart(client)
+    headers['Idempotency-Key'] = 'checkout-1'
+    abandoned_key(client, student, datetime.utcnow() - timedelta(seconds=0.5))
+
+    response = client.post('/api/payments/checkout/pagseguro', json={'payment_method': 'pix'}, headers=headers)
+
+    assert response.status_code == 200
+    assert Payment.query.filter_by(user_id=student.id).count() == 1
@@ -0,0 +1,72 @@
+import pytest
+from src.models.course import Lesson, Material
+from src.models.user import db
+from src.services import storage
+from src.services.signing import sign_url
+from tests.factories import auth_headers, enroll, make_course, make_user
+
+DIGEST = 'ab' * 32
+
+
+@pytest.fixture
+def stored_material(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'MATERIALS_DIR', str(tmp_path))
+    (tmp_path / 'ab').mkdir()
+    (tmp_path / 'ab' / f'{DIGEST}.pdf').write_bytes(b'%PDF')
+    return f'/static/materials/ab/{DIGEST}.pdf'
+
+
+def test_material_requires_signature(client, stored_material):
+    assert client.get(stored_material).status_code == 403
+    assert client.get(sign_url(stored_material)).status_code == 200
+
+
+def test_static_route_does_not_serve_materials(client, stored_material):
+    for path in (f'/static/./materials/ab/{DIGEST}.pdf', f'/static//materials/ab/{DIGEST}.pdf'):
+        response = client.get(path)
+        assert response.status_code != 200 or response.data != b'%PDF'
+
+
+def test_only_local_materials_are_signed(client, stored_material):
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    course = make_course(instructor, modules=1, lessons=1)
+    enroll(student, course)
+    lesson = Lesson.query.filter_by(module_id=course.modules[0].id).one()
+    lesson.video_url = 'https://www.youtube.com/watch?v=abc'
+    db.session.add(Material(title='Slides', type='document', url=stored_material, lesson_id=lesson.id))
+    db.session.add(Material(title='Artigo', type='other', url='https://example.com/artigo.pdf', lesson_id=lesson.id))
+    db.session.commit()
+
+    data = client.get(f'/api/courses/lessons/{lesson.id}/materials', headers=auth_headers(student)).get_json()
+    assert data['video_url'] == 'https://www.youtube.com/watch?v=abc'
+    urls = {material['title']: material['url'] for material in data['materials']}
+    assert urls['Artigo'] == 'https://example.com/artigo.pdf'
+    assert urls['Slides'].startswith(stored_material + '?expires=')
+    assert client.get(urls['Slides']).status_code == 200
+
+
+def test_curriculum_shows_content_urls_only_to_enrolled_users(client, stored_material):
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    outsider = make_user('visitante')
+    course = make_course(instructor, modules=1, lessons=1)
+    enroll(student, course)
+    lesson = Lesson.query.filter_by(module_id=course.modules[0].id).one()
+    lesson.video_url = stored_material
+    db.session.add(Material(title='Slides', type='document', url=stored_material, lesson_id=lesson.id))
+    db.session.commit()
+
+    urls = [f'/api/courses/courses/{course.id}/modules', f'/api/courses/modules/{lesson.module_id}/lessons']
+    for url in urls:
+        for headers in ({}, auth_headers(outsider)):
+            data = client.get(url, headers=headers).get_json()
+            public = data[0]['lessons'][0] if 'lessons' in data[0] else data[0]
+            assert public['video_url'] is None
+            assert public['materials'][0]['url'] is None
+
+        data = client.get(url, headers=auth_headers(student)).get_json()
+        lesson_data = data[0]['lessons'][0] if 'lessons' in data[0] else data[0]
+        assert lesson_data['video_url'].startswith(stored_material + '?expires=')
+        assert client.get(lesson_data['video_url']).status_code == 200
+        assert client.get(lesson_data['materials'][0]['url']).status_code == 200
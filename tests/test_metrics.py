@@ -0,0 +1,46 @@
+from prometheus_client.parser import text_string_to_metric_families
+from src.services import metrics
+
+HEADERS = {'Authorization': 'Bearer segredo'}
+CATALOG = {'blueprint': 'course', 'endpoint': 'course.get_courses', 'method': 'GET', 'status': '200'}
+
+
+def scrape(client):
+    response = client.get('/metrics', headers=HEADERS)
+    assert response.status_code == 200
+    return [sample for family in text_string_to_metric_families(response.get_data(as_text=True))
+            for sample in family.samples]
+
+
+def value(samples, name, labels=None):
+    return next((sample.value for sample in samples
+                 if sample.name == name and (labels is None or sample.labels == labels)), 0)
+
+
+def test_scrape_exposes_request_latency_and_pool_wait(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 'segredo')
+    before = scrape(client)
+
+    assert client.get('/api/courses/courses').status_code == 200
+    after = scrape(client)
+
+    latency = 'http_request_duration_seconds_count'
+    assert value(after, latency, CATALOG) == value(before, latency, CATALOG) + 1
+    pool_wait = 'db_pool_checkout_wait_seconds_count'
+    assert value(after, pool_wait) > value(before, pool_wait)
+    assert any(sample.name == 'db_pool_connections_in_use' for sample in after)
+
+
+def test_metrics_require_the_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 'segredo')
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer errado'}).status_code == 401
+
+
+def test_metrics_are_closed_by_default(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', None)
+    assert client.get('/metrics').status_code == 401
+
+    monkeypatch.setattr(metrics, 'METRICS_PUBLIC', True)
+    assert client.get('/metrics').status_code == 200
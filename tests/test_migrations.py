@@ -0,0 +1,28 @@
+import os
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+from src.main import create_app
+from src.models.user import db
+from tests.factories import SECRET_KEY
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def test_migrations_match_models(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'migrations.db'}"
+    })
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        with db.engine.connect() as connection:
+            # Nenhuma diferença entre o banco migrado e os modelos
+            assert compare_metadata(MigrationContext.configure(connection), db.metadata) == []
+
+        downgrade(directory=MIGRATIONS_DIR, revision='base')
+        with db.engine.connect() as connection:
+            assert db.inspect(connection).get_table_names() == ['alembic_version']
+        db.session.remove()
+        db.engine.dispose()
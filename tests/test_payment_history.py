@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+from src.models.payment import Payment
+from src.models.user import db
+from tests.factories import auth_headers, make_course, make_user
+
+
+def make_payments(student, course, count):
+    start = datetime(2024, 1, 1)
+    for index in range(count):
+        db.session.add(Payment(amount=10, status='completed', payment_method='pix',
+                               payment_id=f'PAG{index}', user_id=student.id, course_id=course.id,
+                               created_at=start + timedelta(minutes=index)))
+    db.session.commit()
+
+
+def test_cursor_pagination_walks_all_payments(client):
+    student = make_user()
+    course = make_course(make_user('instrutor', 'instructor'))
+    make_payments(student, course, 5)
+    headers = auth_headers(student)
+
+    seen = []
+    url = '/api/payments/payment-history?limit=2'
+    while url:
+        data = client.get(url, headers=headers).get_json()
+        assert len(data['payments']) <= 2
+        seen.extend(payment['payment_id'] for payment in data['payments'])
+        url = data['next_cursor'] and f"/api/payments/payment-history?limit=2&cursor={data['next_cursor']}"
+    assert seen == [f'PAG{index}' for index in reversed(range(5))]
+
+
+def test_limit_is_clamped(client):
+    student = make_user()
+    course = make_course(make_user('instrutor', 'instructor'))
+    make_payments(student, course, 3)
+    headers = auth_headers(student)
+
+    for limit in (0, -5):
+        data = client.get(f'/api/payments/payment-history?limit={limit}', headers=headers).get_json()
+        assert len(data['payments']) == 1
+        assert data['next_cursor'] is not None
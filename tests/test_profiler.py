@@ -0,0 +1,75 @@
+import json
+import os
+import pytest
+from src.main import create_app
+from src.models.user import db
+from src.services import profiler
+from tests.factories import SECRET_KEY, auth_headers, make_user
+
+
+@pytest.fixture
+def profiled_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, 'PROFILER_ENABLED', True)
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': SECRET_KEY,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}"
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+class RecordingSession:
+
+    def __init__(self):
+        self.statements = []
+
+    def sql_start(self, statement):
+        self.statements.append(statement)
+
+    def sql_end(self):
+        pass
+
+
+def test_admin_downloads_the_profile_of_a_request(profiled_app):
+    client = profiled_app.test_client()
+    headers = auth_headers(make_user('admin', 'admin'))
+
+    response = client.get('/api/courses/courses', headers=dict(headers, **{'X-Profile': '1'}))
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+    assert profile_id.endswith('.speedscope.json')
+
+    listing = client.get('/api/admin/profiles', headers=headers).get_json()
+    assert listing['enabled'] is True
+    assert [profile['id'] for profile in listing['profiles']] == [profile_id]
+
+    download = client.get(f'/api/admin/profiles/{profile_id}', headers=headers)
+    assert download.status_code == 200
+    data = json.loads(download.data)
+    assert data['profiles'][0]['name'] == 'GET /api/courses/courses'
+    assert os.path.isfile(os.path.join(profiler.profiles_dir(), profile_id))
+
+
+def test_profile_is_ignored_for_non_admins(profiled_app):
+    client = profiled_app.test_client()
+    student = make_user()
+
+    response = client.get('/api/courses/courses', headers=dict(auth_headers(student), **{'X-Profile': '1'}))
+    assert 'X-Profile-Id' not in response.headers
+    assert client.get('/api/admin/profiles', headers=auth_headers(student)).status_code == 403
+
+
+def test_sql_listeners_are_registered_once(profiled_app, monkeypatch):
+    # Outra app no mesmo processo (ex.: testes, CLI) não duplica os listeners
+    profiler.init_app(profiled_app)
+    session = RecordingSession()
+    monkeypatch.setitem(profiler._sessions, profiler.threading.get_ident(), session)
+
+    db.session.execute(db.text('SELECT 1'))
+    assert session.statements == ['SELECT 1']
@@ -0,0 +1,64 @@
+import pytest
+from src.models.course import Lesson, Material, Progress, Review
+from src.models.user import db
+from src.services.sql_metrics import assert_max_queries
+from tests.factories import auth_headers, enroll, make_course, make_user
+
+# Limites fixos: valem tanto para um curso quanto para vários, então uma
+# consulta por curso, módulo ou aula (N+1) estoura o limite
+
+
+def make_catalog(instructor, student, courses):
+    created = []
+    for index in range(courses):
+        course = make_course(instructor, title=f'Curso {index}')
+        enrollment = enroll(student, course)
+        db.session.add(Review(rating=4 + index % 2, comment='Bom', user_id=student.id, course_id=course.id))
+        for lesson in Lesson.query.join(Lesson.module).filter_by(course_id=course.id).all():
+            db.session.add(Material(title='Slides', type='pdf', url='/static/materials/slides.pdf',
+                                    lesson_id=lesson.id))
+            db.session.add(Progress(enrollment_id=enrollment.id, lesson_id=lesson.id, completed=True))
+        created.append(course)
+    db.session.commit()
+    return created
+
+
+@pytest.mark.parametrize('courses', [1, 5])
+def test_catalog_query_budget(client, courses):
+    make_catalog(make_user('instrutor', 'instructor'), make_user(), courses)
+
+    with assert_max_queries(3):
+        response = client.get('/api/courses/courses?min_rating=4')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data) == courses
+    assert all(course['student_count'] == 1 and course['category'] for course in data)
+
+
+@pytest.mark.parametrize('courses', [1, 5])
+def test_curriculum_query_budget(client, courses):
+    course = make_catalog(make_user('instrutor', 'instructor'), make_user(), courses)[-1]
+
+    with assert_max_queries(4):
+        response = client.get(f'/api/courses/courses/{course.id}/modules')
+    assert response.status_code == 200
+    modules = response.get_json()
+    assert all(len(lesson['materials']) == 1 for module in modules for lesson in module['lessons'])
+
+    with assert_max_queries(4):
+        response = client.get(f"/api/courses/modules/{modules[0]['id']}/lessons")
+    assert response.status_code == 200
+    assert all(len(lesson['materials']) == 1 for lesson in response.get_json())
+
+
+@pytest.mark.parametrize('courses', [1, 5])
+def test_my_courses_query_budget(client, courses):
+    student = make_user()
+    make_catalog(make_user('instrutor', 'instructor'), student, courses)
+
+    with assert_max_queries(7):
+        response = client.get('/api/courses/my-courses', headers=auth_headers(student))
+    assert response.status_code == 200
+    data = response.get_json()
+    assert len(data) == courses
+    assert all(course['progress']['percent'] == 100 for course in data)
@@ -0,0 +1,128 @@
+import threading
+import time
+import pytest
+from sqlalchemy.exc import OperationalError
+from src.models.course import Lesson
+from src.models.quiz import Question, Quiz, QuizAttempt
+from src.models.user import db
+from src.services.metrics import WRITE_FAILURES
+from src.services.quiz_engine import AttemptGroupCommit, attempt_writer, quiz_keys
+from tests.factories import auth_headers, enroll, make_course, make_user
+
+QUESTIONS = [
+    {'text': '2 + 2?', 'options': ['3', '4'], 'correct_option': 1},
+    {'text': 'Capital do Brasil?', 'options': ['Brasília', 'Rio'], 'correct_option': 0}
+]
+
+
+@pytest.fixture
+def lesson(app):
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    course = make_course(instructor, modules=1, lessons=1)
+    enroll(student, course)
+    lesson = Lesson.query.filter_by(module_id=course.modules[0].id).one()
+    return lesson, auth_headers(instructor), auth_headers(student)
+
+
+@pytest.mark.parametrize('payload', [
+    {'questions': 'texto'},
+    {'questions': ['texto']},
+    {'questions': {'text': 'x'}},
+    {'questions': [{'text': ['x'], 'options': ['a', 'b'], 'correct_option': 0}]},
+    {'questions': [{'text': 'x', 'options': ['a', 'b'], 'correct_option': True}]},
+    {'questions': QUESTIONS, 'title': {'x': 1}},
+    ['questions'],
+])
+def test_invalid_quiz_payload_is_rejected(client, lesson, payload):
+    lesson, instructor_headers, _ = lesson
+    response = client.put(f'/api/content/quiz/{lesson.id}', json=payload, headers=instructor_headers)
+    assert response.status_code == 400
+    assert Quiz.query.count() == 0
+
+
+def test_quiz_published_elsewhere_is_visible_immediately(client, lesson):
+    lesson, _, student_headers = lesson
+    assert client.get(f'/api/content/quiz/{lesson.id}', headers=student_headers).status_code == 404
+
+    # Publicado por outro worker: o cache deste processo não é invalidado
+    quiz = Quiz(lesson_id=lesson.id, title='Quiz', version=1, published=True,
+                questions=[Question(text='?', options='["a", "b"]', correct_option=0, order=0)])
+    db.session.add(quiz)
+    db.session.commit()
+
+    assert client.get(f'/api/content/quiz/{lesson.id}', headers=student_headers).status_code == 200
+
+
+def test_attempt_is_stored_before_the_response(client, lesson):
+    lesson, instructor_headers, student_headers = lesson
+    quiz = client.put(f'/api/content/quiz/{lesson.id}', json={'questions': QUESTIONS},
+                      headers=instructor_headers).get_json()['quiz']
+    answers = {str(quiz['questions'][0]['id']): 1, str(quiz['questions'][1]['id']): 1}
+
+    response = client.post(f'/api/content/quiz/{lesson.id}/submit', json={'answers': answers},
+                           headers=student_headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    attempt = db.session.get(QuizAttempt, data['attempt_id'])
+    assert (attempt.correct_count, attempt.score, attempt.passed) == (1, 50.0, False)
+
+
+def test_failed_attempt_write_is_reported(client, lesson, monkeypatch):
+    lesson, instructor_headers, student_headers = lesson
+    quiz = client.put(f'/api/content/quiz/{lesson.id}', json={'questions': QUESTIONS},
+                      headers=instructor_headers).get_json()['quiz']
+    assert quiz_keys.get(lesson.id) is not None
+    failures = WRITE_FAILURES.labels('quiz_attempt')._value.get()
+
+    def fail(rows):
+        raise OperationalError('INSERT', {}, Exception('banco indisponível'))
+
+    monkeypatch.setattr(attempt_writer, '_insert', fail)
+    response = client.post(f'/api/content/quiz/{lesson.id}/submit',
+                           json={'answers': {str(quiz['questions'][0]['id']): 1}}, headers=student_headers)
+    monkeypatch.undo()
+
+    assert response.status_code == 503
+    assert WRITE_FAILURES.labels('quiz_attempt')._value.get() == failures + 1
+    assert QuizAttempt.query.count() == 0
+
+
+def test_concurrent_attempts_are_grouped_and_durable(app, lesson):
+    lesson, _, _ = lesson
+    quiz = Quiz(lesson_id=lesson.id, title='Quiz', version=1, published=True)
+    db.session.add(quiz)
+    db.session.commit()
+    user_id = make_user('outro').id
+
+    writer = AttemptGroupCommit(batch_size=50)
+    groups = []
+    insert = writer._insert
+
+    def slow_insert(rows):
+        groups.append(len(rows))
+        time.sleep(0.05)
+        return insert(rows)
+
+    writer._insert = slow_insert
+    ids = []
+
+    def submit(index):
+        with app.app_context():
+            ids.append((index, writer.write({
+                'quiz_id': quiz.id, 'quiz_version': 1, 'user_id': user_id, 'answers': f'[{index}]',
+                'correct_count': 0, 'score': 0.0, 'passed': False
+            })))
+
+    threads = [threading.Thread(target=submit, args=(index,)) for index in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Todas gravadas antes de write() retornar, em menos INSERTs que tentativas
+    assert sum(groups) == 20 and len(groups) < 20
+    stored = {attempt.id: attempt.answers for attempt in QuizAttempt.query.all()}
+    # Cada requisição recebe o ID da sua própria tentativa
+    assert len(stored) == 20
+    assert all(stored[attempt_id] == f'[{index}]' for index, attempt_id in ids)
@@ -0,0 +1,65 @@
+import json
+import threading
+from src.models.course import Lesson
+from src.models.quiz import Question, Quiz, QuizAttempt
+from src.models.user import db
+from src.services import quiz_analytics as analytics
+from src.services.quiz_engine import quiz_keys
+from tests.factories import make_course, make_user
+
+
+def published_quiz(lesson, attempts):
+    quiz = Quiz(lesson_id=lesson.id, title='Quiz', version=1, published=True, questions=[
+        Question(text='A', options='["x", "y"]', correct_option=1, order=0),
+        Question(text='B', options='["x", "y", "z"]', correct_option=0, order=1)
+    ])
+    db.session.add(quiz)
+    db.session.flush()
+    rows = [
+        {'quiz_id': quiz.id, 'quiz_version': 1, 'user_id': lesson.module.course.instructor_id,
+         'answers': json.dumps(answers), 'correct_count': 0, 'score': 0, 'passed': False}
+        for answers in attempts
+    ]
+    if rows:
+        db.session.execute(db.insert(QuizAttempt), rows)
+    db.session.commit()
+    return quiz_keys.get(lesson.id)
+
+
+def lessons(count):
+    course = make_course(make_user('instrutor', 'instructor'), modules=1, lessons=count)
+    return Lesson.query.filter_by(module_id=course.modules[0].id).order_by(Lesson.order).all()
+
+
+def test_answers_are_read_in_several_chunks(app, monkeypatch):
+    monkeypatch.setattr(analytics, 'QUIZ_ANALYTICS_CHUNK_SIZE', 10)
+    attempts = [[1, 0]] * 15 + [[0, -1]] * 10
+    compiled = published_quiz(lessons(1)[0], attempts)
+
+    answers = analytics.load_answers(compiled)
+    assert answers.shape == (25, 2)
+    assert answers.tolist() == attempts
+
+    stats = analytics.compute_statistics(compiled, answers)
+    assert stats['attempts'] == 25
+    assert [question['difficulty'] for question in stats['questions']] == [0.6, 0.6]
+    assert stats['questions'][1]['blank'] == 10
+
+
+def test_empty_quiz_has_no_scores(app):
+    compiled = published_quiz(lessons(1)[0], [])
+    assert analytics.load_answers(compiled).shape == (0, 2)
+    assert analytics.quiz_analytics.get(compiled)['scores'] is None
+
+
+def test_one_quiz_does_not_block_another(app):
+    first, second = lessons(2)
+    busy = published_quiz(first, [[1, 0]])
+    free = published_quiz(second, [[0, 0]])
+    cache = analytics.QuizAnalyticsCache()
+
+    # Outro cálculo do primeiro quiz em andamento
+    with cache._lock:
+        lock = cache._key_locks.setdefault((busy.quiz_id, busy.version), threading.Lock())
+    with lock:
+        assert cache.get(free)['attempts'] == 1
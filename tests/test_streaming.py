@@ -0,0 +1,42 @@
+from src.models.course import Course, Review
+from src.models.user import User, db
+from src.services import json_provider
+from tests.factories import auth_headers, enroll, make_course, make_user
+
+
+def make_users(count):
+    db.session.execute(db.insert(User), [
+        {'username': f'user{index}', 'email': f'user{index}@example.com', 'password_hash': 'x', 'role': 'student'}
+        for index in range(count)
+    ])
+    db.session.commit()
+
+
+def test_users_stream_in_several_chunks(client, monkeypatch):
+    monkeypatch.setattr(json_provider, 'JSON_STREAM_YIELD_PER', 7)
+    make_users(50)
+
+    response = client.get('/api/users/users')
+    assert response.status_code == 200
+    users = response.get_json()
+    assert [user['username'] for user in users] == [f'user{index}' for index in range(50)]
+
+
+def test_admin_courses_stream_with_relations(client, monkeypatch):
+    monkeypatch.setattr(json_provider, 'JSON_STREAM_YIELD_PER', 3)
+    admin = make_user('admin', 'admin')
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    for index in range(10):
+        course = make_course(instructor, title=f'Curso {index}', modules=0)
+        enroll(student, course)
+        db.session.add(Review(rating=index % 5 + 1, user_id=student.id, course_id=course.id))
+    db.session.commit()
+
+    response = client.get('/api/admin/courses', headers=auth_headers(admin))
+    assert response.status_code == 200
+    courses = response.get_json()
+    assert [course['title'] for course in courses] == [f'Curso {index}' for index in range(10)]
+    assert all(course['category'] and course['student_count'] == 1 for course in courses)
+    assert [course['average_rating'] for course in courses] == [float(index % 5 + 1) for index in range(10)]
+    assert Course.query.count() == 10
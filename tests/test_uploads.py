@@ -0,0 +1,90 @@
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from src.models.course import Lesson, Material, UploadSession
+from src.models.user import db
+from src.services import storage
+from tests.factories import auth_headers, make_course, make_user
+
+
+@pytest.fixture
+def upload_dirs(tmp_path, monkeypatch):
+    materials = tmp_path / 'materials'
+    uploads = tmp_path / 'uploads'
+    monkeypatch.setattr(storage, 'MATERIALS_DIR', str(materials))
+    monkeypatch.setattr(storage, 'UPLOAD_TMP_DIR', str(uploads))
+    return materials, uploads
+
+
+@pytest.fixture
+def instructor_lesson(app):
+    instructor = make_user('instrutor', 'instructor')
+    course = make_course(instructor, modules=1, lessons=1)
+    return auth_headers(instructor), Lesson.query.filter(Lesson.module_id == course.modules[0].id).one()
+
+
+def test_raw_body_upload_is_stored_by_content(client, upload_dirs, instructor_lesson):
+    materials, uploads = upload_dirs
+    headers, lesson = instructor_lesson
+
+    for _ in range(2):
+        response = client.post(f'/api/content/materials/upload?filename=notas.pdf&lesson_id={lesson.id}',
+                               data=b'conteudo', headers=headers, content_type='application/pdf')
+        assert response.status_code == 201
+
+    urls = {material.url for material in Material.query.all()}
+    assert len(urls) == 1
+    assert len(list(materials.rglob('*.pdf'))) == 1
+    assert list(uploads.iterdir()) == []
+
+
+def test_oversized_upload_is_rejected_not_truncated(client, upload_dirs, instructor_lesson, monkeypatch):
+    materials, uploads = upload_dirs
+    headers, lesson = instructor_lesson
+    monkeypatch.setattr(storage, 'MAX_UPLOAD_SIZE', 4)
+
+    response = client.post(f'/api/content/materials/upload?filename=notas.pdf&lesson_id={lesson.id}',
+                           data=b'conteudo', headers=headers, content_type='application/pdf')
+    assert response.status_code == 413
+    assert Material.query.count() == 0
+    assert not materials.exists() or list(materials.rglob('*.pdf')) == []
+    assert list(uploads.iterdir()) == []
+
+
+def test_chunk_past_declared_size_is_discarded(client, upload_dirs, instructor_lesson):
+    headers, lesson = instructor_lesson
+    upload = client.post('/api/content/uploads', json={'filename': 'notas.pdf', 'lesson_id': lesson.id, 'size': 6},
+                         headers=headers).get_json()
+    url = f"/api/content/uploads/{upload['upload_id']}"
+
+    response = client.patch(url, data=b'abc', headers=dict(headers, **{'Upload-Offset': '0'}))
+    assert response.get_json()['offset'] == 3
+    response = client.patch(url, data=b'defghi', headers=dict(headers, **{'Upload-Offset': '3'}))
+    assert response.status_code == 413
+    assert client.get(url, headers=headers).get_json()['offset'] == 3
+
+    response = client.patch(url, data=b'def', headers=dict(headers, **{'Upload-Offset': '3'}))
+    assert response.status_code == 201
+    assert response.get_json()['sha256'] == hashlib.sha256(b'abcdef').hexdigest()
+
+
+def test_sweep_removes_abandoned_uploads(app, upload_dirs, instructor_lesson):
+    materials, uploads = upload_dirs
+    headers, lesson = instructor_lesson
+    uploads.mkdir()
+    old = datetime.utcnow() - timedelta(days=2)
+    for upload_id in ('abandonado', 'ativo'):
+        db.session.add(UploadSession(id=upload_id, filename='a.pdf', title='a', size=10, created_at=old,
+                                     lesson_id=lesson.id, user_id=lesson.module.course.instructor_id))
+        (uploads / f'{upload_id}.part').write_bytes(b'x')
+    db.session.commit()
+    (uploads / 'orfao.part').write_bytes(b'x')
+    stale = time.time() - 2 * 24 * 3600
+    for name in ('abandonado.part', 'orfao.part'):
+        os.utime(uploads / name, (stale, stale))
+
+    assert storage.sweep_uploads(24 * 3600) == (1, 1)
+    assert [upload.id for upload in UploadSession.query.all()] == ['ativo']
+    assert sorted(path.name for path in uploads.iterdir()) == ['ativo.part']
@@ -0,0 +1,124 @@
+import json
+import time
+from src.models.course import Enrollment, Progress
+from src.models.payment import Payment, WebhookEvent
+from src.models.user import db
+from src.services.fake_webhooks import fake_pagseguro_event, fake_stripe_event
+from src.services.webhooks import process_batch, sign_pagseguro_payload, sign_stripe_payload
+from tests.factories import auth_headers, make_course, make_user
+
+
+def post_stripe(client, event):
+    payload = json.dumps(event).encode()
+    timestamp = int(time.time())
+    headers = {'Stripe-Signature': f't={timestamp},v1={sign_stripe_payload(payload, timestamp)}'}
+    return client.post('/api/payments/webhook/stripe', data=payload, headers=headers,
+                       content_type='application/json')
+
+
+def post_pagseguro(client, event):
+    payload = json.dumps(event).encode()
+    headers = {'x-authenticity-token': sign_pagseguro_payload(payload)}
+    return client.post('/api/payments/webhook/pagseguro', data=payload, headers=headers,
+                       content_type='application/json')
+
+
+def checkout(client, gateway='stripe'):
+    instructor = make_user('instrutor', 'instructor')
+    student = make_user()
+    course = make_course(instructor)
+    headers = auth_headers(student)
+    client.post('/api/payments/cart/add', json={'course_id': course.id}, headers=headers)
+    response = client.post(f'/api/payments/checkout/{gateway}', json={'payment_method': 'pix'}, headers=headers)
+    assert response.status_code == 200
+    payment = Payment.query.filter_by(user_id=student.id).one()
+    return student, course, payment
+
+
+def test_invalid_signature_is_rejected(client):
+    payload = json.dumps(fake_stripe_event('PAGX')).encode()
+    response = client.post('/api/payments/webhook/stripe', data=payload,
+                           headers={'Stripe-Signature': f't={int(time.time())},v1=errada'})
+    assert response.status_code == 400
+    assert WebhookEvent.query.count() == 0
+
+
+def test_duplicate_events_are_applied_once(client):
+    student, course, payment = checkout(client)
+    event = fake_stripe_event(payment.payment_id)
+
+    assert post_stripe(client, event).status_code == 200
+    assert post_stripe(client, event).status_code == 200
+    assert WebhookEvent.query.count() == 1
+
+    assert process_batch() == 1
+    assert db.session.get(Payment, payment.id).status == 'completed'
+    assert Enrollment.query.filter_by(user_id=student.id, course_id=course.id).count() == 1
+
+
+def test_stripe_refund_uses_reference_from_charge_metadata(client):
+    student, course, payment = checkout(client)
+    post_stripe(client, fake_stripe_event(payment.payment_id))
+    process_batch()
+    enrollment = Enrollment.query.filter_by(user_id=student.id, course_id=course.id).one()
+    lesson = course.modules[0].lessons[0]
+    db.session.add(Progress(enrollment_id=enrollment.id, lesson_id=lesson.id, completed=True))
+    db.session.commit()
+
+    refund = fake_stripe_event(payment.payment_id, 'refunded')
+    assert 'client_reference_id' not in refund['data']['object']
+    post_stripe(client, refund)
+    assert WebhookEvent.query.filter_by(payment_status='refunded').one().payment_ref == payment.payment_id
+
+    process_batch()
+    assert db.session.get(Payment, payment.id).status == 'refunded'
+    assert Enrollment.query.filter_by(user_id=student.id).count() == 0
+    assert Progress.query.count() == 0
+
+
+def test_stripe_charge_without_reference_is_ignored(client):
+    refund = fake_stripe_event('PAGX', 'refunded')
+    refund['data']['object']['metadata'] = {}
+    assert post_stripe(client, refund).status_code == 200
+    assert WebhookEvent.query.count() == 0
+
+
+def test_pagseguro_cancel_after_payment_is_a_refund(client):
+    student, course, payment = checkout(client, 'pagseguro')
+    post_pagseguro(client, fake_pagseguro_event(payment.payment_id))
+    process_batch()
+    assert Enrollment.query.filter_by(user_id=student.id, course_id=course.id).count() == 1
+
+    post_pagseguro(client, fake_pagseguro_event(payment.payment_id, 'refunded'))
+    process_batch()
+    assert db.session.get(Payment, payment.id).status == 'refunded'
+    assert Enrollment.query.filter_by(user_id=student.id).count() == 0
+
+
+def test_pagseguro_cancel_before_payment_is_a_failure(client):
+    student, course, payment = checkout(client, 'pagseguro')
+    post_pagseguro(client, fake_pagseguro_event(payment.payment_id, 'refunded'))
+    process_batch()
+    assert db.session.get(Payment, payment.id).status == 'failed'
+    assert Enrollment.query.filter_by(user_id=student.id).count() == 0
+
+
+def test_completed_then_refunded_in_one_batch_ends_refunded(client):
+    student, course, payment = checkout(client)
+    post_stripe(client, fake_stripe_event(payment.payment_id))
+    post_stripe(client, fake_stripe_event(payment.payment_id, 'refunded'))
+
+    assert process_batch() == 2
+    assert db.session.get(Payment, payment.id).status == 'refunded'
+    assert Enrollment.query.filter_by(user_id=student.id).count() == 0
+    assert WebhookEvent.query.filter_by(status='processed').count() == 2
+
+
+def test_out_of_order_events_in_one_batch_keep_the_payment_completed(client):
+    student, course, payment = checkout(client)
+    post_stripe(client, fake_stripe_event(payment.payment_id))
+    post_stripe(client, fake_stripe_event(payment.payment_id, 'failed'))
+
+    process_batch()
+    assert db.session.get(Payment, payment.id).status == 'completed'
+    assert Enrollment.query.filter_by(user_id=student.id, course_id=course.id).count() == 1